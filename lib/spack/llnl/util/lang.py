@@ -6,6 +6,7 @@
 from __future__ import division
 
 import functools
+import importlib
 import inspect
 import os
 import re
@@ -825,6 +826,18 @@ def __repr__(self):
         return repr(self.ref_function())
 
 
+def lazy_import(module_name):
+    """Reference to a module that is imported when it is first used.
+
+    This is meant for modules that are slow to import and only needed on
+    some code paths, so that they don't slow down Spack's startup::
+
+        ssl = lazy_import('ssl')
+    """
+    return LazyReference(
+        functools.partial(importlib.import_module, module_name))
+
+
 def load_module_from_file(module_name, module_path):
     """Loads a python module from the path of the corresponding file.
 
@@ -185,6 +185,21 @@ def _platform():
 platform = _platform
 
 
+def platform_name():
+    """Name of the current platform.
+
+    Unlike ``platform().name``, this doesn't detect the targets and the
+    operating system of the host if the platform wasn't created yet, since
+    the results of the detection are cached in the misc cache, whose
+    location is in the configuration, which has per-platform scopes.
+    """
+    if platform is _platform and not _platform.cache:
+        # Platforms are named after their class, see cls_by_name
+        platform_cls = spack.platforms.host_cls()
+        return platform_cls.__name__.lower() if platform_cls else None
+    return platform().name
+
+
 @lang.memoized
 def default_arch():
     """Default ``Arch`` object for this machine"""
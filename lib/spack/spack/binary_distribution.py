@@ -7,6 +7,8 @@
 import glob
 import hashlib
 import json
+import multiprocessing
+import multiprocessing.pool
 import os
 import re
 import shutil
@@ -14,6 +16,7 @@
 import tarfile
 import tempfile
 import traceback
+import zlib
 from contextlib import closing
 
 import ruamel.yaml as yaml
@@ -33,6 +36,7 @@
 import spack.mirror
 import spack.platforms
 import spack.relocate as relocate
+import spack.subprocess_context
 import spack.util.file_cache as file_cache
 import spack.util.gpg
 import spack.util.spack_json as sjson
@@ -42,6 +46,7 @@
 from spack.caches import misc_cache_location
 from spack.spec import Spec
 from spack.stage import Stage
+from spack.util.timer import Timer
 
 _build_cache_relative_path = 'build_cache'
 _build_cache_keys_relative_path = '_pgp'
@@ -82,6 +87,9 @@ def __init__(self, cache_root):
         # cache (_mirrors_for_spec)
         self._specs_already_associated = set()
 
+        # manifests of the sharded indices, by mirror URL
+        self._manifests = {}
+
         # _mirrors_for_spec is a dictionary mapping DAG hashes to lists of
         # entries indicating mirrors where that concrete spec can be found.
         # Each entry is a dictionary consisting of:
@@ -116,6 +124,7 @@ def clear(self):
             self._index_file_cache = None
         self._local_index_cache = None
         self._specs_already_associated = set()
+        self._manifests = {}
         self._mirrors_for_spec = {}
 
     def _write_local_index_cache(self):
@@ -139,11 +148,162 @@ def regenerate_spec_cache(self, clear_existing=False):
             cache_entry = self._local_index_cache[mirror_url]
             cached_index_path = cache_entry['index_path']
             cached_index_hash = cache_entry['index_hash']
-            if cached_index_hash not in self._specs_already_associated:
+            if cache_entry.get('sharded'):
+                # Only the shards fetched so far
+                self._associate_shards(mirror_url)
+            elif cached_index_hash not in self._specs_already_associated:
                 self._associate_built_specs_with_mirror(cached_index_path,
                                                         mirror_url)
                 self._specs_already_associated.add(cached_index_hash)
 
+    def _manifest(self, mirror_url):
+        """Manifest of the sharded index of a mirror, or None if its index
+        isn't sharded."""
+        cache_entry = self._local_index_cache.get(mirror_url, {})
+        if not cache_entry.get('sharded'):
+            return None
+
+        if mirror_url not in self._manifests:
+            cache_key = cache_entry['index_path']
+            self._index_file_cache.init_entry(cache_key)
+            with self._index_file_cache.read_transaction(cache_key) as f:
+                self._manifests[mirror_url] = json.load(f)
+        return self._manifests[mirror_url]
+
+    def _shard_cache_key(self, shard_hash):
+        return 'shards/{0}.json'.format(shard_hash)
+
+    def _associate_shards(self, mirror_url, prefixes=None):
+        """Associate the specs in the cached shards of the index of a mirror.
+
+        Args:
+            mirror_url (str): URL of a mirror with a sharded index
+            prefixes (list or None): DAG hash prefixes of the shards to
+                fetch if they are not cached yet. By default, only the
+                cached shards are read.
+        """
+        manifest = self._manifest(mirror_url)
+        shards = manifest['shards']
+        if prefixes is not None:
+            missing = set()
+            for prefix in prefixes:
+                shard_hash = shards.get(prefix)
+                if shard_hash and not os.path.exists(
+                        self._index_file_cache.cache_path(
+                            self._shard_cache_key(shard_hash))):
+                    missing.add(shard_hash)
+            if not self._fetch_shards(mirror_url, sorted(missing)):
+                return
+
+        for shard_hash in sorted(set(shards.values())):
+            cache_key = self._shard_cache_key(shard_hash)
+            associated_key = (mirror_url, shard_hash)
+            if associated_key in self._specs_already_associated:
+                continue
+            if os.path.exists(self._index_file_cache.cache_path(cache_key)):
+                self._associate_built_specs_with_mirror(cache_key, mirror_url)
+                self._specs_already_associated.add(associated_key)
+
+    def _fetch_shards(self, mirror_url, shard_hashes):
+        """Fetch shards of the index of a mirror and cache them.
+
+        Shards may have been removed since the manifest was cached, when
+        the index was updated more than once. If any shard can't be read,
+        the whole index of the mirror is read instead.
+
+        Returns:
+            False if the whole index was read instead of the shards
+        """
+        if not shard_hashes:
+            return True
+
+        cache_prefix = url_util.join(mirror_url, _build_cache_relative_path)
+
+        def fetch(shard_hash):
+            shard_url = _index_shard_url(cache_prefix, shard_hash)
+            try:
+                _, _, fs = web_util.read_from_url(shard_url)
+                return shard_hash, codecs.getreader('utf-8')(fs).read()
+            except (URLError, web_util.SpackWebError) as url_err:
+                tty.debug('Unable to read index shard {0}'.format(
+                    shard_url), url_err, 1)
+                return shard_hash, None
+
+        tty.debug('Fetching {0} index shards from {1}'.format(
+            len(shard_hashes), mirror_url))
+        _import_file_url_handlers()
+        tp = multiprocessing.pool.ThreadPool(
+            processes=min(32, len(shard_hashes)))
+        try:
+            shards = tp.map(fetch, shard_hashes)
+        finally:
+            tp.terminate()
+
+        invalid = [shard_hash for shard_hash, shard_str in shards
+                   if shard_str is None or compute_hash(shard_str) != shard_hash]
+        if invalid:
+            tty.warn('Could not read {0} index shards of {1}, reading its '
+                     'whole index instead'.format(len(invalid), mirror_url))
+            self._read_whole_index(mirror_url)
+            return False
+
+        # Cache files are written from this thread, as their locks are
+        # not thread safe
+        for shard_hash, shard_str in shards:
+            cache_key = self._shard_cache_key(shard_hash)
+            self._index_file_cache.init_entry(cache_key)
+            with self._index_file_cache.write_transaction(
+                    cache_key) as (old, new):
+                new.write(shard_str)
+        return True
+
+    def _read_whole_index(self, mirror_url):
+        """Replace the cached manifest of a mirror with its whole index, and
+        associate its specs. The whole index is used for this mirror from
+        then on."""
+        manifest = self._manifest(mirror_url)
+        old_entry = self._local_index_cache[mirror_url]
+        if not self._fetch_and_cache_index(mirror_url, shards=False):
+            return
+
+        del self._manifests[mirror_url]
+        self._index_file_cache.remove(old_entry['index_path'])
+        for shard_hash in set(manifest['shards'].values()):
+            shard_key = self._shard_cache_key(shard_hash)
+            if os.path.exists(self._index_file_cache.cache_path(shard_key)):
+                self._index_file_cache.remove(shard_key)
+        self._write_local_index_cache()
+
+        cache_entry = self._local_index_cache[mirror_url]
+        self._associate_built_specs_with_mirror(
+            cache_entry['index_path'], mirror_url)
+        self._specs_already_associated.add(cache_entry['index_hash'])
+
+    def _fetch_shards_for(self, dag_hashes=None):
+        """Fetch the shards of the sharded indices with the given DAG
+        hashes, and associate their specs.
+
+        When all specs are needed, the whole index of a mirror is read
+        instead of the shards that aren't cached yet: shards repeat the
+        records of the dependencies of their specs, so all of them are
+        larger than the index, and need a request each.
+        """
+        for mirror_url in list(self._local_index_cache):
+            manifest = self._manifest(mirror_url)
+            if manifest is None:
+                continue
+            if dag_hashes is None:
+                prefixes = list(manifest['shards'])
+                if not all(os.path.exists(self._index_file_cache.cache_path(
+                        self._shard_cache_key(shard_hash)))
+                        for shard_hash in manifest['shards'].values()):
+                    self._read_whole_index(mirror_url)
+                    continue
+            else:
+                length = manifest['prefix_length']
+                prefixes = set(h[:length] for h in dag_hashes)
+            self._associate_shards(mirror_url, prefixes)
+
     def _associate_built_specs_with_mirror(self, cache_key, mirror_url):
         tmpdir = tempfile.mkdtemp()
 
@@ -184,6 +344,8 @@ def _associate_built_specs_with_mirror(self, cache_key, mirror_url):
             shutil.rmtree(tmpdir)
 
     def get_all_built_specs(self):
+        self._fetch_shards_for()
+
         spec_list = []
         for dag_hash in self._mirrors_for_spec:
             # in the absence of further information, all concrete specs
@@ -204,6 +366,8 @@ def find_built_spec(self, spec):
 
         This method does not trigger reading anything from remote mirrors, but
         rather just checks if the concrete spec is found within the cache.
+        The exception are mirrors with a sharded index, whose shard for the
+        spec is fetched if it is not cached yet.
 
         The cache can be updated by calling ``update()`` on the cache.
 
@@ -226,6 +390,7 @@ def find_built_spec(self, spec):
         self.regenerate_spec_cache()
 
         find_hash = spec.dag_hash()
+        self._fetch_shards_for([find_hash])
         if find_hash not in self._mirrors_for_spec:
             return None
 
@@ -298,9 +463,12 @@ def update(self):
             cached_index_hash = cache_entry['index_hash']
             cached_index_path = cache_entry['index_path']
             if cached_mirror_url in configured_mirror_urls:
-                # May need to fetch the index and update the local caches
+                # May need to fetch the index and update the local caches.
+                # Mirrors whose whole index is cached are not checked for a
+                # sharded index again.
                 needs_regen = self._fetch_and_cache_index(
-                    cached_mirror_url, expect_hash=cached_index_hash)
+                    cached_mirror_url, expect_hash=cached_index_hash,
+                    shards=cache_entry.get('sharded', True))
                 # The need to regenerate implies a need to clear as well.
                 spec_cache_clear_needed |= needs_regen
                 spec_cache_regenerate_needed |= needs_regen
@@ -338,7 +506,8 @@ def update(self):
         if spec_cache_regenerate_needed:
             self.regenerate_spec_cache(clear_existing=spec_cache_clear_needed)
 
-    def _fetch_and_cache_index(self, mirror_url, expect_hash=None):
+    def _fetch_and_cache_index(self, mirror_url, expect_hash=None,
+                               shards=True):
         """ Fetch a buildcache index file from a remote mirror and cache it.
 
         If we already have a cached index from this mirror, then we first
@@ -349,6 +518,8 @@ def _fetch_and_cache_index(self, mirror_url, expect_hash=None):
             expect_hash (str): If provided, this hash will be compared against
                 the index hash we retrieve from the mirror, to determine if we
                 need to fetch the index or not.
+            shards (bool): read the manifest of the sharded index instead of
+                the index, if the mirror has one
 
         Returns:
             True if this function thinks the concrete spec cache,
@@ -360,6 +531,12 @@ def _fetch_and_cache_index(self, mirror_url, expect_hash=None):
         hash_fetch_url = url_util.join(
             mirror_url, _build_cache_relative_path, 'index.json.hash')
 
+        # Mirrors with a sharded index only need their manifest
+        manifest = shards and _read_index_manifest(
+            url_util.join(mirror_url, _build_cache_relative_path))
+        if manifest:
+            return self._cache_index_manifest(mirror_url, manifest)
+
         old_cache_key = None
         fetched_hash = None
 
@@ -427,6 +604,7 @@ def _fetch_and_cache_index(self, mirror_url, expect_hash=None):
         self._local_index_cache[mirror_url] = {
             'index_hash': locally_computed_hash,
             'index_path': cache_key,
+            'sharded': False,
         }
 
         # clean up the old cache_key if necessary
@@ -437,6 +615,49 @@ def _fetch_and_cache_index(self, mirror_url, expect_hash=None):
         # regenerate the spec cache as a result.
         return True
 
+    def _cache_index_manifest(self, mirror_url, manifest):
+        """Cache the manifest of the sharded index of a mirror. Shards are
+        fetched later, when specs are looked up.
+
+        Returns:
+            True if the manifest changed, and the concrete spec cache should
+                be regenerated. False otherwise.
+        """
+        manifest_str = sjson.dump(manifest)
+        manifest_hash = compute_hash(manifest_str)
+        old_entry = self._local_index_cache.get(mirror_url)
+        if old_entry and old_entry['index_hash'] == manifest_hash:
+            tty.debug('Cached index for {0} already up to date'.format(
+                mirror_url))
+            return False
+
+        old_shards = set()
+        if old_entry and old_entry.get('sharded'):
+            old_shards = set(self._manifest(mirror_url)['shards'].values())
+
+        url_hash = compute_hash(mirror_url)
+        cache_key = '{0}_{1}.shards.json'.format(
+            url_hash[:10], manifest_hash[:10])
+        self._index_file_cache.init_entry(cache_key)
+        with self._index_file_cache.write_transaction(cache_key) as (old, new):
+            new.write(manifest_str)
+
+        self._local_index_cache[mirror_url] = {
+            'index_hash': manifest_hash,
+            'index_path': cache_key,
+            'sharded': True,
+        }
+        self._manifests[mirror_url] = manifest
+
+        # Clean up the previous index, and the shards that changed
+        if old_entry:
+            self._index_file_cache.remove(old_entry['index_path'])
+        for shard_hash in old_shards - set(manifest['shards'].values()):
+            shard_key = self._shard_cache_key(shard_hash)
+            if os.path.exists(self._index_file_cache.cache_path(shard_key)):
+                self._index_file_cache.remove(shard_key)
+        return True
+
 
 def binary_index_location():
     """Set up a BinaryCacheIndex for remote buildcache dbs in the user's homedir."""
@@ -464,6 +685,16 @@ def __init__(self, file_path):
         super(NoOverwriteException, self).__init__(err_msg)
 
 
+class BuildcacheCreationError(spack.error.SpackError):
+    """
+    Raised when the build cache files of specs can't be created.
+    """
+    def __init__(self, msg, long_msg=None, failed_specs=()):
+        super(BuildcacheCreationError, self).__init__(msg, long_msg)
+        #: Specs whose files were not pushed
+        self.failed_specs = list(failed_specs)
+
+
 class NoGpgException(spack.error.SpackError):
     """
     Raised when gpg2 is not in PATH
@@ -516,6 +747,13 @@ def __init__(self, msg):
         super(NewLayoutException, self).__init__(msg)
 
 
+class UnsupportedArchiveException(spack.error.SpackError):
+    """
+    Raised if a buildcache archive can't be read by this Spack.
+    """
+    pass
+
+
 def compute_hash(data):
     return hashlib.sha256(data.encode('utf-8')).hexdigest()
 
@@ -547,11 +785,55 @@ def read_buildinfo_file(prefix):
     filename = buildinfo_file_name(prefix)
     with open(filename, 'r') as inputfile:
         content = inputfile.read()
-        buildinfo = yaml.load(content)
+        buildinfo = syaml.load(content)
     return buildinfo
 
 
-def get_buildfile_manifest(spec):
+def _list_directory(path):
+    """Subdirectories and files in a directory, like ``os.walk`` lists them.
+    Run in a thread pool.
+
+    Returns:
+        tuple: lists of the paths of the subdirectories and of the files
+    """
+    dirs, files = [], []
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return dirs, files
+
+    for name in names:
+        entry = os.path.join(path, name)
+        if not os.path.isdir(entry):
+            files.append(entry)
+        # Like os.walk, don't follow symlinks to directories
+        elif not os.path.islink(entry):
+            dirs.append(entry)
+    return dirs, files
+
+
+def _walk_prefix(prefix, blacklist, tp):
+    """Files in a prefix, except in directories named in ``blacklist``.
+    Directories at the same depth are listed concurrently by ``tp``."""
+    files, dirs = [], [prefix]
+    while dirs:
+        listed = tp.map(_list_directory, dirs)
+        dirs = []
+        for subdirs, dir_files in listed:
+            dirs.extend(d for d in subdirs
+                        if os.path.basename(d) not in blacklist)
+            files.extend(dir_files)
+    return sorted(files)
+
+
+def _classify_file(path_name):
+    """MIME type of a file, and the target of symbolic links. Run in a
+    thread pool."""
+    link = os.readlink(path_name) if os.path.islink(path_name) else None
+    return relocate.mime_type(path_name), link
+
+
+def get_buildfile_manifest(spec, concurrency=32):
     """
     Return a data structure with information about a build, including
     text_to_relocate, binary_to_relocate, binary_to_relocate_fullpath
@@ -559,6 +841,9 @@ def get_buildfile_manifest(spec):
     checks (and should not be relocated). We blacklist docs (man) and
     metadata (.spack). This can be used to find a particular kind of file
     in spack, or to generate the build metadata.
+
+    The prefix is walked, and its files classified, by ``concurrency``
+    threads.
     """
     data = {"text_to_relocate": [], "binary_to_relocate": [],
             "link_to_relocate": [], "other": [],
@@ -568,38 +853,44 @@ def get_buildfile_manifest(spec):
 
     # Do this at during tarball creation to save time when tarball unpacked.
     # Used by make_package_relative to determine binaries to change.
-    for root, dirs, files in os.walk(spec.prefix, topdown=True):
-        dirs[:] = [d for d in dirs if d not in blacklist]
-        for filename in files:
-            path_name = os.path.join(root, filename)
-            m_type, m_subtype = relocate.mime_type(path_name)
-            rel_path_name = os.path.relpath(path_name, spec.prefix)
-            added = False
-
-            if os.path.islink(path_name):
-                link = os.readlink(path_name)
-                if os.path.isabs(link):
-                    # Relocate absolute links into the spack tree
-                    if link.startswith(spack.store.layout.root):
-                        data['link_to_relocate'].append(rel_path_name)
-                    added = True
-
-            if relocate.needs_binary_relocation(m_type, m_subtype):
-                if ((m_subtype in ('x-executable', 'x-sharedlib', 'x-pie-executable')
-                    and sys.platform != 'darwin') or
-                   (m_subtype in ('x-mach-binary')
-                    and sys.platform == 'darwin') or
-                   (not filename.endswith('.o'))):
-                    data['binary_to_relocate'].append(rel_path_name)
-                    data['binary_to_relocate_fullpath'].append(path_name)
-                    added = True
-
-            if relocate.needs_text_relocation(m_type, m_subtype):
-                data['text_to_relocate'].append(rel_path_name)
+    tp = multiprocessing.pool.ThreadPool(processes=concurrency)
+    try:
+        path_names = _walk_prefix(spec.prefix, blacklist, tp)
+        classified = tp.map(_classify_file, path_names, chunksize=64)
+    finally:
+        tp.terminate()
+        tp.join()
+
+    for path_name, ((m_type, m_subtype), link) in zip(
+            path_names, classified):
+        filename = os.path.basename(path_name)
+        rel_path_name = os.path.relpath(path_name, spec.prefix)
+        added = False
+
+        if link is not None:
+            if os.path.isabs(link):
+                # Relocate absolute links into the spack tree
+                if link.startswith(spack.store.layout.root):
+                    data['link_to_relocate'].append(rel_path_name)
+                added = True
+
+        if relocate.needs_binary_relocation(m_type, m_subtype):
+            if ((m_subtype in ('x-executable', 'x-sharedlib',
+                               'x-pie-executable')
+                and sys.platform != 'darwin') or
+               (m_subtype in ('x-mach-binary')
+                and sys.platform == 'darwin') or
+               (not filename.endswith('.o'))):
+                data['binary_to_relocate'].append(rel_path_name)
+                data['binary_to_relocate_fullpath'].append(path_name)
                 added = True
 
-            if not added:
-                data['other'].append(path_name)
+        if relocate.needs_text_relocation(m_type, m_subtype):
+            data['text_to_relocate'].append(rel_path_name)
+            added = True
+
+        if not added:
+            data['other'].append(path_name)
     return data
 
 
@@ -633,6 +924,46 @@ def write_buildinfo_file(spec, workdir, rel=False):
         outfile.write(syaml.dump(buildinfo, default_flow_style=True))
 
 
+def _relocation_prefixes(buildinfo):
+    """Prefixes replaced by ``relocate_package`` in text files and in
+    binaries, in the order they are replaced."""
+    old_layout_root = buildinfo['buildpath']
+    old_prefix = os.path.join(old_layout_root, buildinfo['relative_prefix'])
+    prefixes = [old_prefix, old_layout_root]
+    prefixes.extend(buildinfo.get('prefix_to_hash', {}))
+
+    text_prefixes = [buildinfo['sbang_install_path']] + prefixes
+    text_prefixes.append(
+        '#!/bin/bash {0}/bin/sbang'.format(buildinfo['spackprefix']))
+    return (list(llnl.util.lang.dedupe(text_prefixes)),
+            list(llnl.util.lang.dedupe(prefixes)))
+
+
+def write_relocation_offsets(workdir):
+    """
+    Add the offsets of the prefixes in the files to relocate to the
+    buildinfo file, so that relocation doesn't scan files for them
+    """
+    buildinfo = read_buildinfo_file(workdir)
+    text_prefixes, bin_prefixes = _relocation_prefixes(buildinfo)
+
+    offsets = {}
+    for filenames, prefixes, binary in (
+            (buildinfo['relocate_textfiles'], text_prefixes, False),
+            (buildinfo['relocate_binaries'], bin_prefixes, True)):
+        for filename in filenames:
+            path = os.path.join(workdir, filename)
+            if os.path.islink(path) or not os.path.isfile(path):
+                continue
+            file_offsets = relocate.prefix_offsets(path, prefixes, binary)
+            if file_offsets:
+                offsets[filename] = file_offsets
+
+    buildinfo['relocate_offsets'] = offsets
+    with open(buildinfo_file_name(workdir), 'w') as outfile:
+        outfile.write(syaml.dump(buildinfo, default_flow_style=True))
+
+
 def tarball_directory_name(spec):
     """
     Return name of the tarball directory according to the convention
@@ -677,6 +1008,251 @@ def checksum_tarball(file):
     return hasher.hexdigest()
 
 
+#: Layout of the ``.spack`` archives of build caches. Archives of layout 0
+#: are an uncompressed tarball holding the signed spec file and a compressed
+#: tarball of the prefix. Archives of layout 1 are a single compressed tarball
+#: of the prefix, and the signed spec file is stored next to them. Older
+#: versions of Spack can only install archives of layout 0, which are created
+#: unless ``config:buildcache_layout_version`` is 1.
+_buildcache_layout_version = 1
+
+#: Magic numbers of the compressed streams of archives
+_compression_magic = {
+    'gzip': b'\x1f\x8b',
+    'zstd': b'\x28\xb5\x2f\xfd',
+}
+
+#: Compressions of the archives of build caches
+compressions = ('gzip', 'zstd')
+
+#: Size of the chunks read from archives
+_archive_chunk_size = 1 << 16
+
+
+def _zstandard():
+    """The zstandard module, or None if it is not installed"""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def _compressor(compression, jobs=None):
+    if compression == 'zstd':
+        zstandard = _zstandard()
+        if zstandard:
+            cctx = zstandard.ZstdCompressor(threads=jobs or -1)
+            return cctx.compressobj()
+        tty.warn('zstandard is not installed, compressing with gzip')
+    # zlib adds a gzip header and trailer with these window bits
+    return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def _decompressor(magic):
+    if magic.startswith(_compression_magic['gzip']):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if magic.startswith(_compression_magic['zstd']):
+        zstandard = _zstandard()
+        if not zstandard:
+            raise UnsupportedArchiveException(
+                'The Python module zstandard is required to extract '
+                'buildcache archives compressed with zstd.')
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise UnsupportedArchiveException(
+        'Unknown compression of buildcache archive.')
+
+
+def _is_nested_archive(path):
+    """Whether the archive at ``path`` has layout 0, which holds a tarball
+    of the prefix next to its spec file, instead of the prefix itself."""
+    with open(path, 'rb') as f:
+        if f.read(4) == _compression_magic['zstd']:
+            return False
+    with closing(tarfile.open(path, 'r')) as tar:
+        first = tar.next()
+    return first is None or first.name != '.'
+
+
+class _ArchiveWriter(object):
+    """Compress data written to a file, and compute the sha256 checksum of
+    the compressed data."""
+
+    def __init__(self, fileobj, compression='gzip', jobs=None):
+        self.fileobj = fileobj
+        self.hasher = hashlib.sha256()
+        self.compressor = _compressor(compression, jobs)
+
+    def _write(self, data):
+        if data:
+            self.hasher.update(data)
+            self.fileobj.write(data)
+
+    def write(self, data):
+        self._write(self.compressor.compress(data))
+
+    def close(self):
+        self._write(self.compressor.flush())
+
+    def checksum(self):
+        return self.hasher.hexdigest()
+
+
+class _ArchiveReader(object):
+    """Decompress data read from a file, and compute the sha256 checksum of
+    the compressed data."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hasher = hashlib.sha256()
+        magic = self._read(4)
+        self.decompressor = _decompressor(magic)
+        self.buffer = self.decompressor.decompress(magic)
+        self.offset = 0
+
+    def _read(self, size):
+        data = self.fileobj.read(size)
+        self.hasher.update(data)
+        return data
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) - self.offset < size:
+            data = self._read(_archive_chunk_size)
+            if not data:
+                break
+            self.buffer = (self.buffer[self.offset:] +
+                           self.decompressor.decompress(data))
+            self.offset = 0
+
+        end = len(self.buffer) if size < 0 else self.offset + size
+        data = self.buffer[self.offset:end]
+        self.offset = min(end, len(self.buffer))
+        return data
+
+    def checksum(self):
+        # Tar readers stop at the end of the archive, before padding and
+        # the trailer of the compressed stream
+        while self._read(_archive_chunk_size):
+            pass
+        return self.hasher.hexdigest()
+
+
+def _reset_owner(tarinfo):
+    tarinfo.uid = tarinfo.gid = 0
+    tarinfo.uname = tarinfo.gname = ''
+    return tarinfo
+
+
+def write_archive(prefix, path, compression='gzip', jobs=None, arcname='.'):
+    """Write a buildcache archive of ``prefix`` in one pass.
+
+    Arguments:
+        prefix (str): directory to archive
+        path (str): path of the archive
+        compression (str): one of ``compressions``. Falls back to gzip if
+            the zstandard module is not installed.
+        jobs (int): number of threads compressing with zstd
+        arcname (str): name of ``prefix`` in the archive. Archives of
+            layout 0 hold a tarball of the directory of the prefix.
+
+    Returns:
+        The sha256 checksum of the archive
+    """
+    with open(path, 'wb') as f:
+        writer = _ArchiveWriter(f, compression, jobs)
+        with closing(tarfile.open(fileobj=writer, mode='w|')) as tar:
+            tar.add(name=prefix, arcname=arcname, filter=_reset_owner)
+        writer.close()
+    return writer.checksum()
+
+
+def _outside_archive(path):
+    return os.path.isabs(path) or path.split(os.sep)[0] == os.pardir
+
+
+def _archive_members(tar):
+    """Members of an archive, checked so that extracting them can't write
+    outside of the prefix, even through links of earlier members."""
+    symlinks = set()
+    for member in tar:
+        path = os.path.normpath(member.name)
+        if _outside_archive(path):
+            raise UnsupportedArchiveException(
+                'Buildcache archive has a file outside of the prefix: '
+                '{0}'.format(member.name))
+
+        # Nothing is extracted through a symbolic link, which may point
+        # anywhere, e.g. to an absolute path that is relocated later
+        paths = [path]
+        if member.islnk():
+            paths.append(os.path.normpath(member.linkname))
+            if _outside_archive(paths[-1]):
+                raise UnsupportedArchiveException(
+                    'Buildcache archive has a hard link to a file outside '
+                    'of the prefix: {0}'.format(member.name))
+        elif member.issym() and not os.path.isabs(member.linkname):
+            target = os.path.normpath(os.path.join(
+                os.path.dirname(path), member.linkname))
+            if _outside_archive(target):
+                raise UnsupportedArchiveException(
+                    'Buildcache archive has a symbolic link to a file '
+                    'outside of the prefix: {0}'.format(member.name))
+
+        for p in paths:
+            parts = p.split(os.sep)
+            for i in range(1, len(parts) + 1):
+                if os.sep.join(parts[:i]) in symlinks:
+                    raise UnsupportedArchiveException(
+                        'Buildcache archive has a file behind the symbolic '
+                        'link {0}: {1}'.format(
+                            os.sep.join(parts[:i]), member.name))
+
+        if member.issym():
+            symlinks.add(path)
+        yield member
+
+
+def extract_archive(stream, prefix, checksum=None):
+    """Extract a buildcache archive in one pass, e.g. from a file or from
+    the response to a request.
+
+    The archive is extracted in a temporary directory next to the prefix,
+    which is moved to the prefix once the checksum is verified.
+
+    Arguments:
+        stream: binary file object of the archive
+        prefix (str): directory where the archive is extracted. It must not
+            exist.
+        checksum (str): expected sha256 checksum of the archive, verified
+            while extracting it
+
+    Raises:
+        NoChecksumException: if the checksum doesn't match. Nothing is
+            extracted in the prefix.
+        UnsupportedArchiveException: if a file of the archive would be
+            extracted outside of the prefix
+    """
+    prefix = os.path.abspath(prefix)
+    parent = os.path.dirname(prefix)
+    mkdirp(parent)
+    tmpdir = tempfile.mkdtemp(
+        prefix='.{0}-'.format(os.path.basename(prefix)), dir=parent)
+    try:
+        reader = _ArchiveReader(stream)
+        with closing(tarfile.open(fileobj=reader, mode='r|')) as tar:
+            tar.extractall(tmpdir, members=_archive_members(tar))
+        actual = reader.checksum()
+
+        if checksum and actual != checksum:
+            raise NoChecksumException(
+                "Package tarball failed checksum verification.\n"
+                "It cannot be installed.")
+        os.rename(tmpdir, prefix)
+    except Exception:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+
+
 def select_signing_key(key=None):
     if key is None:
         keys = spack.util.gpg.signing_keys()
@@ -705,18 +1281,334 @@ def sign_tarball(key, force, specfile_path):
     spack.util.gpg.sign(key, specfile_path, '%s.asc' % specfile_path)
 
 
-def generate_package_index(cache_prefix):
+def sign_specfile(key, force, specfile_path):
+    """Clearsign a spec file, which is stored next to archives of layout 1
+    since it includes the checksum of the archive."""
+    signed_specfile_path = '%s.sig' % specfile_path
+    if os.path.exists(signed_specfile_path):
+        if force:
+            os.remove(signed_specfile_path)
+        else:
+            raise NoOverwriteException(signed_specfile_path)
+
+    key = select_signing_key(key)
+    spack.util.gpg.sign(
+        key, specfile_path, signed_specfile_path, clearsign=True)
+
+
+def _clearsigned_text(contents):
+    """Text of a clearsigned document, see RFC 4880, section 7"""
+    # The text follows the armor headers and an empty line
+    text = contents.split('\n\n', 1)[1]
+    text = text.split('\n-----BEGIN PGP SIGNATURE-----', 1)[0]
+    return '\n'.join(line[2:] if line.startswith('- ') else line
+                     for line in text.split('\n'))
+
+
+#: Minimum number of YAML spec files per process when parsing them in
+#: parallel
+_min_spec_files_per_job = 64
+
+
+def _import_file_url_handlers():
+    """Import the modules that urllib imports the first time it opens a
+    file:// URL. Call before reading URLs in a thread pool, as these
+    imports are not safe when the first URLs are read from several threads.
+    """
+    import email.utils  # noqa: F401
+    import mimetypes  # noqa: F401
+
+
+def _read_spec_file(spec_url):
+    """Fetch a spec file. Run in a thread pool, so errors are returned.
+
+    Returns:
+        tuple: ``(spec_url, contents, error)``
+    """
+    try:
+        tty.debug('fetching {0}'.format(spec_url))
+        _, _, spec_file = web_util.read_from_url(spec_url)
+        contents = codecs.getreader('utf-8')(spec_file).read()
+        return spec_url, contents, None
+    except (URLError, web_util.SpackWebError) as url_err:
+        return spec_url, None, url_err
+
+
+def _yaml_spec_to_json(contents):
+    """Convert a YAML spec file to JSON, which is much faster to parse.
+    Run in a process pool."""
+    return sjson.dump(syaml.load(contents))
+
+
+def _read_spec_files(spec_urls, concurrency=32, jobs=None):
+    """Fetch and parse spec files.
+
+    Spec files are fetched concurrently in a thread pool. YAML spec files,
+    which are slow to parse, are converted to JSON in a process pool while
+    the others are still being fetched.
+
+    Args:
+        spec_urls (list): URLs of ``.spec.json`` and ``.spec.yaml`` files
+        concurrency (int): number of simultaneous requests
+        jobs (int or None): number of processes parsing YAML spec files,
+            ``config:build_jobs`` by default
+
+    Returns:
+        list: ``(spec_url, spec_dict)`` tuples, in no particular order
+    """
+    if jobs is None:
+        jobs = config.get('config:build_jobs', 1)
+    num_yaml = sum(1 for url in spec_urls if url.endswith('.yaml'))
+    jobs = min(jobs, num_yaml // _min_spec_files_per_job)
+
+    # Daemon processes (e.g. other pool workers) can't have children
+    pool = None
+    if jobs >= 2 and not multiprocessing.current_process().daemon:
+        pool = multiprocessing.Pool(jobs)
+
+    _import_file_url_handlers()
+    tp = multiprocessing.pool.ThreadPool(processes=concurrency)
+    spec_dicts, pending = [], []
+    try:
+        fetched = tp.imap_unordered(_read_spec_file, spec_urls)
+        for i, (spec_url, contents, url_err) in enumerate(fetched, 1):
+            if i % 1000 == 0:
+                tty.msg('Fetched {0} of {1} spec files'.format(
+                    i, len(spec_urls)))
+
+            if url_err is not None:
+                tty.error('Error reading specfile: {0}'.format(spec_url))
+                tty.error(url_err)
+            # Need full spec.json name or this gets confused with index.json.
+            elif spec_url.endswith('.json'):
+                spec_dicts.append((spec_url, sjson.load(contents)))
+            elif pool:
+                pending.append((spec_url, pool.apply_async(
+                    _yaml_spec_to_json, (contents,))))
+            else:
+                spec_dicts.append((spec_url, syaml.load(contents)))
+
+        for spec_url, result in pending:
+            spec_dicts.append((spec_url, sjson.load(result.get())))
+    finally:
+        tp.terminate()
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    return spec_dicts
+
+
+#: Manifest of the shards of a build cache index
+_index_manifest_name = 'index.shards.json'
+
+#: Directory of the shards of a build cache index
+_index_shards_relative_path = 'index'
+
+#: Number of leading characters of DAG hashes keying the index shards
+_index_shard_prefix_length = 2
+
+
+def _index_shard_url(cache_prefix, shard_hash):
+    return url_util.join(
+        cache_prefix, _index_shards_relative_path, shard_hash + '.json')
+
+
+def _read_index_manifest(cache_prefix):
+    """Read the manifest of a sharded index, or return None if the index
+    isn't sharded."""
+    manifest_url = url_util.join(cache_prefix, _index_manifest_name)
+    try:
+        _, _, f = web_util.read_from_url(manifest_url)
+        manifest = sjson.load(codecs.getreader('utf-8')(f).read())
+    except (URLError, web_util.SpackWebError, ValueError) as e:
+        tty.debug('Unable to read {0}'.format(manifest_url), e)
+        return None
+
+    if not isinstance(manifest, dict) or 'shards' not in manifest:
+        tty.warn('Invalid index manifest {0}'.format(manifest_url))
+        return None
+    return manifest
+
+
+def _push_index_shards(cache_prefix, specs, tmpdir, old_manifest=None):
+    """Push the index of a build cache split in shards, and their manifest.
+
+    Each shard is a database with the specs whose DAG hash starts with the
+    same characters, along with their dependencies. Clients only fetch the
+    shards of the specs they look for. Shards are named after the hash of
+    their contents, so clients can cache them for good, and only the shards
+    that changed are pushed. The manifest maps DAG hash prefixes to the
+    hashes of the shards.
+
+    Args:
+        cache_prefix (str): URL of the build cache
+        specs (list): all the specs in the build cache
+        tmpdir (str): local directory where shards are written
+        old_manifest (dict or None): current manifest of the build cache
+    """
+    old_shards = (old_manifest or {}).get('shards', {})
+
+    by_prefix = {}
+    for s in specs:
+        prefix = s.dag_hash()[:_index_shard_prefix_length]
+        by_prefix.setdefault(prefix, []).append(s)
+
+    shards = {}
+    for prefix, shard_specs in by_prefix.items():
+        db_root_dir = os.path.join(tmpdir, prefix)
+        db = spack_db.Database(None, db_dir=db_root_dir,
+                               enable_transaction_locking=False,
+                               record_fields=['spec', 'ref_count',
+                                              'in_buildcache'])
+        for s in shard_specs:
+            db.add(s, None)
+            db.mark(s, 'in_buildcache', True)
+
+        shard_path = os.path.join(db_root_dir, 'index.json')
+        with open(shard_path, 'w') as f:
+            db._write_to_file(f)
+        with open(shard_path) as f:
+            shards[prefix] = compute_hash(f.read())
+
+        if old_shards.get(prefix) != shards[prefix]:
+            web_util.push_to_url(
+                shard_path, _index_shard_url(cache_prefix, shards[prefix]),
+                keep_original=False,
+                extra_args={'ContentType': 'application/json'})
+
+    # Shards are pushed before the manifest referencing them
+    manifest_path = os.path.join(tmpdir, _index_manifest_name)
+    with open(manifest_path, 'w') as f:
+        f.write(sjson.dump({
+            'prefix_length': _index_shard_prefix_length,
+            'shards': shards,
+        }))
+    web_util.push_to_url(
+        manifest_path, url_util.join(cache_prefix, _index_manifest_name),
+        keep_original=False, extra_args={'ContentType': 'application/json'})
+
+    # Clients may still be reading shards of the previous manifest
+    keep = set(shards.values()) | set(old_shards.values())
+    shards_url = url_util.join(cache_prefix, _index_shards_relative_path)
+    web_util.remove_urls(
+        url_util.join(shards_url, name)
+        for name in web_util.list_url(shards_url) or []
+        if name.endswith('.json') and name[:-len('.json')] not in keep)
+
+
+#: DAG hash in the name of a spec file, see ``tarball_name()``
+_spec_file_hash_re = re.compile(r'-([a-z0-9]{32})\.spec\.(?:json|yaml)$')
+
+
+def _read_package_index(cache_prefix):
+    """Read the index of a build cache, checking it against its hash.
+
+    Returns:
+        dict: specs in the index by DAG hash, or None if the index is
+            missing or doesn't match its hash
+    """
+    index_url = url_util.join(cache_prefix, 'index.json')
+    hash_url = url_util.join(cache_prefix, 'index.json.hash')
+    try:
+        _, _, f = web_util.read_from_url(hash_url)
+        index_hash = codecs.getreader('utf-8')(f).read()
+        _, _, f = web_util.read_from_url(index_url)
+        index_string = codecs.getreader('utf-8')(f).read()
+    except (URLError, web_util.SpackWebError) as url_err:
+        tty.debug('Unable to read index {0}'.format(index_url), url_err)
+        return None
+
+    if compute_hash(index_string) != index_hash:
+        tty.warn('Index {0} does not match its hash'.format(index_url))
+        return None
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        index_path = os.path.join(tmpdir, 'index.json')
+        with open(index_path, 'w') as f:
+            f.write(index_string)
+        db = spack_db.Database(None, db_dir=os.path.join(tmpdir, 'db_root'),
+                               enable_transaction_locking=False)
+        db._read_from_file(index_path)
+        specs = db.query_local(installed=False, in_buildcache=True)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    return dict((s.dag_hash(), s) for s in specs)
+
+
+def _spec_records(spec_dicts):
+    """Records of the specs read from spec files, by DAG hash"""
+    records = {}
+    for spec_url, spec_dict in spec_dicts:
+        s = Spec.from_dict(spec_dict)
+        records[s.dag_hash()] = {
+            'spec_url': spec_url,
+            'spec': s,
+            'num_deps': len(list(s.traverse(root=False))),
+            'binary_cache_checksum': spec_dict['binary_cache_checksum'],
+            'buildinfo': spec_dict['buildinfo'],
+            'buildcache_layout_version': spec_dict.get(
+                'buildcache_layout_version', 0),
+        }
+    return records
+
+
+def generate_package_index(cache_prefix, concurrency=32, jobs=None,
+                           incremental=False, added=None, removed=None,
+                           shards=None):
     """Create the build cache index page.
 
     Creates (or replaces) the "index.json" page at the location given in
     cache_prefix.  This page contains a link for each binary package (.yaml or
     .json) under cache_prefix.
+
+    An incremental update reads the current index, lists the mirror, and
+    only fetches the spec files that are not in the index yet. Spec files
+    replaced with the same DAG hash are only picked up when they are given
+    explicitly, or by a full update. If the index can't be read, it is
+    regenerated from scratch.
+
+    Concurrent updates of the same index are not locked: the last one
+    writes the index, and misses the spec files pushed after it listed
+    the mirror. Those are indexed by the next update.
+
+    Args:
+        cache_prefix (str): URL of the build cache
+        concurrency (int): number of simultaneous requests fetching spec
+            files
+        jobs (int or None): number of processes parsing spec files,
+            ``config:build_jobs`` by default
+        incremental (bool): update the current index instead of
+            regenerating it
+        added (list or None): with ``incremental``, concrete specs pushed
+            to the build cache since the index was written, e.g. by
+            ``spack buildcache create``, whose spec files are read again
+        removed (list or None): with ``incremental``, DAG hashes of the
+            specs removed from the build cache
+        shards (bool or None): also push the index split in shards, see
+            ``_push_index_shards()``. By default, only if the build cache
+            already has a sharded index.
     """
+    timer = Timer()
+
+    index_specs = None
+    if incremental:
+        index_specs = _read_package_index(cache_prefix)
+        if index_specs is None:
+            tty.msg('Regenerating the whole index of {0}'.format(
+                cache_prefix))
+        timer.phase('read index')
+
+    # The mirror is listed after reading the index, even when the pushed
+    # specs are given, so that spec files pushed concurrently by others
+    # since their last update are indexed too.
     try:
-        file_list = (
+        file_list = [
             entry
             for entry in web_util.list_url(cache_prefix)
-            if entry.endswith('.yaml') or entry.endswith('spec.json'))
+            if entry.endswith('.yaml') or entry.endswith('spec.json')]
     except KeyError as inst:
         msg = 'No packages at {0}: {1}'.format(cache_prefix, inst)
         tty.warn(msg)
@@ -729,35 +1621,55 @@ def generate_package_index(cache_prefix):
             cache_prefix, err)
         tty.warn(msg)
         return
+    timer.phase('list')
+
+    spec_urls = [url_util.join(cache_prefix, f) for f in file_list]
+    listed = {}
+    for spec_url in spec_urls:
+        match = _spec_file_hash_re.search(spec_url)
+        listed[match.group(1) if match else spec_url] = spec_url
+
+    if index_specs is not None:
+        # Spec files of the added specs may replace the indexed ones
+        stale = [s.dag_hash() for s in added or []] + list(removed or [])
+        for dag_hash in stale:
+            index_specs.pop(dag_hash, None)
+
+        # Fetch only spec files that are not in the index yet, and
+        # forget specs whose spec file was removed
+        spec_urls = [url for h, url in listed.items()
+                     if h not in index_specs]
+        index_specs = dict((h, s) for h, s in index_specs.items()
+                           if h in listed)
 
     tty.debug('Retrieving spec descriptor files from {0} to build index'.format(
         cache_prefix))
 
-    all_mirror_specs = {}
-
-    for file_path in file_list:
-        try:
-            spec_url = url_util.join(cache_prefix, file_path)
-            tty.debug('fetching {0}'.format(spec_url))
-            _, _, spec_file = web_util.read_from_url(spec_url)
-            spec_file_contents = codecs.getreader('utf-8')(spec_file).read()
-            # Need full spec.json name or this gets confused with index.json.
-            if spec_url.endswith('.json'):
-                spec_dict = sjson.load(spec_file_contents)
-                s = Spec.from_json(spec_file_contents)
-            elif spec_url.endswith('.yaml'):
-                spec_dict = syaml.load(spec_file_contents)
-                s = Spec.from_yaml(spec_file_contents)
-            all_mirror_specs[s.dag_hash()] = {
-                'spec_url': spec_url,
-                'spec': s,
-                'num_deps': len(list(s.traverse(root=False))),
-                'binary_cache_checksum': spec_dict['binary_cache_checksum'],
-                'buildinfo': spec_dict['buildinfo'],
-            }
-        except (URLError, web_util.SpackWebError) as url_err:
-            tty.error('Error reading specfile: {0}'.format(file_path))
-            tty.error(url_err)
+    spec_dicts = _read_spec_files(spec_urls, concurrency, jobs)
+    timer.phase('fetch')
+
+    all_mirror_specs = _spec_records(spec_dicts)
+
+    if index_specs is not None:
+        # Specs depending on the ones just fetched may need to be spliced,
+        # which needs their spec file
+        fetched = set(all_mirror_specs)
+        dependents = [
+            s for h, s in index_specs.items()
+            if h not in fetched and any(
+                d.dag_hash() in fetched for d in s.traverse(root=False))]
+        if dependents:
+            spec_urls = [listed[s.dag_hash()] for s in dependents]
+            spec_dicts = _read_spec_files(spec_urls, concurrency, jobs)
+            all_mirror_specs.update(_spec_records(spec_dicts))
+
+        for dag_hash, s in index_specs.items():
+            if dag_hash not in all_mirror_specs:
+                all_mirror_specs[dag_hash] = {
+                    'spec': s,
+                    'num_deps': len(list(s.traverse(root=False))),
+                }
+    timer.phase('parse')
 
     sorted_specs = sorted(all_mirror_specs.keys(),
                           key=lambda k: all_mirror_specs[k]['num_deps'])
@@ -792,7 +1704,11 @@ def generate_package_index(cache_prefix):
                         if true_dep.full_hash() != dep.full_hash():
                             to_splice.append(true_dep)
 
-                if to_splice:
+                if to_splice and 'spec_url' not in spec_record:
+                    # Read from the previous index, without a spec file
+                    tty.warn('Cannot splice {0}/{1}, its spec file is '
+                             'missing'.format(s.name, dag_hash[:7]))
+                elif to_splice:
                     tty.debug('    needs the following deps spliced:')
                     for true_dep in to_splice:
                         tty.debug('      {0}/{1}'.format(
@@ -803,6 +1719,9 @@ def generate_package_index(cache_prefix):
                     spliced_spec_dict = s.to_dict(hash=ht.full_hash)
                     for key in ['binary_cache_checksum', 'buildinfo']:
                         spliced_spec_dict[key] = spec_record[key]
+                    if spec_record['buildcache_layout_version']:
+                        spliced_spec_dict['buildcache_layout_version'] = \
+                            spec_record['buildcache_layout_version']
 
                     temp_json_path = os.path.join(tmpdir, 'spliced.spec.json')
                     with open(temp_json_path, 'w') as fd:
@@ -824,6 +1743,7 @@ def generate_package_index(cache_prefix):
         index_json_path = os.path.join(db_root_dir, 'index.json')
         with open(index_json_path, 'w') as f:
             db._write_to_file(f)
+        timer.phase('index')
 
         # Read the index back in and compute it's hash
         with open(index_json_path) as f:
@@ -848,6 +1768,20 @@ def generate_package_index(cache_prefix):
             url_util.join(cache_prefix, 'index.json.hash'),
             keep_original=False,
             extra_args={'ContentType': 'text/plain'})
+        timer.phase('push')
+
+        old_manifest = _read_index_manifest(cache_prefix)
+        if shards or (shards is None and old_manifest is not None):
+            _push_index_shards(
+                cache_prefix,
+                [all_mirror_specs[h]['spec'] for h in sorted_specs],
+                os.path.join(tmpdir, 'shards'), old_manifest)
+            timer.phase('shards')
+
+        tty.msg('Indexed {0} specs in {1:.2f}s ({2})'.format(
+            len(all_mirror_specs), timer.total, ', '.join(
+                '{0}: {1:.2f}s'.format(name, seconds)
+                for name, seconds in timer.phases.items())))
     except Exception as err:
         msg = 'Encountered problem pushing package index to {0}: {1}'.format(
             cache_prefix, err)
@@ -923,10 +1857,46 @@ def generate_key_index(key_prefix, tmpdir=None):
 
 
 def build_tarball(spec, outdir, force=False, rel=False, unsigned=False,
-                  allow_root=False, key=None, regenerate_index=False):
+                  allow_root=False, key=None, regenerate_index=False,
+                  compression='gzip'):
     """
     Build a tarball from given spec and put it into the directory structure
     used at the mirror (following <tarball_directory_name>).
+
+    The tarball is compressed with ``compression``, one of ``compressions``.
+    """
+    tmpdir, files, key = _build_tarball_files(
+        spec, outdir, force, rel, unsigned, allow_root, key, compression)
+    try:
+        _push_tarball_files(files)
+
+        # push the key to the build cache's _pgp directory so it can be
+        # imported
+        if not unsigned:
+            push_keys(outdir,
+                      keys=[key],
+                      regenerate_index=regenerate_index,
+                      tmpdir=tmpdir)
+
+        # create an index.json for the build_cache directory so specs can be
+        # found
+        if regenerate_index:
+            generate_package_index(url_util.join(
+                outdir, build_cache_relative_path()))
+    finally:
+        shutil.rmtree(tmpdir)
+
+    return None
+
+
+def _build_tarball_files(spec, outdir, force, rel, unsigned, allow_root, key,
+                         compression):
+    """Create the files of a spec in a build cache, like ``build_tarball``,
+    in a temporary directory.
+
+    Returns:
+        tuple: the temporary directory, the ``(path, url)`` of the files to
+        push to the build cache in ``outdir``, in order, and the signing key
     """
     if not spec.concrete:
         raise ValueError('spec must be concrete to build tarball')
@@ -935,9 +1905,7 @@ def build_tarball(spec, outdir, force=False, rel=False, unsigned=False,
     tmpdir = tempfile.mkdtemp()
     cache_prefix = build_cache_prefix(tmpdir)
 
-    tarfile_name = tarball_name(spec, '.tar.gz')
     tarfile_dir = os.path.join(cache_prefix, tarball_directory_name(spec))
-    tarfile_path = os.path.join(tarfile_dir, tarfile_name)
     spackfile_path = os.path.join(
         cache_prefix, tarball_path_name(spec, '.spack'))
 
@@ -965,13 +1933,15 @@ def build_tarball(spec, outdir, force=False, rel=False, unsigned=False,
     remote_specfile_path_deprecated = url_util.join(
         outdir, os.path.relpath(deprecated_specfile_path,
                                 os.path.realpath(tmpdir)))
+    remote_signed_specfile_path = '%s.sig' % remote_specfile_path
 
     # If force and exists, overwrite. Otherwise raise exception on collision.
     if force:
-        if web_util.url_exists(remote_specfile_path):
-            web_util.remove_url(remote_specfile_path)
-        if web_util.url_exists(remote_specfile_path_deprecated):
-            web_util.remove_url(remote_specfile_path_deprecated)
+        web_util.remove_urls(
+            url for url in (remote_specfile_path,
+                            remote_specfile_path_deprecated,
+                            remote_signed_specfile_path)
+            if web_util.url_exists(url))
     elif (web_util.url_exists(remote_specfile_path) or
             web_util.url_exists(remote_specfile_path_deprecated)):
         raise NoOverwriteException(url_util.format(remote_specfile_path))
@@ -1012,16 +1982,28 @@ def build_tarball(spec, outdir, force=False, rel=False, unsigned=False,
             shutil.rmtree(tmpdir)
             tty.die(e)
 
-    # create gzip compressed tarball of the install prefix
-    with closing(tarfile.open(tarfile_path, 'w:gz')) as tar:
-        tar.add(name='%s' % workdir,
-                arcname='%s' % os.path.basename(spec.prefix))
+    # record where prefixes are in the files to relocate, now that they
+    # don't change anymore
+    write_relocation_offsets(workdir)
+
+    # create the compressed tarball of the install prefix, and get its
+    # sha256 checksum on the way. Archives compressed with zstd can't be
+    # installed by versions of Spack that only know layout 0 anyway.
+    layout_version = config.get('config:buildcache_layout_version', 0)
+    if compression != 'gzip':
+        layout_version = 1
+    if layout_version:
+        checksum = write_archive(
+            workdir, spackfile_path, compression,
+            jobs=config.get('config:build_jobs'))
+    else:
+        tarfile_name = tarball_name(spec, '.tar.gz')
+        tarfile_path = os.path.join(tarfile_dir, tarfile_name)
+        checksum = write_archive(
+            workdir, tarfile_path, arcname=os.path.basename(spec.prefix))
     # remove copy of install directory
     shutil.rmtree(workdir)
 
-    # get the sha256 checksum of the tarball
-    checksum = checksum_tarball(tarfile_path)
-
     # add sha256 checksum to spec.json
 
     with open(spec_file, 'r') as inputfile:
@@ -1045,54 +2027,173 @@ def build_tarball(spec, outdir, force=False, rel=False, unsigned=False,
         spec.prefix, spack.store.layout.root)
     buildinfo['relative_rpaths'] = rel
     spec_dict['buildinfo'] = buildinfo
+    if layout_version:
+        spec_dict['buildcache_layout_version'] = layout_version
 
     with open(specfile_path, 'w') as outfile:
         outfile.write(sjson.dump(spec_dict))
 
-    # sign the tarball and spec file with gpg
+    if not layout_version:
+        # sign the spec file with gpg, and put it in the .spack archive
+        # with its signature and the tarball
+        if not unsigned:
+            key = select_signing_key(key)
+            sign_tarball(key, force, specfile_path)
+        with closing(tarfile.open(spackfile_path, 'w')) as tar:
+            tar.add(name=tarfile_path, arcname=tarfile_name)
+            tar.add(name=specfile_path, arcname=specfile_name)
+            if not unsigned:
+                tar.add(name='%s.asc' % specfile_path,
+                        arcname='%s.asc' % specfile_name)
+        os.remove(tarfile_path)
+        if not unsigned:
+            os.remove('%s.asc' % specfile_path)
+        return tmpdir, [(spackfile_path, remote_spackfile_path),
+                        (specfile_path, remote_specfile_path)], key
+
+    # sign the spec file with gpg, which signs the tarball through its
+    # checksum
     if not unsigned:
         key = select_signing_key(key)
-        sign_tarball(key, force, specfile_path)
-
-    # put tarball, spec and signature files in .spack archive
-    with closing(tarfile.open(spackfile_path, 'w')) as tar:
-        tar.add(name=tarfile_path, arcname='%s' % tarfile_name)
-        tar.add(name=specfile_path, arcname='%s' % specfile_name)
-        if not unsigned:
-            tar.add(name='%s.asc' % specfile_path,
-                    arcname='%s.asc' % specfile_name)
+        sign_specfile(key, force, specfile_path)
 
-    # cleanup file moved to archive
-    os.remove(tarfile_path)
+    files = [(spackfile_path, remote_spackfile_path)]
     if not unsigned:
-        os.remove('%s.asc' % specfile_path)
+        files.append(('%s.sig' % specfile_path, remote_signed_specfile_path))
+    files.append((specfile_path, remote_specfile_path))
+    return tmpdir, files, key
 
-    web_util.push_to_url(
-        spackfile_path, remote_spackfile_path, keep_original=False)
-    web_util.push_to_url(
-        specfile_path, remote_specfile_path, keep_original=False)
 
-    tty.debug('Buildcache for "{0}" written to \n {1}'
-              .format(spec, remote_spackfile_path))
+def _push_tarball_files(files):
+    """Push the files created by ``_build_tarball_files``, in order, so that
+    a spec file is never pushed before its tarball."""
+    for local_path, remote_path in files:
+        web_util.push_to_url(local_path, remote_path, keep_original=False)
+    tty.debug('Buildcache files written to \n {0}'.format(
+        url_util.format(files[0][1])))
 
+
+def _build_tarball_job(args):
+    """Create the build cache files of a spec. Run in a process pool, so
+    errors are returned as messages, as not all exceptions can be pickled.
+
+    Returns:
+        tuple: the spec, what ``_build_tarball_files`` returns, or None, and
+        a warning and an error message, or None
+    """
+    spec = args[0]
+    tty.debug('creating binary cache file for package %s ' % spec.format())
     try:
-        # push the key to the build cache's _pgp directory so it can be
-        # imported
-        if not unsigned:
-            push_keys(outdir,
-                      keys=[key],
-                      regenerate_index=regenerate_index,
-                      tmpdir=tmpdir)
+        return spec, _build_tarball_files(*args), None, None
+    except NoOverwriteException as e:
+        return spec, None, str(e), None
+    except SystemExit:
+        # tty.die() printed the error
+        return spec, None, None, 'see the error above'
+    except Exception as e:
+        return spec, None, None, str(e)
 
-        # create an index.json for the build_cache directory so specs can be
-        # found
-        if regenerate_index:
-            generate_package_index(url_util.join(
-                outdir, os.path.relpath(cache_prefix, tmpdir)))
+
+def _push_tarball_job(tmpdir, files):
+    """Push the files of a spec, then remove them. Run in a thread pool."""
+    try:
+        _push_tarball_files(files)
     finally:
         shutil.rmtree(tmpdir)
 
-    return None
+
+def build_tarballs(specs, outdir, force=False, rel=False, unsigned=False,
+                   allow_root=False, key=None, compression='gzip', jobs=1,
+                   concurrency=32):
+    """Build the tarballs of many specs, like ``build_tarball``.
+
+    Tarballs are created by ``jobs`` processes, and pushed by a pool of
+    threads as soon as they are created, while the next ones are being
+    created. Public keys are pushed once, at the end, but the index of the
+    build cache is not updated.
+
+    A spec that fails doesn't stop the others, but an error is raised once
+    all of them are done.
+
+    Args:
+        specs (list): concrete, installed specs
+        outdir (str): URL of the mirror to push to
+        jobs (int): number of processes creating tarballs
+        concurrency (int): number of simultaneous pushes
+
+    Raises:
+        BuildcacheCreationError: if any tarball can't be created or pushed,
+            with the specs that failed
+    """
+    args = [(spec, outdir, force, rel, unsigned, allow_root, key,
+             compression) for spec in specs]
+
+    # Fork before starting threads. Daemon processes (e.g. other pool
+    # workers) can't have children.
+    jobs = min(jobs, len(specs))
+    pool = None
+    if jobs >= 2 and not multiprocessing.current_process().daemon:
+        pool = spack.subprocess_context.process_pool(jobs)
+    tp = multiprocessing.pool.ThreadPool(processes=concurrency)
+
+    keys, pushes, errors = set(), [], []
+    try:
+        if pool:
+            results = pool.imap_unordered(_build_tarball_job, args)
+        else:
+            results = (_build_tarball_job(a) for a in args)
+
+        for spec, built, warning, error in results:
+            if warning:
+                tty.warn(warning)
+            elif error:
+                errors.append((spec, error))
+            else:
+                tmpdir, files, spec_key = built
+                keys.add(spec_key)
+                pushes.append((spec, tp.apply_async(
+                    _push_tarball_job, (tmpdir, files))))
+
+        for spec, push in pushes:
+            try:
+                push.get()
+            except Exception as e:
+                errors.append((spec, str(e)))
+    finally:
+        tp.close()
+        tp.join()
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    if not unsigned and keys:
+        push_keys(outdir, keys=sorted(keys))
+
+    if errors:
+        raise BuildcacheCreationError(
+            'Could not create the build cache files of {0} specs'.format(
+                len(errors)),
+            '\n    '.join(
+                '{0}: {1}'.format(s.format('{name}{/hash:7}'), e)
+                for s, e in errors),
+            failed_specs=[s for s, _ in errors])
+
+
+def _download_archive_spec_file(spec, cache_url, stagepath):
+    """Download the spec file of an archive of layout 1, which is stored
+    next to it, preferably signed."""
+    for ext in ('.spec.json.sig', '.spec.json'):
+        specfile_name = tarball_name(spec, ext)
+        try:
+            _, _, response = web_util.read_from_url(
+                url_util.join(cache_url, specfile_name))
+        except (URLError, web_util.SpackWebError, HTTPError) as url_err:
+            tty.debug('Did not find {0} on {1}'.format(
+                specfile_name, cache_url), url_err)
+            continue
+        with open(os.path.join(stagepath, specfile_name), 'wb') as f:
+            shutil.copyfileobj(response, f)
+        return
 
 
 def download_tarball(spec, preferred_mirrors=None):
@@ -1116,28 +2217,32 @@ def download_tarball(spec, preferred_mirrors=None):
 
     tarball = tarball_path_name(spec, '.spack')
 
-    urls_to_try = []
+    caches_to_try = []
 
     if preferred_mirrors:
         for preferred_url in preferred_mirrors:
-            urls_to_try.append(url_util.join(
-                preferred_url, _build_cache_relative_path, tarball))
+            caches_to_try.append(url_util.join(
+                preferred_url, _build_cache_relative_path))
 
     for mirror in spack.mirror.MirrorCollection().values():
         if not preferred_mirrors or mirror.fetch_url not in preferred_mirrors:
-            urls_to_try.append(url_util.join(
-                mirror.fetch_url, _build_cache_relative_path, tarball))
+            caches_to_try.append(url_util.join(
+                mirror.fetch_url, _build_cache_relative_path))
 
-    for try_url in urls_to_try:
+    for cache_url in caches_to_try:
         # stage the tarball into standard place
-        stage = Stage(try_url, name="build_cache", keep=True)
+        stage = Stage(url_util.join(cache_url, tarball),
+                      name="build_cache", keep=True)
         stage.create()
         try:
             stage.fetch()
-            return stage.save_filename
         except fs.FetchError:
             continue
 
+        if not _is_nested_archive(stage.save_filename):
+            _download_archive_spec_file(spec, cache_url, stage.path)
+        return stage.save_filename
+
     tty.warn("download_tarball() was unable to download " +
              "{0} from any configured mirrors".format(spec))
     return None
@@ -1253,6 +2358,13 @@ def relocate_package(spec, allow_root):
     def is_backup_file(file):
         return file.endswith('~')
 
+    # Offsets of the prefixes in the files to relocate. Only the files in
+    # there hold prefixes. Older tarballs don't have them.
+    offsets = buildinfo.get('relocate_offsets')
+    if offsets is not None:
+        offsets = dict((os.path.join(workdir, filename), file_offsets)
+                       for filename, file_offsets in offsets.items())
+
     # Text files containing the prefix text
     text_names = list()
     for filename in buildinfo['relocate_textfiles']:
@@ -1260,6 +2372,8 @@ def is_backup_file(file):
         # Don't add backup files generated by filter_file during install step.
         if not is_backup_file(text_name):
             text_names.append(text_name)
+    if offsets is not None:
+        text_names = [name for name in text_names if name in offsets]
 
     # If we are not installing back to the same install tree do the relocation
     if old_prefix != new_prefix:
@@ -1291,36 +2405,92 @@ def is_backup_file(file):
 
         # For all buildcaches
         # relocate the install prefixes in text files including dependencies
-        relocate.relocate_text(text_names, prefix_to_prefix_text)
-
-        paths_to_relocate = [old_prefix, old_layout_root]
-        paths_to_relocate.extend(prefix_to_hash.keys())
-        files_to_relocate = list(filter(
-            lambda pathname: not relocate.file_is_relocatable(
-                pathname, paths_to_relocate=paths_to_relocate),
-            map(lambda filename: os.path.join(workdir, filename),
-                buildinfo['relocate_binaries'])))
+        relocate.relocate_text(
+            text_names, prefix_to_prefix_text, offsets=offsets)
+
+        if offsets is not None:
+            files_to_relocate = [
+                name for name in files_to_relocate if name in offsets]
+        else:
+            paths_to_relocate = [old_prefix, old_layout_root]
+            paths_to_relocate.extend(prefix_to_hash.keys())
+            files_to_relocate = list(filter(
+                lambda pathname: not relocate.file_is_relocatable(
+                    pathname, paths_to_relocate=paths_to_relocate),
+                map(lambda filename: os.path.join(workdir, filename),
+                    buildinfo['relocate_binaries'])))
         # relocate the install prefixes in binary files including dependencies
-        relocate.relocate_text_bin(files_to_relocate, prefix_to_prefix_bin)
+        relocate.relocate_text_bin(
+            files_to_relocate, prefix_to_prefix_bin, offsets=offsets)
 
     # If we are installing back to the same location
     # relocate the sbang location if the spack directory changed
     else:
         if old_spack_prefix != new_spack_prefix:
-            relocate.relocate_text(text_names, prefix_to_prefix_text)
+            relocate.relocate_text(
+                text_names, prefix_to_prefix_text, offsets=offsets)
+
+
+def _read_archive_spec_file(spec, stagepath, unsigned):
+    """Read the spec file of an archive of layout 1, verifying its signature
+    unless ``unsigned``."""
+    specfile_path = os.path.join(stagepath, tarball_name(spec, '.spec.json'))
+    signed_specfile_path = '%s.sig' % specfile_path
+
+    if os.path.exists(signed_specfile_path) and not unsigned:
+        # Only read the text that gpg verified, not what surrounds it
+        suppress = config.get('config:suppress_gpg_warnings', False)
+        spack.util.gpg.verify(signed_specfile_path,
+                              suppress_warnings=suppress,
+                              output=specfile_path)
+        with open(specfile_path, 'r') as inputfile:
+            content = inputfile.read()
+    elif os.path.exists(signed_specfile_path):
+        with open(signed_specfile_path, 'r') as inputfile:
+            content = _clearsigned_text(inputfile.read())
+    elif not unsigned:
+        raise NoVerifyException(
+            "Package spec file failed signature verification.\n"
+            "Use spack buildcache keys to download "
+            "and install a key for verification from the mirror.")
+    elif os.path.exists(specfile_path):
+        with open(specfile_path, 'r') as inputfile:
+            content = inputfile.read()
+    else:
+        raise ValueError('Cannot find spec file for {0}.'.format(stagepath))
 
+    spec_dict = sjson.load(content)
+    layout_version = spec_dict.get('buildcache_layout_version', 0)
+    if layout_version > _buildcache_layout_version:
+        raise UnsupportedArchiveException(
+            'Buildcache archive of {0} has layout {1}, which needs a newer '
+            'Spack.'.format(spec.format('{name}/{hash:7}'), layout_version))
+    return spec_dict
 
-def extract_tarball(spec, filename, allow_root=False, unsigned=False,
-                    force=False):
-    """
-    extract binary tarball for given package into install area
-    """
-    if os.path.exists(spec.prefix):
-        if force:
-            shutil.rmtree(spec.prefix)
-        else:
-            raise NoOverwriteException(str(spec.prefix))
 
+def _extract_archive(spec, filename, unsigned):
+    """Extract an archive of layout 1 straight into the prefix of ``spec``,
+    verifying its checksum on the way."""
+    stagepath = os.path.dirname(filename)
+    spec_dict = _read_archive_spec_file(spec, stagepath, unsigned)
+    bchecksum = spec_dict['binary_cache_checksum']
+
+    buildinfo = spec_dict.get('buildinfo', {})
+    tty.debug('old relative prefix %s\nnew relative prefix %s' % (
+        buildinfo.get('relative_prefix'),
+        os.path.relpath(spec.prefix, spack.store.layout.root)))
+
+    with open(filename, 'rb') as f:
+        extract_archive(f, spec.prefix, bchecksum['hash'])
+
+    for ext in ('.spec.json', '.spec.json.sig'):
+        path = os.path.join(stagepath, tarball_name(spec, ext))
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _extract_nested_tarball(spec, filename, unsigned):
+    """Extract an archive of layout 0 into the prefix of ``spec``."""
     tmpdir = tempfile.mkdtemp()
     stagepath = os.path.dirname(filename)
     spackfile_name = tarball_name(spec, '.spack')
@@ -1424,8 +2594,24 @@ def extract_tarball(spec, filename, allow_root=False, unsigned=False,
     os.remove(temp_tarfile_path)
 
     # cleanup
-    os.remove(tarfile_path)
-    os.remove(specfile_path)
+    shutil.rmtree(tmpdir)
+
+
+def extract_tarball(spec, filename, allow_root=False, unsigned=False,
+                    force=False):
+    """
+    extract binary tarball for given package into install area
+    """
+    if os.path.exists(spec.prefix):
+        if force:
+            shutil.rmtree(spec.prefix)
+        else:
+            raise NoOverwriteException(str(spec.prefix))
+
+    if _is_nested_archive(filename):
+        _extract_nested_tarball(spec, filename, unsigned)
+    else:
+        _extract_archive(spec, filename, unsigned)
 
     try:
         relocate_package(spec, allow_root)
@@ -1440,7 +2626,6 @@ def extract_tarball(spec, filename, allow_root=False, unsigned=False,
             spec_id = spec.format('{name}/{hash:7}')
             tty.warn('No manifest file in tarball for spec %s' % spec_id)
     finally:
-        shutil.rmtree(tmpdir)
         if os.path.exists(filename):
             os.remove(filename)
 
@@ -77,7 +77,6 @@
     validate,
 )
 from spack.util.executable import Executable
-from spack.util.log_parse import make_log_context, parse_log_events
 from spack.util.module_cmd import load_module, module, path_from_modules
 from spack.util.string import plural
 
@@ -1345,6 +1344,8 @@ def _make_stop_phase(msg, long_msg):
 
 
 def write_log_summary(out, log_type, log, last=None):
+    from spack.util.log_parse import make_log_context, parse_log_events
+
     errors, warnings = parse_log_events(log)
     nerr = len(errors)
     nwar = len(warnings)
@@ -1124,8 +1124,10 @@ def generate_gitlab_ci_yaml(env, print_summary, output_file,
             error_msg += '* {0}\n'.format(broken_spec)
         tty.die(error_msg)
 
+    # The pipeline is machine-generated, and can be large, so write it
+    # without the overhead of round-trip dumping
     with open(output_file, 'w') as outf:
-        outf.write(syaml.dump_config(sorted_output, default_flow_style=True))
+        outf.write(syaml.dump(sorted_output, default_flow_style=True))
 
 
 def url_encode_string(input_string):
@@ -73,11 +73,20 @@ def setup_parser(subparser):
                         help="URL of the mirror where " +
                              "buildcaches will be written.")
     create.add_argument('--rebuild-index', action='store_true',
-                        default=False, help="Regenerate buildcache index " +
+                        default=False, help="Update buildcache index " +
                                             "after building package(s)")
     create.add_argument('--spec-file', default=None,
                         help=('Create buildcache entry for spec from json or ' +
                               'yaml file'))
+    create.add_argument('--compression', default='gzip',
+                        choices=bindist.compressions,
+                        help="compression of the tarballs. zstd needs the "
+                             "zstandard Python module to create and install "
+                             "them.")
+    # Specs are packaged one at a time, unless -j is given. Tarballs are
+    # pushed while the next ones are created.
+    arguments.add_common_arguments(create, ['jobs'])
+    create.set_defaults(jobs=1)
     create.add_argument('--only', default='package,dependencies',
                         dest='things_to_install',
                         choices=['package', 'dependencies'],
@@ -273,6 +282,14 @@ def setup_parser(subparser):
     update_index.add_argument(
         '-k', '--keys', default=False, action='store_true',
         help='If provided, key index will be updated as well as package index')
+    update_index.add_argument(
+        '--incremental', action='store_true', default=False,
+        help='only read spec files that are not in the current index')
+    update_index.add_argument(
+        '--shards', action='store_true', default=None,
+        help='also write the index split in shards, so that clients can '
+        'fetch only the part of the index they need')
+    arguments.add_common_arguments(update_index, ['jobs'])
     update_index.set_defaults(func=buildcache_update_index)
 
 
@@ -374,7 +391,8 @@ def match_downloaded_specs(pkgs, allow_multiple_matches=False, force=False,
 def _createtarball(env, spec_file=None, packages=None, add_spec=True,
                    add_deps=True, output_location=os.getcwd(),
                    signing_key=None, force=False, make_relative=False,
-                   unsigned=False, allow_root=False, rebuild_index=False):
+                   unsigned=False, allow_root=False, rebuild_index=False,
+                   compression='gzip', jobs=1):
     if spec_file:
         with open(spec_file, 'r') as fd:
             specfile_contents = fd.read()
@@ -451,14 +469,30 @@ def _createtarball(env, spec_file=None, packages=None, add_spec=True,
 
     tty.debug('writing tarballs to %s/build_cache' % outdir)
 
-    for spec in specs:
-        tty.debug('creating binary cache file for package %s ' % spec.format())
-        try:
-            bindist.build_tarball(spec, outdir, force, make_relative,
-                                  unsigned, allow_root, signing_key,
-                                  rebuild_index)
-        except bindist.NoOverwriteException as e:
-            tty.warn(e)
+    try:
+        bindist.build_tarballs(list(specs), outdir, force, make_relative,
+                               unsigned, allow_root, signing_key,
+                               compression=compression, jobs=jobs)
+    except bindist.BuildcacheCreationError as e:
+        # Index the specs that were pushed before failing
+        if rebuild_index:
+            _update_indexes(outdir, unsigned, [
+                s for s in specs if s not in e.failed_specs])
+        raise
+
+    if rebuild_index:
+        _update_indexes(outdir, unsigned, list(specs))
+
+
+def _update_indexes(outdir, unsigned, specs):
+    """Update the indexes of a build cache once, with just these specs"""
+    if not specs:
+        return
+    cache_url = url_util.join(outdir, bindist.build_cache_relative_path())
+    bindist.generate_package_index(cache_url, incremental=True, added=specs)
+    if not unsigned:
+        bindist.generate_key_index(url_util.join(
+            cache_url, bindist.build_cache_keys_relative_path()))
 
 
 def createtarball(args):
@@ -502,6 +536,7 @@ def createtarball(args):
         if scheme == '<missing>':
             raise ValueError(
                 '"{url}" is not a valid URL'.format(url=output_location))
+
     add_spec = ('package' in args.things_to_install)
     add_deps = ('dependencies' in args.things_to_install)
 
@@ -510,7 +545,8 @@ def createtarball(args):
                    output_location=output_location, signing_key=args.key,
                    force=args.force, make_relative=args.rel,
                    unsigned=args.unsigned, allow_root=args.allow_root,
-                   rebuild_index=args.rebuild_index)
+                   rebuild_index=args.rebuild_index,
+                   compression=args.compression, jobs=args.jobs)
 
 
 def installtarball(args):
@@ -651,6 +687,10 @@ def download_buildcache_files(concrete_spec, local_dest, require_cdashid,
                     bindist.tarball_name(concrete_spec, '.spec.yaml')],
             'path': local_dest,
             'required': True,
+        }, {
+            'url': [bindist.tarball_name(concrete_spec, '.spec.json.sig')],
+            'path': local_dest,
+            'required': False,
         }, {
             'url': [bindist.tarball_name(concrete_spec, '.cdashid')],
             'path': local_dest,
@@ -806,6 +846,13 @@ def buildcache_copy(args):
     specfile_src_path_yaml = os.path.join(args.base_dir, specfile_rel_path)
     specfile_dest_path_yaml = os.path.join(dest_root_path, specfile_rel_path)
 
+    signed_specfile_rel_path = os.path.join(
+        build_cache_dir, bindist.tarball_name(spec, '.spec.json.sig'))
+    signed_specfile_src_path = os.path.join(
+        args.base_dir, signed_specfile_rel_path)
+    signed_specfile_dest_path = os.path.join(
+        dest_root_path, signed_specfile_rel_path)
+
     cdashidfile_rel_path = os.path.join(
         build_cache_dir, bindist.tarball_name(spec, '.cdashid'))
     cdashid_src_path = os.path.join(args.base_dir, cdashidfile_rel_path)
@@ -824,6 +871,11 @@ def buildcache_copy(args):
     tty.msg('Copying {0}'.format(specfile_rel_path_yaml))
     shutil.copyfile(specfile_src_path_yaml, specfile_dest_path_yaml)
 
+    # Copy the signed specfile (if exists) to the destination mirror
+    if os.path.exists(signed_specfile_src_path):
+        tty.msg('Copying {0}'.format(signed_specfile_rel_path))
+        shutil.copyfile(signed_specfile_src_path, signed_specfile_dest_path)
+
     # Copy the cdashid file (if exists) to the destination mirror
     if os.path.exists(cdashid_src_path):
         tty.msg('Copying {0}'.format(cdashidfile_rel_path))
@@ -913,6 +965,8 @@ def buildcache_sync(args):
                 build_cache_dir, bindist.tarball_name(s, '.spec.yaml')),
             os.path.join(
                 build_cache_dir, bindist.tarball_name(s, '.spec.json')),
+            os.path.join(
+                build_cache_dir, bindist.tarball_name(s, '.spec.json.sig')),
             os.path.join(
                 build_cache_dir, bindist.tarball_name(s, '.cdashid'))
         ])
@@ -949,12 +1003,14 @@ def buildcache_sync(args):
         shutil.rmtree(tmpdir)
 
 
-def update_index(mirror_url, update_keys=False):
+def update_index(mirror_url, update_keys=False, incremental=False,
+                 shards=None):
     mirror = spack.mirror.MirrorCollection().lookup(mirror_url)
     outdir = url_util.format(mirror.push_url)
 
     bindist.generate_package_index(
-        url_util.join(outdir, bindist.build_cache_relative_path()))
+        url_util.join(outdir, bindist.build_cache_relative_path()),
+        incremental=incremental, shards=shards)
 
     if update_keys:
         keys_url = url_util.join(outdir,
@@ -970,7 +1026,8 @@ def buildcache_update_index(args):
     if args.mirror_url:
         outdir = args.mirror_url
 
-    update_index(outdir, update_keys=args.keys)
+    update_index(outdir, update_keys=args.keys, incremental=args.incremental,
+                 shards=args.shards)
 
 
 def buildcache(parser, args):
@@ -85,6 +85,7 @@ def clean(parser, args):
     if args.misc_cache:
         tty.msg('Removing cached information on repositories')
         spack.caches.misc_cache.destroy()
+        shutil.rmtree(spack.config.config_cache_path, ignore_errors=True)
 
     if args.python_cache:
         tty.msg('Removing python cache files')
@@ -21,6 +21,7 @@
 from llnl.util.tty.colify import colify
 
 import spack.cmd
+import spack.completion
 import spack.main
 import spack.paths
 from spack.main import section_descriptions
@@ -58,6 +59,10 @@ def setup_parser(subparser):
     subparser.add_argument(
         "--update-completion", action='store_true', default=False,
         help="regenerate spack's tab completion scripts")
+    subparser.add_argument(
+        "--update-completion-cache", action='store_true', default=False,
+        help="update out of date lists of words in the cache of the tab "
+        "completion scripts, and print its location")
 
     subparser.add_argument(
         '-a', '--aliases', action='store_true', default=False,
@@ -291,7 +296,11 @@ def update_completion(parser, args):
 
 
 def commands(parser, args):
-    if args.update_completion:
+    if args.update_completion_cache:
+        spack.completion.update()
+        print(spack.completion.cache_dir())
+
+    elif args.update_completion:
         if args.format != 'names' or any([
                 args.aliases, args.update, args.header
         ]):
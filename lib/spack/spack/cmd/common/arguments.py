@@ -10,7 +10,6 @@
 import spack.config
 import spack.dependency as dep
 import spack.environment as ev
-import spack.modules
 import spack.spec
 import spack.store
 from spack.util.pattern import Args
@@ -106,6 +105,21 @@ def __call__(self, parser, namespace, jobs, option_string):
         setattr(namespace, 'jobs', jobs)
 
 
+class ReuseConcreteSpecs(argparse.Action):
+    """Lets the concretizer reuse installed and buildcache specs.
+
+    The value is set in the command line configuration scope so that
+    it can be retrieved using the spack.config API.
+    """
+    def __init__(self, option_strings, dest, **kwargs):
+        kwargs['nargs'] = 0
+        super(ReuseConcreteSpecs, self).__init__(option_strings, dest, **kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        spack.config.set('concretizer:reuse', True, scope='command_line')
+        setattr(namespace, self.dest, True)
+
+
 class DeptypeAction(argparse.Action):
     """Creates a tuple of valid dependency types from a deptype argument."""
     def __call__(self, parser, namespace, values, option_string=None):
@@ -248,6 +262,14 @@ def jobs():
         help='explicitly set number of parallel jobs')
 
 
+@arg
+def reuse():
+    return Args(
+        '--reuse', action=ReuseConcreteSpecs, dest='reuse', default=False,
+        help='reuse installed packages and buildcache specs whenever '
+        'possible, rather than building new ones (clingo only)')
+
+
 @arg
 def install_status():
     return Args(
@@ -0,0 +1,142 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+from __future__ import print_function
+
+import datetime
+import os
+import signal
+import sys
+import traceback
+
+import llnl.util.filesystem as fs
+import llnl.util.tty as tty
+
+import spack.daemon
+
+description = "run a server that speeds up read-only commands"
+section = "system"
+level = "long"
+
+
+def setup_parser(subparser):
+    sp = subparser.add_subparsers(
+        metavar='SUBCOMMAND', dest='daemon_command')
+
+    start = sp.add_parser('start', help='start a daemon for this user')
+    start.add_argument(
+        '-f', '--foreground', action='store_true',
+        help="don't detach from the terminal")
+    start.add_argument(
+        '-t', '--timeout', type=float, default=3600,
+        help='exit after this many seconds without requests, 0 to never '
+        'exit (default: %(default)s)')
+
+    sp.add_parser('stop', help='stop the daemon of this user')
+    sp.add_parser('status', help='show whether a daemon is running')
+
+
+def daemon_start(args):
+    if sys.version_info < (3, 3):
+        tty.die('spack daemon needs Python 3.3 or later')
+
+    current = spack.daemon.status()
+    if current:
+        tty.die('A daemon is already running with pid {0}'.format(
+            current['pid']))
+
+    server = spack.daemon.Daemon(
+        spack.daemon.socket_path(), timeout=args.timeout or None)
+
+    # Clean up the socket also when terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if args.foreground:
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    log_path = os.path.splitext(server.path)[0] + '.log'
+    read_end, write_end = os.pipe()
+    if _detach(log_path):
+        os.close(read_end)
+        returncode = 1
+        try:
+            server.serve(ready=lambda: os.close(write_end))
+            returncode = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(returncode)
+
+    # Wait until the daemon is listening, or has died. This may take a
+    # few seconds, to load Spack's state.
+    os.close(write_end)
+    with os.fdopen(read_end) as ready:
+        ready.read()
+
+    current = spack.daemon.status()
+    if not current:
+        tty.die('The daemon did not start, see {0}'.format(log_path))
+    tty.msg('Started daemon with pid {0}'.format(current['pid']),
+            'Log file: {0}'.format(log_path))
+
+
+def _detach(log_path):
+    """Fork a process detached from the terminal, writing to ``log_path``.
+
+    Returns:
+        (bool): True in the detached process, False in the caller
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return False
+
+    os.setsid()
+    if os.fork():
+        os._exit(0)
+
+    fs.mkdirp(os.path.dirname(log_path), mode=0o700)
+    log = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    null = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null, 0)
+    os.dup2(log, 1)
+    os.dup2(log, 2)
+    os.close(null)
+    os.close(log)
+    os.chdir('/')
+    return True
+
+
+def daemon_stop(args):
+    current = spack.daemon.stop()
+    if not current:
+        tty.msg('No daemon is running')
+        return
+    tty.msg('Stopped daemon with pid {0}'.format(current['pid']))
+
+
+def daemon_status(args):
+    current = spack.daemon.status()
+    if not current:
+        tty.msg('No daemon is running')
+        return
+    started = datetime.datetime.fromtimestamp(current['started'])
+    print('pid:      {0}'.format(current['pid']))
+    print('socket:   {0}'.format(spack.daemon.socket_path()))
+    print('started:  {0}'.format(started.strftime('%Y-%m-%d %H:%M:%S')))
+    print('commands: {0}'.format(current['served']))
+
+
+def daemon(parser, args):
+    action = {
+        'start': daemon_start,
+        'stop': daemon_stop,
+        'status': daemon_status,
+    }
+    action[args.daemon_command](args)
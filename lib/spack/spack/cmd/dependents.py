@@ -39,7 +39,9 @@ def inverted_dependencies():
        actual dependents.
     """
     dag = {}
-    for pkg in spack.repo.path.all_packages():
+    metadata_index = spack.repo.path.metadata_index
+    for pkg_name in spack.repo.path.all_package_names():
+        pkg = metadata_index[pkg_name]
         dag.setdefault(pkg.name, set())
         for dep in pkg.dependencies:
             deps = [dep]
@@ -14,7 +14,6 @@
 from llnl.util.tty.colify import colify
 
 import spack.cmd.common.arguments as arguments
-import spack.fetch_strategy as fs
 import spack.repo
 import spack.spec
 
@@ -134,7 +133,11 @@ def lines(self):
 
 
 def print_text_info(pkg):
-    """Print out a plain text description of a package."""
+    """Print out a plain text description of a package.
+
+    Args:
+        pkg (spack.metadata_index.PackageMetadata): metadata of the package
+    """
 
     header = section_title(
         '{0}:   '
@@ -143,7 +146,7 @@ def print_text_info(pkg):
 
     color.cprint('')
     color.cprint(section_title('Description:'))
-    if pkg.__doc__:
+    if pkg.description:
         color.cprint(color.cescape(pkg.format_doc(indent=4)))
     else:
         color.cprint("    None")
@@ -159,13 +162,8 @@ def print_text_info(pkg):
     color.cprint(section_title('Externally Detectable: '))
 
     # If the package has an 'executables' field, it can detect an installation
-    if hasattr(pkg, 'executables'):
-        find_attributes = []
-        if hasattr(pkg, 'determine_version'):
-            find_attributes.append('version')
-
-        if hasattr(pkg, 'determine_variants'):
-            find_attributes.append('variants')
+    if pkg.detectable is not None:
+        find_attributes = pkg.detectable
 
         # If the package does not define 'determine_version' nor
         # 'determine_variants', then it must use some custom detection
@@ -177,7 +175,7 @@ def print_text_info(pkg):
 
     color.cprint('')
     color.cprint(section_title("Tags: "))
-    if hasattr(pkg, 'tags'):
+    if pkg.has_tags:
         tags = sorted(pkg.tags)
         colify(tags, indent=4)
     else:
@@ -186,7 +184,8 @@ def print_text_info(pkg):
     color.cprint('')
     color.cprint(section_title('Preferred version:  '))
 
-    if not pkg.versions:
+    versions = pkg.versions
+    if not versions:
         color.cprint(version('    None'))
         color.cprint('')
         color.cprint(section_title('Safe versions:  '))
@@ -195,28 +194,25 @@ def print_text_info(pkg):
         color.cprint(section_title('Deprecated versions:  '))
         color.cprint(version('    None'))
     else:
-        pad = padder(pkg.versions, 4)
+        pad = padder(versions, 4)
 
         # Here we sort first on the fact that a version is marked
         # as preferred in the package, then on the fact that the
         # version is not develop, then lexicographically
-        key_fn = lambda v: (pkg.versions[v].get('preferred', False),
+        key_fn = lambda v: (versions[v].get('preferred', False),
                             not v.isdevelop(),
                             v)
-        preferred = sorted(pkg.versions, key=key_fn).pop()
-        url = ''
-        if pkg.has_code:
-            url = fs.for_package_version(pkg, preferred)
+        preferred = sorted(versions, key=key_fn).pop()
+        url = pkg.fetch_url(preferred)
 
         line = version('    {0}'.format(pad(preferred))) + color.cescape(url)
         color.cprint(line)
 
         safe = []
         deprecated = []
-        for v in reversed(sorted(pkg.versions)):
-            if pkg.has_code:
-                url = fs.for_package_version(pkg, v)
-            if pkg.versions[v].get('deprecated', False):
+        for v in reversed(sorted(versions)):
+            url = pkg.fetch_url(v)
+            if versions[v].get('deprecated', False):
                 deprecated.append((v, url))
             else:
                 safe.append((v, url))
@@ -239,7 +235,7 @@ def print_text_info(pkg):
     for line in formatter.lines:
         color.cprint(line)
 
-    if hasattr(pkg, 'phases') and pkg.phases:
+    if pkg.phases:
         color.cprint('')
         color.cprint(section_title('Installation Phases:'))
         phase_str = ''
@@ -278,5 +274,5 @@ def print_text_info(pkg):
 
 
 def info(parser, args):
-    pkg = spack.repo.get(args.package)
+    pkg = spack.repo.path.get_metadata(args.package)
     print_text_info(pkg)
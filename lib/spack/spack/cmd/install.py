@@ -128,7 +128,8 @@ def setup_parser(subparser):
     subparser.add_argument(
         '--source', action='store_true', dest='install_source',
         help="install source files in prefix")
-    arguments.add_common_arguments(subparser, ['no_checksum', 'deprecated'])
+    arguments.add_common_arguments(
+        subparser, ['no_checksum', 'deprecated', 'reuse'])
     subparser.add_argument(
         '-v', '--verbose', action='store_true',
         help="display verbose build output while installing")
@@ -76,7 +76,8 @@ def load(parser, args):
 
         env_mod = spack.util.environment.EnvironmentModifications()
         for spec in specs:
-            env_mod.extend(uenv.environment_modifications_for_spec(spec))
+            env_mod.extend(uenv.environment_modifications_for_spec(
+                spec, use_cache=True))
             env_mod.prepend_path(uenv.spack_loaded_hashes_var, spec.dag_hash())
         cmds = env_mod.shell_modifications(args.shell)
 
@@ -6,10 +6,15 @@
 from __future__ import print_function
 
 import os
+import subprocess
+import sys
 
 import llnl.util.tty as tty
 
+import spack.cmd.common.arguments as arguments
 import spack.config
+import spack.environment as ev
+import spack.paths
 import spack.repo
 import spack.util.path
 
@@ -46,6 +51,17 @@ def setup_parser(subparser):
         '--scope', choices=scopes, metavar=scopes_metavar,
         default=spack.config.default_modify_scope(),
         help="configuration scope to modify")
+    add_parser.add_argument(
+        '--no-reindex', action='store_false', dest='reindex',
+        help="don't index the packages of the repository in the background")
+
+    # Reindex
+    reindex_parser = sp.add_parser('reindex', help=repo_reindex.__doc__)
+    reindex_parser.add_argument(
+        'namespace_or_path', nargs='*',
+        help="namespaces or paths of repositories to reindex "
+        "(default: all registered repositories)")
+    arguments.add_common_arguments(reindex_parser, ['jobs'])
 
     # Remove
     remove_parser = sp.add_parser(
@@ -99,6 +115,23 @@ def repo_add(args):
     spack.config.set('repos', repos, args.scope)
     tty.msg("Added repo with namespace '%s'." % repo.namespace)
 
+    # Build the indexes of the new repository in the background, so that
+    # the next command doesn't have to import all of its packages. The
+    # repository may have been added to a command line or environment
+    # scope, so the reindexing command needs to see the same scopes.
+    if args.reindex:
+        command = [sys.executable, spack.paths.spack_script]
+        for path in spack.config.command_line_scopes:
+            command.extend(['-C', path])
+        env = ev.active_environment()
+        if env:
+            command.extend(['-D', env.path])
+        command.extend(['repo', 'reindex', repo.root])
+        with open(os.devnull, 'w') as devnull:
+            subprocess.Popen(
+                command, stdin=devnull, stdout=devnull, stderr=devnull,
+                close_fds=True)
+
 
 def repo_remove(args):
     """Remove a repository from Spack's configuration."""
@@ -132,6 +165,29 @@ def repo_remove(args):
             % namespace_or_path)
 
 
+def repo_reindex(args):
+    """Update the package indexes of repositories."""
+    repos = spack.repo.path.repos
+    if args.namespace_or_path:
+        selected = []
+        for namespace_or_path in args.namespace_or_path:
+            canon_path = spack.util.path.canonicalize_path(namespace_or_path)
+            matches = [
+                r for r in repos
+                if namespace_or_path == r.namespace or canon_path == r.root
+            ]
+            if not matches:
+                tty.die("No registered repository with path or namespace: %s"
+                        % namespace_or_path)
+            selected.extend(m for m in matches if m not in selected)
+        repos = selected
+
+    for repo in repos:
+        pkg_names = repo.index.update(jobs=args.jobs)
+        tty.msg("Reindexed %d packages in repo '%s'."
+                % (len(pkg_names), repo.namespace))
+
+
 def repo_list(args):
     """Show registered repositories and their namespaces."""
     roots = spack.config.get('repos', scope=args.scope)
@@ -159,6 +215,7 @@ def repo(parser, args):
     action = {'create': repo_create,
               'list': repo_list,
               'add': repo_add,
+              'reindex': repo_reindex,
               'remove': repo_remove,
               'rm': repo_remove}
     action[args.repo_command](args)
@@ -24,7 +24,7 @@
 level = 'long'
 
 #: output options
-show_options = ('asp', 'opt', 'output', 'solutions')
+show_options = ('asp', 'opt', 'output', 'progress', 'solutions')
 
 
 def setup_parser(subparser):
@@ -35,6 +35,7 @@ def setup_parser(subparser):
         "  asp          asp program text\n"
         "  opt          optimization criteria for best model\n"
         "  output       raw clingo output\n"
+        "  progress     cost of each model found during optimization\n"
         "  solutions    models found by asp program\n"
         "  all          all of the above"
     )
@@ -67,6 +68,7 @@ def setup_parser(subparser):
     subparser.add_argument(
         '--stats', action='store_true', default=False,
         help='print out statistics from clingo')
+    arguments.add_common_arguments(subparser, ['reuse'])
     subparser.add_argument(
         'specs', nargs=argparse.REMAINDER, help="specs of packages")
 
@@ -105,6 +107,15 @@ def solve(parser, args):
     result = asp.solve(
         specs, dump=dump, models=models, timers=args.timers, stats=args.stats
     )
+    if 'progress' in dump and result.optimization_steps:
+        tty.msg("Optimization progress (%d threads, %s configuration):" % (
+            asp.solver_threads(), asp.solver_configuration()))
+        color.cprint("@*{  Model    Time (s)  Cost}")
+        for i, (elapsed, cost) in enumerate(result.optimization_steps):
+            color.cprint("  @K{%-8d} %8.2f  %s" % (
+                i + 1, elapsed, ' '.join(str(c) for c in cost)))
+        print()
+
     if 'solutions' not in dump:
         return
 
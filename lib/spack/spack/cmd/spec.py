@@ -49,7 +49,7 @@ def setup_parser(subparser):
     subparser.add_argument(
         '-t', '--types', action='store_true', default=False,
         help='show dependency types')
-    arguments.add_common_arguments(subparser, ['specs'])
+    arguments.add_common_arguments(subparser, ['reuse', 'specs'])
 
 
 @contextlib.contextmanager
@@ -62,7 +62,8 @@ def unload(parser, args):
     env_mod = spack.util.environment.EnvironmentModifications()
     for spec in specs:
         env_mod.extend(
-            uenv.environment_modifications_for_spec(spec).reversed())
+            uenv.environment_modifications_for_spec(
+                spec, use_cache=True).reversed())
         env_mod.remove_path(uenv.spack_loaded_hashes_var, spec.dag_hash())
     cmds = env_mod.shell_modifications(args.shell)
 
@@ -39,14 +39,19 @@ def setup_parser(subparser):
 
 
 def versions(parser, args):
-    pkg = spack.repo.get(args.package)
-
-    safe_versions = pkg.versions
-
     if args.safe_only:
         tty.warn('"--safe-only" is deprecated. Use "--safe" instead.')
         args.safe = args.safe_only
 
+    if args.safe:
+        # Checksummed versions can be listed from the metadata index,
+        # without importing the package
+        pkg = spack.repo.path.get_metadata(args.package)
+    else:
+        pkg = spack.repo.get(args.package)
+
+    safe_versions = pkg.versions
+
     if not (args.remote or args.new):
         if sys.stdout.isatty():
             tty.msg('Safe versions (already checksummed):')
@@ -4,7 +4,9 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 import contextlib
+import hashlib
 import itertools
+import json
 import os
 import platform
 import re
@@ -14,9 +16,14 @@
 
 import llnl.util.lang
 import llnl.util.tty as tty
-from llnl.util.filesystem import path_contains_subdirectory, paths_containing_libs
+from llnl.util.filesystem import (
+    mkdirp,
+    path_contains_subdirectory,
+    paths_containing_libs,
+)
 
 import spack.architecture
+import spack.caches
 import spack.compilers
 import spack.error
 import spack.spec
@@ -43,8 +50,61 @@ def _get_compiler_version_output(compiler_path, version_arg, ignore_errors=()):
     return output
 
 
+#: Version of the format of cached compiler output
+_output_cache_version = 1
+
+
+def _output_cache_file(compiler_path, version_arg, ignore_errors=()):
+    """Path of the cached output of a compiler, or None if it can't be
+    cached.
+
+    Entries are keyed by the path, which matters for symlinks to
+    wrappers like ccache, and by the real path, inode, size and
+    modification time of the executable, so that compilers are probed
+    again only when they change.
+    """
+    try:
+        realpath = os.path.realpath(compiler_path)
+        st = os.stat(realpath)
+    except OSError:
+        return None
+
+    key = [_output_cache_version, compiler_path, realpath, st.st_ino,
+           st.st_size, st.st_mtime, version_arg, list(ignore_errors)]
+    key = hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+    return os.path.join(
+        spack.caches.misc_cache.root, 'compiler-output', key + '.json')
+
+
+def _read_output_cache(path):
+    """Return cached output, or raise KeyError if there is none."""
+    try:
+        with open(path) as f:
+            return json.load(f)['output']
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        raise KeyError(path)
+
+
+def _write_output_cache(path, output):
+    """Store the output of a compiler. Entries are written atomically,
+    since detection runs in many threads at once."""
+    try:
+        mkdirp(os.path.dirname(path))
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'output': output}, f)
+        os.rename(tmp, path)
+    except (IOError, OSError) as e:
+        tty.debug('Could not cache compiler output: {0}'.format(e))
+
+
 def get_compiler_version_output(compiler_path, *args, **kwargs):
-    """Wrapper for _get_compiler_version_output()."""
+    """Wrapper for _get_compiler_version_output().
+
+    The output is also cached across Spack processes, and reused as long
+    as the executable doesn't change. Errors are not cached, since they
+    may be transient, e.g. when a license server is unreachable.
+    """
     # This ensures that we memoize compiler output by *absolute path*,
     # not just executable name. If we don't do this, and the path changes
     # (e.g., during testing), we can get incorrect results.
@@ -52,7 +112,17 @@ def get_compiler_version_output(compiler_path, *args, **kwargs):
         compiler_path = spack.util.executable.which_string(
             compiler_path, required=True)
 
-    return _get_compiler_version_output(compiler_path, *args, **kwargs)
+    cache_file = _output_cache_file(compiler_path, *args, **kwargs)
+    if cache_file:
+        try:
+            return _read_output_cache(cache_file)
+        except KeyError:
+            pass
+
+    output = _get_compiler_version_output(compiler_path, *args, **kwargs)
+    if cache_file:
+        _write_output_cache(cache_file, output)
+    return output
 
 
 def tokenize_flags(flags_str):
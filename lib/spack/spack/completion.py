@@ -0,0 +1,143 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Cache of the words completed by Spack's shell completion scripts.
+
+Completing command, package or environment names would otherwise start
+Spack on every TAB. Instead, each list of words is stored in a plain file
+under ``<misc_cache>/completion``, next to a ``.deps`` file listing the
+paths it was computed from. The completion functions read the words
+directly, and only run ``spack commands --update-completion-cache`` when
+one of these paths was modified after the list was written.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from llnl.util.filesystem import mkdirp
+
+import spack.caches
+import spack.cmd
+import spack.config
+import spack.environment as ev
+import spack.extensions
+import spack.paths
+import spack.repo
+import spack.store
+
+
+def cache_dir():
+    """Directory of the completion cache of this Spack instance.
+
+    The misc cache may be shared by several Spack instances, which have
+    different commands and packages, so the cache is per instance.
+    """
+    key = hashlib.sha1(spack.paths.prefix.encode('utf-8')).hexdigest()
+    return os.path.join(
+        spack.caches.misc_cache.root, 'completion', key[:8])
+
+
+def _config_paths():
+    """Configuration scopes and files, which may change any list."""
+    paths = []
+    for scope in spack.config.config.file_scopes:
+        paths.append(scope.path)
+        if os.path.isdir(scope.path):
+            paths.extend(os.path.join(scope.path, section + '.yaml')
+                         for section in spack.config.section_schemas)
+    return [p for p in paths if os.path.exists(p)]
+
+
+def _commands():
+    paths = [spack.paths.command_path] + spack.extensions.get_command_paths()
+    return spack.cmd.all_commands(), paths + _config_paths()
+
+
+def _packages():
+    paths = [repo.packages_path for repo in spack.repo.path.repos]
+    return spack.repo.path.all_package_names(), paths + _config_paths()
+
+
+def _installed():
+    # The whole index is rewritten on every change
+    dbs = [spack.store.db] + spack.store.db.upstream_dbs
+    paths = [db._index_path for db in dbs]
+    names = sorted(set(
+        s.format('{name}{@version}') for s in spack.store.db.query()))
+    return names, paths + _config_paths()
+
+
+def _environments():
+    return ev.all_environment_names(), [ev.env_path]
+
+
+#: Lists of words in the cache, and functions returning them along with
+#: the paths they depend on
+lists = {
+    'commands': _commands,
+    'packages': _packages,
+    'installed': _installed,
+    'environments': _environments,
+}
+
+
+def _read_deps(name):
+    try:
+        with open(os.path.join(cache_dir(), name + '.deps')) as f:
+            return f.read().splitlines()
+    except (IOError, OSError):
+        return None
+
+
+def is_stale(name):
+    """Whether the list ``name`` is missing or older than its sources."""
+    path = os.path.join(cache_dir(), name)
+    deps = _read_deps(name)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return True
+    if deps is None:
+        return True
+
+    for dep in deps:
+        try:
+            if os.stat(dep).st_mtime > mtime:
+                return True
+        except OSError:
+            pass
+    return False
+
+
+def _write(path, lines):
+    """Write lines to ``path`` atomically, as shells may be reading it."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(''.join(line + '\n' for line in lines))
+    os.rename(tmp, path)
+
+
+def update(names=None, force=False):
+    """Regenerate lists in the cache that are out of date.
+
+    Arguments:
+        names (list or None): lists to update, all of them by default
+        force (bool): regenerate lists even if they are up to date
+    """
+    mkdirp(cache_dir())
+    for name in names or sorted(lists):
+        if not (force or is_stale(name)):
+            continue
+
+        # Date the list from before reading its sources, so that changes
+        # made meanwhile invalidate it
+        start = time.time()
+        words, deps = lists[name]()
+
+        path = os.path.join(cache_dir(), name)
+        _write(path + '.deps', deps)
+        _write(path, words)
+        os.utime(path, (start, start))
@@ -27,21 +27,31 @@
 When read in, Spack validates configurations with jsonschemas.  The
 schemas are in submodules of :py:mod:`spack.schema`.
 
+Parsing YAML with line information and validating it is slow, so the
+validated contents of each file are cached in ``config_cache_path``.
+Data read from the cache only records the file it came from. Scopes are
+re-read with the annotating YAML loader when line numbers or comments
+are needed, e.g. for ``spack config blame`` or to update a file.
+
 """
 import collections
 import contextlib
 import copy
 import functools
+import hashlib
+import json
 import os
 import re
 import sys
+import tempfile
+import time
 from contextlib import contextmanager
 from typing import List  # novm
 
 import ruamel.yaml as yaml
 from ordereddict_backport import OrderedDict
 from ruamel.yaml.error import MarkedYAMLError
-from six import iteritems
+from six import iteritems, string_types
 
 import llnl.util.lang
 import llnl.util.tty as tty
@@ -53,6 +63,7 @@
 import spack.schema
 import spack.schema.bootstrap
 import spack.schema.compilers
+import spack.schema.concretizer
 import spack.schema.config
 import spack.schema.env
 import spack.schema.mirrors
@@ -69,6 +80,7 @@
 #: Dict from section names -> schema for that section
 section_schemas = {
     'compilers': spack.schema.compilers.schema,
+    'concretizer': spack.schema.concretizer.schema,
     'mirrors': spack.schema.mirrors.schema,
     'repos': spack.schema.repos.schema,
     'packages': spack.schema.packages.schema,
@@ -145,6 +157,7 @@ def __init__(self, name, path):
         self.name = name           # scope name.
         self.path = path           # path to directory containing configs.
         self.sections = syaml.syaml_dict()  # sections read from config files.
+        self.use_cache = True      # whether to read from the config cache.
 
     @property
     def is_platform_dependent(self):
@@ -158,10 +171,17 @@ def get_section(self, section):
         if section not in self.sections:
             path   = self.get_section_filename(section)
             schema = section_schemas[section]
-            data   = read_config_file(path, schema)
+            data   = read_config_file(path, schema, self.use_cache)
             self.sections[section] = data
         return self.sections[section]
 
+    def read_annotated(self):
+        """Read the files of this scope with line and comment information
+        from now on, instead of using the config cache."""
+        if self.use_cache:
+            self.use_cache = False
+            self.clear()
+
     def _write_section(self, section):
         filename = self.get_section_filename(section)
         data = self.get_section(section)
@@ -247,7 +267,8 @@ def get_section(self, section):
         # This bit ensures we have read the file and have
         # the raw data in memory
         if self._raw_data is None:
-            self._raw_data = read_config_file(self.path, self.schema)
+            self._raw_data = read_config_file(
+                self.path, self.schema, self.use_cache)
             if self._raw_data is None:
                 return None
 
@@ -266,6 +287,11 @@ def get_section(self, section):
 
         return self.sections.get(section, None)
 
+    def read_annotated(self):
+        if self.use_cache:
+            self._raw_data = None
+        super(SingleFileScope, self).read_annotated()
+
     def _write_section(self, section):
         data_to_write = self._raw_data
 
@@ -332,7 +358,7 @@ class InternalConfigScope(ConfigScope):
     config file settings are accessed the same way, and Spack can easily
     override settings from files.
     """
-    def __init__(self, name, data=None):
+    def __init__(self, name, data=None, validate_data=True):
         super(InternalConfigScope, self).__init__(name, None)
         self.sections = syaml.syaml_dict()
 
@@ -340,7 +366,8 @@ def __init__(self, name, data=None):
             data = InternalConfigScope._process_dict_keyname_overrides(data)
             for section in data:
                 dsec = data[section]
-                validate({section: dsec}, section_schemas[section])
+                if validate_data:
+                    validate({section: dsec}, section_schemas[section])
                 self.sections[section] = _mark_internal(
                     syaml.syaml_dict({section: dsec}), name)
 
@@ -546,6 +573,10 @@ def update_config(self, section, update_data, scope=None, force=False):
         _validate_section_name(section)  # validate section name
         scope = self._validate_scope(scope)  # get ConfigScope object
 
+        # the config cache has no comments, so re-read the file if needed
+        scope.read_annotated()
+        scope.get_section(section)
+
         # manually preserve comments
         need_comment_copy = (section in scope.sections and
                              scope.sections[section] is not None)
@@ -706,8 +737,17 @@ def __iter__(self):
         for scope in self.scopes.values():
             yield scope
 
+    @_config_mutator
+    def read_annotated(self):
+        """Re-read all scopes with line and comment information."""
+        for scope in self.scopes.values():
+            scope.read_annotated()
+
     def print_section(self, section, blame=False):
         """Print a configuration to stdout."""
+        if blame:
+            self.read_annotated()
+
         try:
             data = syaml.syaml_dict()
             data[section] = self.get_config(section)
@@ -764,7 +804,7 @@ def override(path_or_scope, value=None):
 
 def _add_platform_scope(cfg, scope_type, name, path):
     """Add a platform-specific subdirectory for the current platform."""
-    platform = spack.architecture.platform().name
+    platform = spack.architecture.platform_name()
     plat_name = '%s/%s' % (name, platform)
     plat_path = os.path.join(path, platform)
     cfg.push_scope(scope_type(plat_name, plat_path))
@@ -802,8 +842,10 @@ def _config():
     """
     cfg = Configuration()
 
-    # first do the builtin, hardcoded defaults
-    defaults = InternalConfigScope('_builtin', config_defaults)
+    # first do the builtin, hardcoded defaults. They are validated by the
+    # unit tests, which saves importing jsonschema on every startup.
+    defaults = InternalConfigScope(
+        '_builtin', config_defaults, validate_data=False)
     cfg.push_scope(defaults)
 
     # add each scope and its platform-specific directory
@@ -966,11 +1008,139 @@ def validate(data, schema, filename=None):
     return test_data
 
 
-def read_config_file(filename, schema=None):
+#: Directory where validated configuration files are cached
+config_cache_path = spack.paths.user_config_cache_path
+
+#: Version of the format of config cache entries
+_config_cache_version = 1
+
+#: Files modified less than this many seconds ago are not cached, since
+#: a change in the same timestamp tick would not be detected
+_config_cache_min_age = 2
+
+
+def _config_cache_file(filename):
+    """Path of the cache entry for a configuration file."""
+    path = os.path.abspath(filename)
+    digest = hashlib.sha1(path.encode('utf-8')).hexdigest()
+    return os.path.join(config_cache_path, digest + '.json')
+
+
+def _schema_json_default(obj):
+    """Stable JSON representation of non-JSON objects in schemas, e.g.
+    functions used for deprecations."""
+    name = getattr(obj, '__name__', None)
+    if name:
+        return '%s.%s' % (getattr(obj, '__module__', None), name)
+    return str(obj)
+
+
+def _config_cache_key(filename, schema):
+    """Data that must match for a cache entry to be used."""
+    stat = os.stat(filename)
+    schema_json = json.dumps(
+        schema, sort_keys=True, default=_schema_json_default)
+    return {
+        'version': _config_cache_version,
+        'path': os.path.abspath(filename),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'inode': stat.st_ino,
+        'schema': hashlib.sha1(schema_json.encode('utf-8')).hexdigest(),
+    }
+
+
+def _to_config_cache(data):
+    """Convert data from a YAML file to data that can be stored as JSON.
+
+    Override strings get back their trailing ``:``. Raises TypeError
+    for data that would not survive a round trip through JSON.
+    """
+    if isinstance(data, dict):
+        result = OrderedDict()
+        for key, value in data.items():
+            if not isinstance(key, string_types):
+                raise TypeError('non-string key: %r' % key)
+            result[_to_config_cache(key)] = _to_config_cache(value)
+        return result
+    elif isinstance(data, list):
+        return [_to_config_cache(item) for item in data]
+    elif isinstance(data, string_types):
+        return str(data) + ':' if _override(data) else str(data)
+    elif data is None or type(data) in (bool, int, float):
+        return data
+    raise TypeError('cannot cache %r' % data)
+
+
+def _from_config_cache(data, mark):
+    """Restore the spack_yaml types of cached data, marking it with the
+    name of the file it was read from."""
+    if isinstance(data, dict):
+        d = syaml.syaml_dict(
+            (_from_config_cache(k, mark), _from_config_cache(v, mark))
+            for k, v in data.items())
+    elif isinstance(data, list):
+        d = syaml.syaml_list(_from_config_cache(e, mark) for e in data)
+    elif isinstance(data, string_types):
+        if not isinstance(data, str):
+            data = data.encode('utf-8')
+        # same rule as syaml.OrderedLineLoader for override strings
+        if data.endswith(':') and '@' not in data:
+            d = syaml.syaml_str(data[:-1])
+            d.override = True
+        else:
+            d = syaml.syaml_str(data)
+    else:
+        d = data
+
+    if syaml.markable(d):
+        d._start_mark = mark
+        d._end_mark = mark
+    return d
+
+
+def _read_config_cache(filename, key):
+    """Return the cached data of a configuration file, or raise KeyError
+    if there is no valid cache entry for it."""
+    try:
+        with open(_config_cache_file(filename)) as f:
+            entry = json.load(f, object_pairs_hook=OrderedDict)
+    except (IOError, OSError, ValueError):
+        raise KeyError(filename)
+
+    if not isinstance(entry, dict) or entry.get('key') != key:
+        raise KeyError(filename)
+
+    tty.debug("Reading cached config file %s" % filename)
+    mark = yaml.Mark(filename, None, None, None, None, None)
+    return _from_config_cache(entry['data'], mark)
+
+
+def _write_config_cache(filename, key, data):
+    """Store validated data of a configuration file in the cache."""
+    if time.time() - key['mtime'] < _config_cache_min_age:
+        return
+
+    try:
+        entry = json.dumps({'key': key, 'data': _to_config_cache(data)})
+        mkdirp(config_cache_path)
+        fd, tmp = tempfile.mkstemp(dir=config_cache_path)
+        with os.fdopen(fd, 'w') as f:
+            f.write(entry)
+        os.rename(tmp, _config_cache_file(filename))
+    except (IOError, OSError, TypeError, ValueError) as e:
+        tty.debug("Could not cache config file %s: %s" % (filename, str(e)))
+
+
+def read_config_file(filename, schema=None, use_cache=False):
     """Read a YAML configuration file.
 
     User can provide a schema for validation. If no schema is provided,
-    we will infer the schema from the top-level key."""
+    we will infer the schema from the top-level key.
+
+    If ``use_cache`` is True and a schema is provided, validated data is
+    read from and stored in the config cache. Cached data has no line
+    information, only the name of the file it came from."""
     # Dev: Inferring schema and allowing it to be provided directly allows us
     # to preserve flexibility in calling convention (don't need to provide
     # schema when it's not necessary) while allowing us to validate against a
@@ -988,6 +1158,14 @@ def read_config_file(filename, schema=None):
         raise ConfigFileError("Config file is not readable: %s" % filename)
 
     try:
+        cache_key = None
+        if use_cache and schema:
+            cache_key = _config_cache_key(filename, schema)
+            try:
+                return _read_config_cache(filename, cache_key)
+            except KeyError:
+                pass
+
         tty.debug("Reading config file %s" % filename)
         with open(filename) as f:
             data = syaml.load_config(f)
@@ -997,6 +1175,9 @@ def read_config_file(filename, schema=None):
                 key = next(iter(data))
                 schema = all_schemas[key]
             validate(data, schema)
+
+        if cache_key:
+            _write_config_cache(filename, cache_key, data)
         return data
 
     except StopIteration:
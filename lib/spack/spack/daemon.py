@@ -0,0 +1,521 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Server that keeps Spack's state in memory between commands.
+
+Most of the time taken by quick commands like ``spack find`` or
+``spack load`` goes into starting Python, reading the configuration,
+loading the package repositories and reading the database. A daemon
+does that once, and then serves read-only commands forwarded by
+``bin/spack`` (see ``spack.util.daemon_client``).
+
+Each command runs in a child forked from the daemon, with the standard
+streams, working directory and environment of the client, so nothing
+it does changes the state of the daemon. Before forking, the daemon
+checks that its state is still current:
+
+1. Configuration files are compared by mtime, size and inode.
+2. Package repositories are checked by ``FastPackageChecker``.
+3. The database is re-read if its verifier changed.
+
+Commands are only forwarded if the client has the same value as the daemon
+for the environment variables the configuration depends on, like those
+expanded in configuration files.
+
+Checking every package file in a repository the user can write to takes
+longer than the command itself. While the daemon is in use, those files
+are checked in the background every ``scan_interval`` seconds, so that
+requests only need to check them if the last scan is too old. This means
+that a package file edited in place (without adding or removing files)
+may go unnoticed for a few seconds.
+
+The daemon only accepts connections from its own user, and exits after
+being idle for a while.
+"""
+import errno
+import os
+import re
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+import traceback
+
+import llnl.util.filesystem as fs
+import llnl.util.lang
+import llnl.util.tty as tty
+
+import spack
+import spack.cmd
+import spack.compilers
+import spack.config
+import spack.environment as ev
+import spack.error
+import spack.main
+import spack.paths
+import spack.repo
+import spack.store
+import spack.util.daemon_client as client
+
+#: Environment variables expanded by ``os.path.expandvars``
+_variable_re = re.compile(r'\$\{?(\w+)')
+
+#: Seconds between scans of package files in the background
+scan_interval = 2
+
+#: Seconds after the last request during which the daemon keeps scanning
+#: package files in the background
+scan_period = 300
+
+
+class Daemon(object):
+    """Serve the commands forwarded by ``spack.util.daemon_client``.
+
+    Args:
+        path (str): path of the socket to listen on
+        timeout (float): seconds of inactivity after which the daemon
+            exits, or None to run until stopped
+    """
+
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.timeout = timeout
+
+        self.started = time.time()
+        self.served = 0
+        self.stopped = False
+        self.children = set()
+        self.listener = None
+
+        self.environment = dict(
+            (name, os.environ.get(name)) for name in client.state_variables)
+        self.spack_head = _spack_head()
+
+        self.config_stats = None
+        self.repo_stats = None
+        self.checkers = []
+        self.snapshot_checkers = []
+        self.scanned = 0
+
+    def reset(self):
+        """Drop all the state loaded from configuration, package
+        repositories and database."""
+        spack.config.command_line_scopes = []
+        spack.config.config = llnl.util.lang.Singleton(spack.config._config)
+        spack.compilers._compiler_cache = {}
+
+        if isinstance(spack.repo.path, llnl.util.lang.Singleton):
+            repo_path = spack.repo.path._instance
+        else:
+            repo_path = spack.repo.path
+        if repo_path in sys.meta_path:
+            sys.meta_path.remove(repo_path)
+        namespace = spack.repo.repo_namespace
+        for name in list(sys.modules):
+            if name == namespace or name.startswith(namespace + '.'):
+                del sys.modules[name]
+        spack.repo.FastPackageChecker._paths_cache.clear()
+        spack.repo.path = llnl.util.lang.Singleton(spack.repo._path)
+
+        spack.store.reinitialize()
+
+        self.config_stats = None
+        self.repo_stats = None
+        self.checkers = []
+        self.snapshot_checkers = []
+
+    def warm(self):
+        """Load everything that forwarded commands would load."""
+        self.config_stats = _config_stats()
+        for section in spack.config.section_schemas:
+            spack.config.config.get_config(section)
+
+        self.checkers = [spack.repo.FastPackageChecker(repo.packages_path)
+                         for repo in spack.repo.path.repos]
+        self.repo_stats = _repo_stats(self.checkers)
+        self.scanned = time.time()
+
+        # Values in configuration files may expand environment variables,
+        # which must then be the same in the clients
+        self.environment = dict(
+            (name, os.environ.get(name)) for name in _state_variables())
+
+        # Repositories the user can't write to are checked against their
+        # snapshot in the misc cache: a stat and a listing of the packages
+        # directory and a read of the git HEAD, and ``git status`` only if
+        # the listing changed
+        self.snapshot_checkers = [
+            checker for checker in self.checkers
+            if not os.access(checker.packages_path, os.W_OK)]
+        spack.repo.path.provider_index
+        spack.repo.path.metadata_index
+        spack.repo.path.all_package_names()
+
+        with spack.store.db.read_transaction():
+            installed = spack.store.db.query()
+        for spec in installed:
+            try:
+                spack.repo.path.get_pkg_class(spec.name)
+            except Exception as e:
+                tty.debug('Cannot load {0}: {1}'.format(spec.name, e))
+
+        for name in client.forwarded_commands:
+            spack.cmd.get_module(name)
+
+    def changed(self, scan):
+        """Whether configuration or packages changed since they were loaded.
+
+        Args:
+            scan (bool): whether to check every package file
+        """
+        if (self.config_stats != _config_stats() or
+                self.repo_stats != _repo_stats(self.checkers)):
+            return True
+
+        checkers = self.checkers if scan else self.snapshot_checkers
+        changed = any(checker.changed() for checker in checkers)
+        if scan:
+            self.scanned = time.time()
+        return changed
+
+    def refresh(self, scan=None):
+        """Reload whatever changed since the state was loaded.
+
+        Args:
+            scan (bool): whether to check every package file. By default
+                they are checked only if the last scan is too old.
+        """
+        if scan is None:
+            scan = time.time() - self.scanned > scan_interval + 1
+
+        if self.changed(scan):
+            tty.debug('Configuration or packages changed, reloading')
+            self.reset()
+            self.warm()
+
+        # This re-reads the database only if its verifier changed
+        with spack.store.db.read_transaction():
+            pass
+
+    def serve(self, ready=None):
+        """Load Spack's state, and serve requests until stopped.
+
+        Args:
+            ready (callable): called when the daemon starts listening
+        """
+        with ev.deactivate_environment():
+            self.reset()
+            self.warm()
+
+            fs.mkdirp(os.path.dirname(self.path), mode=0o700)
+            self.listener = _listen(self.path)
+            tty.msg('Listening on {0}'.format(self.path))
+            if ready:
+                ready()
+            try:
+                self._loop()
+            finally:
+                self.listener.close()
+                _remove(self.path)
+
+    def _loop(self):
+        last_request = time.time()
+        self.listener.settimeout(1.0)
+        while not self.stopped:
+            try:
+                connection, _ = self.listener.accept()
+            except socket.timeout:
+                self._reap()
+                self._scan(last_request)
+                idle = time.time() - last_request
+                if self.timeout and idle > self.timeout and not self.children:
+                    tty.msg('Exiting after {0:.0f}s without requests'.format(
+                        idle))
+                    return
+                continue
+
+            last_request = time.time()
+            try:
+                self.handle(connection)
+            except (EOFError, KeyError, OSError, TypeError, ValueError) as e:
+                tty.debug('Cannot handle request: {0}'.format(e))
+            finally:
+                connection.close()
+            self._reap()
+            self._scan(last_request)
+
+    def handle(self, connection):
+        """Handle a single connection to the daemon."""
+        connection.settimeout(10)
+        if _peer_uid(connection) not in (None, os.getuid()):
+            return
+
+        request, fds = client.receive_message(connection, max_fds=3)
+        try:
+            if 'control' in request:
+                client.send_message(connection, self.control(request))
+                return
+
+            reason = self._refuse(request, fds)
+            if reason:
+                tty.debug('Running command locally: {0}'.format(reason))
+                client.send_message(connection, {'fallback': reason})
+                return
+
+            client.send_message(connection, {'accepted': True})
+            self.served += 1
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                self._run(connection, request, fds)
+            self.children.add(pid)
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def control(self, request):
+        """Answer requests from ``spack daemon status`` and ``stop``."""
+        if request['control'] == 'stop':
+            self.stopped = True
+        return {
+            'pid': os.getpid(),
+            'prefix': spack.paths.prefix,
+            'started': self.started,
+            'served': self.served,
+            'stopping': self.stopped,
+        }
+
+    def _refuse(self, request, fds):
+        """Return why a command can't run in the daemon, if it can't."""
+        if len(fds) != 3:
+            return 'missing standard streams'
+
+        if _spack_head() != self.spack_head:
+            self.stopped = True
+            return 'Spack was updated, stopping the daemon'
+
+        if not client.forwarded(request['argv']):
+            return 'command cannot run in the daemon'
+
+        try:
+            self.refresh()
+        except spack.error.SpackError as e:
+            # Let the command report the error
+            self.reset()
+            return str(e)
+
+        # After refreshing, since configuration files may have changed
+        environment = dict((name, request['env'].get(name))
+                           for name in self.environment)
+        if environment != self.environment:
+            return 'environment differs from the daemon'
+
+    def _scan(self, last_request):
+        """Check package files in the background, while the daemon is
+        in use, so that requests don't have to."""
+        now = time.time()
+        if now - last_request > scan_period or (
+                now - self.scanned < scan_interval):
+            return
+        try:
+            self.refresh(scan=True)
+        except spack.error.SpackError as e:
+            tty.debug('Cannot reload: {0}'.format(e))
+            self.reset()
+
+    def _run(self, connection, request, fds):
+        """Run a forwarded command in a child process."""
+        returncode = 1
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            if self.listener:
+                self.listener.close()
+            connection.settimeout(None)
+            for fd, target in zip(fds, (0, 1, 2)):
+                os.dup2(fd, target)
+            sys.stdin = os.fdopen(0, 'r', closefd=False)
+            sys.stdout = os.fdopen(1, 'w', closefd=False)
+            sys.stderr = os.fdopen(2, 'w', 1, closefd=False)
+
+            os.chdir(request['cwd'])
+            os.environ.clear()
+            os.environ.update(request['env'])
+            sys.argv = ['spack'] + request['argv']
+
+            _interrupt_on_hangup(connection)
+            returncode = spack.main.main(request['argv'])
+        except SystemExit as e:
+            returncode = e.code
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            if returncode is None:
+                returncode = 0
+            elif not isinstance(returncode, int):
+                sys.stderr.write('{0}\n'.format(returncode))
+                returncode = 1
+
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                client.send_message(connection, {'returncode': returncode})
+            finally:
+                os._exit(returncode)
+
+    def _reap(self):
+        for pid in list(self.children):
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except OSError:
+                done = pid
+            if done:
+                self.children.discard(pid)
+
+
+def socket_path():
+    """Path of the socket of the daemon serving this Spack prefix."""
+    return client.socket_path(spack.paths.prefix)
+
+
+def _spack_head():
+    """Commit of Spack checked out, if Spack is in a git repository."""
+    checkout = spack.repo._find_git_checkout(spack.paths.prefix)
+    if checkout:
+        return spack.repo._git_head(checkout[1])
+    return spack.spack_version
+
+
+def _config_stats():
+    """Stats of every file and directory in the configuration scopes."""
+    paths = []
+    for scope in spack.config.config.scopes.values():
+        path = getattr(scope, 'path', None)
+        if path:
+            paths.append(path)
+            paths.extend(os.path.join(path, section + '.yaml')
+                         for section in spack.config.section_schemas)
+
+    stats = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stats.append((path, st.st_mtime, st.st_size, st.st_ino))
+        except OSError:
+            stats.append((path, None, None, None))
+    return stats
+
+
+def _state_variables():
+    """Names of the environment variables the configuration depends on:
+    ``client.state_variables``, and those referenced in configuration
+    files."""
+    names = set(client.state_variables)
+    for path, mtime, _, _ in _config_stats():
+        if mtime is None or os.path.isdir(path):
+            continue
+        try:
+            with open(path) as f:
+                names.update(_variable_re.findall(f.read()))
+        except (IOError, OSError, UnicodeDecodeError):
+            continue
+    return sorted(names)
+
+
+def _repo_stats(checkers):
+    """Modification times of the packages directories of repositories."""
+    stats = []
+    for checker in checkers:
+        try:
+            stats.append(os.stat(checker.packages_path).st_mtime)
+        except OSError:
+            stats.append(None)
+    return stats
+
+
+def _listen(path):
+    """Bind a socket to ``path``, unless another daemon is using it."""
+    if os.path.exists(path):
+        try:
+            client.request(path, {'control': 'status'}, timeout=5)
+        except (EOFError, OSError, ValueError):
+            _remove(path)
+        else:
+            raise DaemonError('A daemon is already listening on ' + path)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    os.chmod(path, 0o600)
+    listener.listen(16)
+    return listener
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def _peer_uid(connection):
+    """User id of the process on the other side of a socket, if the
+    platform can tell."""
+    so_peercred = getattr(socket, 'SO_PEERCRED', None)
+    if so_peercred is None:
+        return None
+    credentials = struct.Struct('3i')
+    _, uid, _ = credentials.unpack(connection.getsockopt(
+        socket.SOL_SOCKET, so_peercred, credentials.size))
+    return uid
+
+
+def _interrupt_on_hangup(connection):
+    """Interrupt this process if the client closes its side of the
+    connection, e.g. because ^C was pressed."""
+    def wait():
+        try:
+            connection.recv(1)
+        except OSError:
+            pass
+        os.kill(os.getpid(), signal.SIGINT)
+
+    thread = threading.Thread(target=wait)
+    thread.daemon = True
+    thread.start()
+
+
+def status():
+    """Status of the daemon serving this Spack prefix, or None if there
+    is no daemon running."""
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        return client.request(path, {'control': 'status'}, timeout=5)
+    except (EOFError, OSError, ValueError):
+        return None
+
+
+def stop():
+    """Stop the daemon serving this Spack prefix, if there is one.
+
+    Returns:
+        (dict or None): status of the daemon, or None if none was running
+    """
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        return client.request(path, {'control': 'stop'}, timeout=5)
+    except (EOFError, OSError, ValueError):
+        return None
+
+
+class DaemonError(spack.error.SpackError):
+    """Raised when the daemon cannot start."""
@@ -95,6 +95,18 @@ def nullcontext(*args, **kwargs):
 # ensure a failed install is properly tracked).
 _pkg_lock_timeout = None
 
+# How reads of the database are synchronized with writers: 'locked' takes a
+# read lock on the database, 'snapshot' reads the index without any lock and
+# validates it against the index verifier. The environment variable takes
+# precedence over the ``config:db_read_mode`` setting.
+_db_read_mode = 'locked'
+_db_read_mode_var = 'SPACK_DB_READ_MODE'
+
+# Number of attempts at reading a consistent snapshot of the index, and
+# initial delay in seconds between attempts, before taking a read lock.
+_snapshot_read_attempts = 5
+_snapshot_read_delay = 0.05
+
 # Types of dependencies tracked by the database
 _tracked_deps = ('link', 'run')
 
@@ -376,6 +388,14 @@ def __init__(self, root, db_dir=None, upstream_dbs=None,
                               if self.package_lock_timeout else 'No timeout')
         tty.debug('PACKAGE LOCK TIMEOUT: {0}'.format(
                   str(timeout_format_str)))
+        self.read_mode = (
+            os.environ.get(_db_read_mode_var) or
+            spack.config.get('config:db_read_mode') or _db_read_mode)
+        if self.read_mode not in ('locked', 'snapshot'):
+            raise SpackError(
+                "Invalid database read mode '{0}'".format(self.read_mode),
+                "Set config:db_read_mode or {0} to either 'locked' or "
+                "'snapshot'".format(_db_read_mode_var))
 
         if self.is_upstream:
             self.lock = ForbiddenLock()
@@ -400,6 +420,9 @@ def __init__(self, root, db_dir=None, upstream_dbs=None,
         # message)
         self._fail_when_missing_deps = False
 
+        # nesting depth of snapshot read transactions
+        self._snapshot_depth = 0
+
         if enable_transaction_locking:
             self._write_transaction_impl = lk.WriteTransaction
             self._read_transaction_impl = lk.ReadTransaction
@@ -415,9 +438,29 @@ def write_transaction(self):
             self.lock, acquire=self._read, release=self._write)
 
     def read_transaction(self):
-        """Get a read lock context manager for use in a `with` block."""
+        """Get a read lock context manager for use in a `with` block.
+
+        In ``snapshot`` read mode, no lock is taken, and the index is
+        validated against its verifier instead (see ``_read_snapshot()``).
+        """
+        if (self.read_mode == 'snapshot' and
+                self._read_transaction_impl is lk.ReadTransaction):
+            return self._snapshot_transaction()
         return self._read_transaction_impl(self.lock, acquire=self._read)
 
+    @contextlib.contextmanager
+    def _snapshot_transaction(self):
+        # Nested transactions, and those within a locked transaction of this
+        # process, see the data read by the outermost one
+        if not (self._snapshot_depth or self.lock._reads or
+                self.lock._writes):
+            self._read_snapshot()
+        self._snapshot_depth += 1
+        try:
+            yield
+        finally:
+            self._snapshot_depth -= 1
+
     def _failed_spec_path(self, spec):
         """Return the path to the spec's failure file, which may not exist."""
         if not spec.concrete:
@@ -1012,10 +1055,12 @@ def _write(self, type, value, traceback):
                 self._write_to_file(f)
             os.rename(temp_file, self._index_path)
             if _use_uuid:
-                with open(self._verifier_path, 'w') as f:
+                # Replace the verifier atomically too, for snapshot readers
+                with open(temp_file, 'w') as f:
                     new_verifier = str(uuid.uuid4())
                     f.write(new_verifier)
-                    self.last_seen_verifier = new_verifier
+                os.rename(temp_file, self._verifier_path)
+                self.last_seen_verifier = new_verifier
         except BaseException as e:
             tty.debug(e)
             # Clean up temp file if something goes wrong.
@@ -1023,6 +1068,47 @@ def _write(self, type, value, traceback):
                 os.remove(temp_file)
             raise
 
+    def _read_verifier(self):
+        """Return the contents of the index verifier, or None if there is
+        no verifier."""
+        try:
+            with open(self._verifier_path, 'r') as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def _read_snapshot(self):
+        """Re-read Database from the data in the set location, without
+        taking the database lock.
+
+        Writers replace ``index.json`` and then ``index_verifier``, so the
+        index that was read is consistent if the verifier is the same
+        before and after reading it. Otherwise a writer was active, and the
+        read is retried a few times before falling back to a read lock.
+        """
+        delay = _snapshot_read_delay
+        for _ in range(_snapshot_read_attempts):
+            before = self._read_verifier()
+            if not os.path.isfile(self._index_path):
+                break
+            if before and before == self.last_seen_verifier:
+                return
+
+            # An empty verifier is being written by an older Spack
+            if before != '':
+                self._read_from_file(self._index_path)
+                if self._read_verifier() == before:
+                    self.last_seen_verifier = before or ''
+                    return
+
+            tty.debug('Database changed while reading it, retrying')
+            time.sleep(delay)
+            delay *= 2
+
+        # There is no index, or the snapshot is inconsistent
+        with lk.ReadTransaction(self.lock, acquire=self._read):
+            pass
+
     def _read(self):
         """Re-read Database from the data in the set location.
 
@@ -15,6 +15,7 @@
 from ordereddict_backport import OrderedDict
 
 import llnl.util.filesystem as fs
+import llnl.util.lang
 import llnl.util.tty as tty
 from llnl.util.tty.color import colorize
 
@@ -28,7 +29,6 @@
 import spack.spec
 import spack.stage
 import spack.store
-import spack.user_environment as uenv
 import spack.util.environment
 import spack.util.hash
 import spack.util.lock as lk
@@ -40,12 +40,15 @@
     inverse_view_func_parser,
     view_func_parser,
 )
-from spack.installer import PackageInstaller
 from spack.spec import Spec
 from spack.spec_list import InvalidSpecConstraintError, SpecList
 from spack.util.path import substitute_path_variables
 from spack.variant import UnknownVariantError
 
+# Imports the build environment and packages, which is slow and only
+# needed to compute environment modifications
+uenv = llnl.util.lang.lazy_import('spack.user_environment')
+
 #: environment variable used to indicate the active environment
 spack_env_var = 'SPACK_ENV'
 
@@ -1334,7 +1337,7 @@ def _env_modifications_for_default_view(self, reverse=False):
 
                     try:
                         mods = uenv.environment_modifications_for_spec(
-                            spec, self.default_view)
+                            spec, self.default_view, use_cache=True)
                     except Exception as e:
                         msg = ("couldn't get environment settings for %s"
                                % spec.format("{name}@{version} /{hash:7}"))
@@ -1530,6 +1533,8 @@ def install_specs(self, specs=None, **install_args):
         for spec in specs_to_install:
             installs.append((spec.package, install_args))
 
+        from spack.installer import PackageInstaller
+
         try:
             builder = PackageInstaller(installs)
             builder.install()
@@ -36,7 +36,6 @@
 import spack.cmd
 import spack.config
 import spack.environment as ev
-import spack.modules
 import spack.paths
 import spack.repo
 import spack.store
@@ -655,6 +654,9 @@ def print_setup_info(*info):
     invoke spack in login scripts, and it needs to be quick.
 
     """
+    import spack.completion
+    import spack.modules.common
+
     shell = 'csh' if 'csh' in info else 'sh'
 
     def shell_set(var, value):
@@ -696,6 +698,10 @@ def shell_set(var, value):
         roots_val = ':'.join(reversed(paths))
         shell_set('_sp_%s_roots' % name, roots_val)
 
+    # print the completion cache, so that completion doesn't run spack to
+    # find it
+    shell_set('_sp_completion_cache', spack.completion.cache_dir())
+
     # print environment module system if available. This can be expensive
     # on clusters, so skip it if not needed.
     if 'modules' in info:
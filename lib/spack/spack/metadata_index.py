@@ -0,0 +1,317 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Index of package metadata that can be queried without importing packages.
+
+Commands like ``spack info``, ``spack list -d`` or ``spack dependents``
+only need static information from ``package.py`` files (versions,
+variants, dependencies, etc.). Importing thousands of package modules to
+get it is slow, so the ``MetadataIndex`` stores a serialized summary of
+each package in the misc cache, and ``PackageMetadata`` exposes the
+subset of the package API that these commands use.
+"""
+import collections
+import re
+import textwrap
+
+import six
+
+import spack.error
+import spack.fetch_strategy
+import spack.repo
+import spack.spec
+import spack.util.spack_json as sjson
+from spack.version import Version
+
+#: Information about a variant that is needed for display purposes
+VariantMetadata = collections.namedtuple(
+    'VariantMetadata', ['default', 'allowed_values', 'description']
+)
+
+
+def _json_value(value):
+    """Return a value that can be serialized to JSON and shown to users."""
+    if isinstance(value, (bool, int, float, six.string_types)):
+        return value
+    return str(value)
+
+
+class PackageMetadata(object):
+    """Read-only view of the static attributes of a package.
+
+    This mimics the attributes of ``PackageBase`` that are used by
+    commands to display packages, but it is constructed from a plain
+    dictionary, so that it can be stored in an index.
+    """
+
+    def __init__(self, data):
+        self._data = data
+
+    @staticmethod
+    def from_package(pkg):
+        """Extract the metadata of a package instance."""
+        versions = []
+        for v, attrs in pkg.versions.items():
+            url = ''
+            if pkg.has_code:
+                try:
+                    url = str(spack.fetch_strategy.for_package_version(pkg, v))
+                except spack.fetch_strategy.FetchError:
+                    pass
+            versions.append({
+                'version': str(v),
+                'preferred': bool(attrs.get('preferred', False)),
+                'deprecated': bool(attrs.get('deprecated', False)),
+                'url': url,
+            })
+
+        variants = {}
+        for name, variant in pkg.variants.items():
+            variants[name] = {
+                'default': _json_value(variant.default),
+                'allowed_values': variant.allowed_values,
+                'description': variant.description,
+            }
+
+        dependencies = {}
+        for name, conditions in pkg.dependencies.items():
+            deptypes = set()
+            for dependency in conditions.values():
+                deptypes.update(dependency.type)
+            dependencies[name] = sorted(deptypes)
+
+        conflicts = []
+        for trigger, constraints in pkg.conflicts.items():
+            for when, msg in constraints:
+                conflicts.append([str(trigger), str(when), msg])
+
+        provides = []
+        for virtual, whens in pkg.provided.items():
+            for when in whens:
+                provides.append([str(virtual), str(when)])
+
+        detectable = None
+        if hasattr(pkg, 'executables'):
+            detectable = [
+                attr for attr in ('version', 'variants')
+                if hasattr(pkg, 'determine_' + attr)
+            ]
+
+        return PackageMetadata({
+            'name': pkg.name,
+            'namespace': pkg.namespace,
+            'build_system_class': pkg.build_system_class,
+            'description': pkg.__doc__,
+            'homepage': pkg.homepage,
+            'maintainers': list(pkg.maintainers),
+            'tags': list(getattr(pkg, 'tags', None) or []),
+            'has_tags': hasattr(pkg, 'tags'),
+            'detectable': detectable,
+            'phases': list(getattr(pkg, 'phases', None) or []),
+            'has_code': pkg.has_code,
+            'versions': versions,
+            'variants': variants,
+            'dependencies': dependencies,
+            'conflicts': sorted(conflicts, key=lambda c: (c[:2], c[2] or '')),
+            'provides': sorted(provides),
+        })
+
+    def to_dict(self):
+        return self._data
+
+    @property
+    def name(self):
+        return self._data['name']
+
+    @property
+    def namespace(self):
+        return self._data['namespace']
+
+    @property
+    def fullname(self):
+        return '{0}.{1}'.format(self.namespace, self.name)
+
+    @property
+    def build_system_class(self):
+        return self._data['build_system_class']
+
+    @property
+    def description(self):
+        """The docstring of the package, or None if it has none."""
+        return self._data['description']
+
+    @property
+    def homepage(self):
+        return self._data['homepage']
+
+    @property
+    def maintainers(self):
+        return self._data['maintainers']
+
+    @property
+    def tags(self):
+        return self._data['tags']
+
+    @property
+    def has_tags(self):
+        return self._data['has_tags']
+
+    @property
+    def detectable(self):
+        """None if the package cannot be detected externally, otherwise
+        the list of attributes (version, variants) that can be detected."""
+        return self._data['detectable']
+
+    @property
+    def phases(self):
+        return self._data['phases']
+
+    @property
+    def has_code(self):
+        return self._data['has_code']
+
+    @property
+    def versions(self):
+        """Dictionary mapping versions to their ``preferred`` and
+        ``deprecated`` attributes, like ``PackageBase.versions``."""
+        return dict(
+            (Version(v['version']),
+             {'preferred': v['preferred'], 'deprecated': v['deprecated']})
+            for v in self._data['versions']
+        )
+
+    def fetch_url(self, version):
+        """Fetch strategy of a version, as shown by ``spack info``."""
+        for v in self._data['versions']:
+            if v['version'] == str(version):
+                return v['url']
+        return ''
+
+    @property
+    def variants(self):
+        return dict(
+            (name, VariantMetadata(**v))
+            for name, v in self._data['variants'].items()
+        )
+
+    @property
+    def dependencies(self):
+        """Dictionary mapping dependency names to their deptypes."""
+        return self._data['dependencies']
+
+    def dependencies_of_type(self, *deptypes):
+        """Get dependencies that can possibly have these deptypes."""
+        return set(
+            name for name, types in self._data['dependencies'].items()
+            if any(d in types for d in deptypes)
+        )
+
+    @property
+    def conflicts(self):
+        """List of (conflict spec, when spec, message) string triples."""
+        return [tuple(c) for c in self._data['conflicts']]
+
+    @property
+    def provided(self):
+        """Dictionary mapping provided specs to the set of ``when`` specs
+        under which they are provided, like ``PackageBase.provided``."""
+        provided = {}
+        for virtual, when in self._data['provides']:
+            provided.setdefault(
+                spack.spec.Spec(virtual), set()
+            ).add(spack.spec.Spec(when))
+        return provided
+
+    def format_doc(self, **kwargs):
+        """Wrap doc string at 72 characters and format nicely"""
+        indent = kwargs.get('indent', 0)
+
+        if not self.description:
+            return ""
+
+        doc = re.sub(r'\s+', ' ', self.description)
+        lines = textwrap.wrap(doc, 72)
+        results = six.StringIO()
+        for line in lines:
+            results.write((" " * indent) + line + "\n")
+        return results.getvalue()
+
+    def __eq__(self, other):
+        return (isinstance(other, PackageMetadata) and
+                self._data == other._data)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'PackageMetadata({0})'.format(self.fullname)
+
+
+class MetadataIndex(object):
+    """Maps package names to their ``PackageMetadata``."""
+
+    def __init__(self):
+        self._packages = {}
+
+    def __getitem__(self, pkg_name):
+        return self._packages[pkg_name]
+
+    def __contains__(self, pkg_name):
+        return pkg_name in self._packages
+
+    def __iter__(self):
+        return iter(self._packages)
+
+    def __len__(self):
+        return len(self._packages)
+
+    def get(self, pkg_name, default=None):
+        return self._packages.get(pkg_name, default)
+
+    def items(self):
+        return self._packages.items()
+
+    def update_package(self, pkg_fullname):
+        """Re-read the metadata of a package and store it in the index.
+
+        Args:
+            pkg_fullname (str): name of the package to be updated
+        """
+        pkg_name = pkg_fullname.split('.')[-1]
+        pkg = spack.repo.get(pkg_fullname)
+        self._packages[pkg_name] = PackageMetadata.from_package(pkg)
+
+    def remove_package(self, pkg_name):
+        self._packages.pop(pkg_name, None)
+
+    def merge(self, other):
+        """Merge another index into this one. Entries in ``other`` take
+        precedence over entries for the same package in this index."""
+        self._packages.update(other._packages)
+
+    def to_json(self, stream):
+        sjson.dump({'packages': dict(
+            (name, metadata.to_dict())
+            for name, metadata in self._packages.items()
+        )}, stream)
+
+    @staticmethod
+    def from_json(stream):
+        d = sjson.load(stream)
+
+        if not isinstance(d, dict):
+            raise MetadataIndexError("JSON metadata index data was not a dict.")
+
+        if 'packages' not in d:
+            raise MetadataIndexError(
+                "MetadataIndex data does not start with 'packages'")
+
+        index = MetadataIndex()
+        for name, data in d['packages'].items():
+            index._packages[name] = PackageMetadata(data)
+        return index
+
+
+class MetadataIndexError(spack.error.SpackError):
+    """Raised when there is a problem with a MetadataIndex."""
@@ -38,10 +38,10 @@
 from typing import Optional  # novm
 
 import llnl.util.filesystem
+import llnl.util.lang
 import llnl.util.tty as tty
 from llnl.util.lang import dedupe
 
-import spack.build_environment as build_environment
 import spack.config
 import spack.environment as ev
 import spack.error
@@ -54,6 +54,9 @@
 import spack.util.path
 import spack.util.spack_yaml as syaml
 
+#: Only needed to write module files, and slow to import
+build_environment = llnl.util.lang.lazy_import('spack.build_environment')
+
 
 #: config section for this file
 def configuration(module_set_name):
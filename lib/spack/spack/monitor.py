@@ -13,15 +13,12 @@
 import re
 from datetime import datetime
 
-try:
-    from urllib.error import URLError
-    from urllib.request import Request, urlopen
-except ImportError:
-    from urllib2 import urlopen, Request, URLError  # type: ignore  # novm
-
 from copy import deepcopy
 from glob import glob
 
+from six.moves.urllib.error import URLError
+
+import llnl.util.lang
 import llnl.util.tty as tty
 
 import spack
@@ -33,6 +30,9 @@
 import spack.util.spack_json as sjson
 import spack.util.spack_yaml as syaml
 
+# Slow to import, and only needed when a monitor is used
+urllib_request = llnl.util.lang.lazy_import('six.moves.urllib.request')
+
 # A global client to instantiate once
 cli = None
 
@@ -254,7 +254,7 @@ def prepare_request(self, endpoint, data, headers):
                 data = sjson.dump(data)
             data = data.encode('ascii')
 
-        return Request(endpoint, data=data, headers=headers)
+        return urllib_request.Request(endpoint, data=data, headers=headers)
 
     def issue_request(self, request, retry=True):
         """
@@ -265,7 +265,7 @@ def issue_request(self, request, retry=True):
         disable using the monitoring service) we could add that here.
         """
         try:
-            response = urlopen(request)
+            response = urllib_request.urlopen(request)
         except URLError as e:
 
             # If we have an authorization request, retry once with auth
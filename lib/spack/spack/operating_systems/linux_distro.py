@@ -16,12 +16,10 @@ class LinuxDistro(OperatingSystem):
     """
 
     def __init__(self):
+        # Imported here to avoid a circular import with spack.platforms
+        import spack.platforms._host
         try:
-            # This will throw an error if imported on a non-Linux platform.
-            from external.distro import linux_distribution
-            distname, version, _ = linux_distribution(
-                full_distribution_name=False)
-            distname, version = str(distname), str(version)
+            distname, version = spack.platforms._host.linux_distribution()
         except ImportError:
             distname, version = 'unknown', ''
 
@@ -360,8 +360,8 @@ def patch_for_package(self, sha256, pkg):
         patch_dict['sha256'] = sha256
         return from_dict(patch_dict)
 
-    def update_package(self, pkg_fullname):
-        # remove this package from any patch entries that reference it.
+    def remove_package(self, pkg_fullname):
+        """Remove the patches owned by a package from the index."""
         empty = []
         for sha256, package_to_patch in self.index.items():
             remove = []
@@ -379,6 +379,10 @@ def update_package(self, pkg_fullname):
         for sha256 in empty:
             del self.index[sha256]
 
+    def update_package(self, pkg_fullname):
+        # remove this package from any patch entries that reference it.
+        self.remove_package(pkg_fullname)
+
         # update the index with per-package patch indexes
         pkg = spack.repo.get(pkg_fullname)
         partial_index = self._index_patches(pkg)
@@ -59,6 +59,9 @@
 # We cache repositories (git) in first, extracted metadata in second
 user_repos_cache_path = os.path.join(user_config_path, 'git_repos')
 
+#: Parsed and validated configuration files
+user_config_cache_path = os.path.join(user_config_path, 'config_cache')
+
 opt_path        = os.path.join(prefix, "opt")
 etc_path        = os.path.join(prefix, "etc")
 system_etc_path = '/etc'
@@ -22,14 +22,21 @@
 platforms = [Cray, Darwin, Linux, Test]
 
 
-def host():
-    """Detect and return the platform for this machine or None if detection fails."""
+def host_cls():
+    """Detect and return the platform class for this machine or None if
+    detection fails."""
     for platform_cls in sorted(platforms, key=lambda plt: plt.priority):
         if platform_cls.detect():
-            return platform_cls()
+            return platform_cls
     return None
 
 
+def host():
+    """Detect and return the platform for this machine or None if detection fails."""
+    platform_cls = host_cls()
+    return platform_cls() if platform_cls else None
+
+
 @llnl.util.lang.memoized
 def cls_by_name(name):
     """Return a platform class that corresponds to the given name or None
@@ -0,0 +1,156 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Cache of the detection of the host microarchitecture and OS.
+
+Detecting the microarchitecture of the host with archspec means parsing
+``/proc/cpuinfo`` and comparing it with every microarchitecture archspec
+knows, and detecting the Linux distribution may run ``lsb_release``. Since
+every Spack process needs them, the results are stored in a file per host
+in the misc cache, and reused as long as the kernel, the CPU, the OS
+release files and the data of archspec don't change.
+
+Finding the misc cache needs the configuration, whose platform scopes are
+named with ``spack.architecture.platform_name()``, which doesn't need the
+results cached here.
+"""
+import hashlib
+import json
+import os
+import platform
+import socket
+
+import archspec
+import archspec.cpu
+
+import llnl.util.lang
+import llnl.util.tty as tty
+
+import spack
+import spack.error
+
+#: Version of the format of cache files
+_cache_version = 1
+
+#: Files read to detect the OS
+_release_files = [
+    '/etc/os-release', '/usr/lib/os-release', '/etc/lsb-release',
+    '/etc/redhat-release', '/etc/debian_version', '/etc/SuSE-release']
+
+#: Data of archspec, which may change the detected microarchitecture
+_archspec_data = os.path.join(
+    os.path.dirname(archspec.__file__), 'json', 'cpu',
+    'microarchitectures.json')
+
+
+def _file_cache():
+    """Cache where the results are stored"""
+    import spack.caches  # import cycle
+    return spack.caches.misc_cache
+
+
+def _cache_key():
+    """Key of the results of this host in the cache.
+
+    The misc cache is often in a home directory shared by many hosts, so
+    the file is named after the host.
+    """
+    return 'hosts/{0}.json'.format(socket.gethostname())
+
+
+def _cpuinfo_hash():
+    """Hash of what archspec reads in /proc/cpuinfo, without the frequency
+    that changes all the time."""
+    lines = []
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                # Only the first processor is inspected
+                if not line.strip():
+                    break
+                if 'MHz' not in line:
+                    lines.append(line)
+    except (IOError, OSError):
+        lines.extend([platform.machine(), platform.processor()])
+    return hashlib.sha1(''.join(lines).encode('utf-8')).hexdigest()
+
+
+def _key():
+    """What detection results depend on."""
+    stats = []
+    for path in _release_files + [_archspec_data]:
+        try:
+            st = os.stat(path)
+            stats.append([path, st.st_mtime, st.st_size])
+        except OSError:
+            pass
+
+    key = [_cache_version, spack.spack_version, platform.release(),
+           _cpuinfo_hash(), stats]
+    # Compare with what was read back from JSON
+    return json.loads(json.dumps(key))
+
+
+@llnl.util.lang.memoized
+def _cache():
+    key = _key()
+    try:
+        file_cache = _file_cache()
+        if file_cache.init_entry(_cache_key()):
+            with file_cache.read_transaction(_cache_key()) as f:
+                data = json.load(f)
+            if data['key'] == key:
+                return data
+    except (IOError, OSError, ValueError, KeyError, TypeError,
+            spack.error.SpackError) as e:
+        tty.debug('Could not read the cache of host detection: {0}'.format(e))
+    return {'key': key, 'results': {}}
+
+
+def _write(data):
+    try:
+        with _file_cache().write_transaction(_cache_key()) as (_, f):
+            json.dump(data, f)
+    except (IOError, OSError, spack.error.SpackError) as e:
+        tty.debug('Could not cache host detection: {0}'.format(e))
+
+
+def cached(name, detect):
+    """Return the result of ``detect()`` for this host, from the cache.
+
+    Arguments:
+        name (str): name of the result in the cache
+        detect (typing.Callable): function detecting the result, which must
+            be JSON serializable
+    """
+    data = _cache()
+    if name not in data['results']:
+        data['results'][name] = json.loads(json.dumps(detect()))
+        _write(data)
+    return data['results'][name]
+
+
+def target():
+    """Microarchitecture of the host, as ``archspec.cpu.host()``"""
+    name = cached('target', lambda: archspec.cpu.host().name)
+    if name not in archspec.cpu.TARGETS:
+        # Cached with other microarchitecture data
+        return archspec.cpu.host()
+    return archspec.cpu.TARGETS[name]
+
+
+def _linux_distribution():
+    # This will throw an error if imported on a non-Linux platform.
+    from external.distro import linux_distribution
+    distname, version, _ = linux_distribution(full_distribution_name=False)
+    return str(distname), str(version)
+
+
+def linux_distribution():
+    """Short name and version of the Linux distribution of the host.
+
+    Raises:
+        ImportError: if the distribution can't be detected
+    """
+    return tuple(cached('linux_distribution', _linux_distribution))
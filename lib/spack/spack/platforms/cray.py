@@ -18,6 +18,7 @@
 from spack.util.executable import Executable
 from spack.util.module_cmd import module
 
+from . import _host
 from ._platform import NoPlatformError, Platform
 
 _craype_name_to_target_name = {
@@ -73,7 +74,7 @@ def __init__(self):
             if name not in self.targets:
                 self.add_target(name, spack.target.Target(name))
         self.front_end = os.environ.get(
-            'SPACK_FRONT_END', archspec.cpu.host().name
+            'SPACK_FRONT_END', _host.target().name
         )
         if self.front_end not in self.targets:
             self.add_target(self.front_end, spack.target.Target(self.front_end))
@@ -155,13 +156,13 @@ def _default_target_from_env(self):
                 tty.debug("Found default module:%s" % default_from_module)
                 target = default_from_module
             else:
-                front_end = archspec.cpu.host().name
+                front_end = _host.target().name
                 if front_end in list(
                         map(lambda x: _target_name_from_craype_target_name(x),
                             self._avail_targets())
                 ):
                     tty.debug("default to front-end architecture")
-                    target = archspec.cpu.host().name 
+                    target = _host.target().name 
                 else:
                     target = platform.machine()
             if target is not None:
@@ -10,6 +10,7 @@
 import spack.target
 from spack.operating_systems.mac_os import MacOs
 
+from . import _host
 from ._platform import Platform
 
 
@@ -24,7 +25,7 @@ def __init__(self):
         for name in archspec.cpu.TARGETS:
             self.add_target(name, spack.target.Target(name))
 
-        self.default = archspec.cpu.host().name
+        self.default = _host.target().name
         self.front_end = self.default
         self.back_end = self.default
 
@@ -9,6 +9,7 @@
 import spack.target
 from spack.operating_systems.linux_distro import LinuxDistro
 
+from . import _host
 from ._platform import Platform
 
 
@@ -22,7 +23,7 @@ def __init__(self):
             self.add_target(name, spack.target.Target(name))
 
         # Get specific default
-        self.default = archspec.cpu.host().name
+        self.default = _host.target().name
         self.front_end = self.default
         self.back_end = self.default
 
@@ -2,23 +2,29 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import contextlib
+import mmap
+import multiprocessing
 import multiprocessing.pool
 import os
 import platform
 import re
 import shutil
 
-import macholib.mach_o
-import macholib.MachO
 from ordereddict_backport import OrderedDict
 
 import llnl.util.lang
 import llnl.util.tty as tty
 
 import spack.architecture
+import spack.config
 import spack.repo
 import spack.spec
+import spack.subprocess_context
+import spack.util.elf as elf
 import spack.util.executable as executable
+import spack.util.file_type
+from spack.util.cpus import cpus_available
 
 
 class InstallRootStringError(spack.error.SpackError):
@@ -71,6 +77,10 @@ def __init__(self, old_path, new_path):
         err_msg += "Create buildcache from an install path "
         err_msg += "longer than new path."
         super(BinaryTextReplaceError, self).__init__(msg, err_msg)
+        self.old_path, self.new_path = old_path, new_path
+
+    def __reduce__(self):
+        return type(self), (self.old_path, self.new_path)
 
 
 def _patchelf():
@@ -105,7 +115,8 @@ def _patchelf():
 def _elf_rpaths_for(path):
     """Return the RPATHs for an executable or a library.
 
-    The RPATHs are obtained by ``patchelf --print-rpath PATH``.
+    The RPATHs are read from the dynamic section of the file, or obtained
+    by ``patchelf --print-rpath PATH`` if it can't be read.
 
     Args:
         path (str): full path to the executable or library
@@ -113,6 +124,12 @@ def _elf_rpaths_for(path):
     Return:
         RPATHs as a list of strings.
     """
+    try:
+        return elf.get_rpaths(path)
+    except (elf.ElfParsingError, IOError, OSError) as e:
+        tty.debug('Reading the RPATHs of {0} with patchelf: {1}'.format(
+            path, str(e)))
+
     # If we're relocating patchelf itself, use it
     patchelf_path = path if path.endswith("/bin/patchelf") else _patchelf()
     patchelf = executable.Executable(patchelf_path)
@@ -337,6 +354,7 @@ def modify_object_macholib(cur_path, paths_to_paths):
     mach-o binary to be modified
     dictionary mapping paths in old install layout to new install layout
     """
+    import macholib.MachO
 
     dll = macholib.MachO.MachO(cur_path)
 
@@ -367,6 +385,9 @@ def macholib_get_paths(cur_path):
     Get rpaths, dependencies and id of mach-o objects
     using python macholib package
     """
+    import macholib.mach_o
+    import macholib.MachO
+
     dll = macholib.MachO.MachO(cur_path)
 
     ident = None
@@ -390,20 +411,46 @@ def macholib_get_paths(cur_path):
     return (rpaths, deps, ident)
 
 
-def _set_elf_rpaths(target, rpaths):
+def _set_elf_rpaths_in_place(target, rpaths):
+    """Set the RPATHs of the target in place of the current ones, if they
+    fit.
+
+    Returns:
+        True if the RPATHs were set
+    """
+    try:
+        return elf.set_rpaths_in_place(target, rpaths)
+    except (elf.ElfParsingError, IOError, OSError) as e:
+        tty.debug('Setting the RPATHs of {0} with patchelf: {1}'.format(
+            target, str(e)))
+    return False
+
+
+def _set_elf_rpaths(target, rpaths, patchelf_path=None):
     """Replace the original RPATH of the target with the paths passed
     as arguments.
 
-    This function uses ``patchelf`` to set RPATHs.
+    The RPATHs are rewritten in place if they fit in place of the original
+    ones, otherwise this function uses ``patchelf`` to set RPATHs.
 
     Args:
         target: target executable. Must be an ELF object.
         rpaths: paths to be set in the RPATH
+        patchelf_path: path of ``patchelf``, found or installed by
+            ``_patchelf()`` if not given
 
     Returns:
         A string concatenating the stdout and stderr of the call
-        to ``patchelf``
+        to ``patchelf``, or an empty string if it wasn't needed
     """
+    if _set_elf_rpaths_in_place(target, rpaths):
+        return ''
+    return _patchelf_set_rpaths(target, rpaths, patchelf_path)
+
+
+def _patchelf_set_rpaths(target, rpaths, patchelf_path=None):
+    """Set the RPATHs of the target with ``patchelf``, like
+    ``_set_elf_rpaths``."""
     # Join the paths using ':' as a separator
     rpaths_str = ':'.join(rpaths)
 
@@ -413,7 +460,9 @@ def _set_elf_rpaths(target, rpaths):
         bak_path = target + ".bak"
         shutil.copy(target, bak_path)
 
-    patchelf, output = executable.Executable(bak_path or _patchelf()), None
+    patchelf = executable.Executable(
+        bak_path or patchelf_path or _patchelf())
+    output = None
     try:
         # TODO: revisit the use of --force-rpath as it might be conditional
         # TODO: if we want to support setting RUNPATH from binary packages
@@ -428,6 +477,36 @@ def _set_elf_rpaths(target, rpaths):
     return output
 
 
+def _set_elf_rpaths_for_all(rpaths_by_target, concurrency=32):
+    """Set the RPATHs of many targets, like ``_set_elf_rpaths``.
+
+    RPATHs that fit are rewritten in place, in this process. The others are
+    set by ``patchelf`` processes, started from a pool of threads.
+
+    Args:
+        rpaths_by_target (list): ``(target, rpaths)`` tuples
+        concurrency (int): maximum number of ``patchelf`` processes
+    """
+    pending = [(target, rpaths) for target, rpaths in rpaths_by_target
+               if not _set_elf_rpaths_in_place(target, rpaths)]
+    if not pending:
+        return
+
+    # Find or install patchelf only once
+    patchelf_path = None
+    if any(not target.endswith('/bin/patchelf') for target, _ in pending):
+        patchelf_path = _patchelf()
+
+    tp = multiprocessing.pool.ThreadPool(processes=concurrency)
+    try:
+        tp.map(llnl.util.lang.star(_patchelf_set_rpaths),
+               [(target, rpaths, patchelf_path)
+                for target, rpaths in pending])
+    finally:
+        tp.terminate()
+        tp.join()
+
+
 def needs_binary_relocation(m_type, m_subtype):
     """Returns True if the file with MIME type/subtype passed as arguments
     needs binary relocation, False otherwise.
@@ -437,7 +516,8 @@ def needs_binary_relocation(m_type, m_subtype):
         m_subtype (str): MIME subtype of the file
     """
     if m_type == 'application':
-        if m_subtype in ('x-executable', 'x-sharedlib', 'x-mach-binary'):
+        if m_subtype in ('x-executable', 'x-sharedlib', 'x-pie-executable',
+                         'x-mach-binary'):
             return True
     return False
 
@@ -453,22 +533,198 @@ def needs_text_relocation(m_type, m_subtype):
     return m_type == 'text'
 
 
-def _replace_prefix_text(filename, compiled_prefixes):
+#: Minimum number of bytes relocated by each process when relocating files
+#: in parallel, to make up for starting the processes
+_min_bytes_per_job = 1 << 26
+
+
+@llnl.util.lang.memoized
+def _prefixes_regex(orig_prefixes, binary):
+    """Regex matching any of the byte strings in ``orig_prefixes``, so
+    that files are scanned once for all of them.
+
+    Prefixes are looked for from the start of the file. Where several
+    prefixes start at the same offset, the first one in ``orig_prefixes``
+    matches, like if they were replaced one after the other. In text files,
+    prefixes following a path are ignored, and the prefix is group 2.
+    """
+    alternatives = b'|'.join(re.escape(p) for p in orig_prefixes)
+    if binary:
+        return re.compile(alternatives)
+    return re.compile(
+        b'(?<![\\w\\-_/])([\\w\\-_]*?)(' + alternatives + b')([\\w\\-_/]*)')
+
+
+@contextlib.contextmanager
+def _mapped(f, write=False):
+    """Contents of an open file, mapped in memory.
+
+    Yields an empty string for empty files, which can't be mapped.
+    """
+    if os.fstat(f.fileno()).st_size == 0:
+        yield b''
+        return
+
+    access = mmap.ACCESS_WRITE if write else mmap.ACCESS_READ
+    data = mmap.mmap(f.fileno(), 0, access=access)
+    try:
+        yield data
+    finally:
+        data.close()
+
+
+def prefix_offsets(filename, prefixes, binary=False):
+    """Offsets of the prefixes replaced when relocating a file.
+
+    Occurrences are found like ``relocate_text`` finds them, or like
+    ``relocate_text_bin`` if ``binary``.
+
+    Args:
+        filename (str): file to be scanned
+        prefixes (list): prefixes, in the order they are replaced
+
+    Returns:
+        A dictionary with the ``size`` of the file, and the ``offsets`` of
+        each prefix found in it, or None if no prefix was found
+    """
+    by_bytes = OrderedDict((p.encode('utf-8'), p) for p in prefixes)
+    regex = _prefixes_regex(tuple(by_bytes), binary)
+    group = 0 if binary else 2
+
+    offsets = {}
+    with open(filename, 'rb') as f:
+        with _mapped(f) as data:
+            size = len(data)
+            for m in regex.finditer(data):
+                prefix = by_bytes[m.group(group)]
+                offsets.setdefault(prefix, []).append(m.start(group))
+
+    if not offsets:
+        return None
+    return {'size': size, 'offsets': offsets}
+
+
+def _replace_prefix_text_at_offsets(filename, file_offsets, prefixes):
+    """Replace the prefixes in a text file at the offsets where they were
+    found by ``prefix_offsets``.
+
+    Returns:
+        False, leaving the file untouched, if the file doesn't match the
+        offsets
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if len(data) != file_offsets['size']:
+        return False
+
+    occurrences = sorted(
+        (offset, orig_prefix)
+        for orig_prefix, offsets in file_offsets['offsets'].items()
+        for offset in offsets)
+    chunks, start = [], 0
+    for offset, orig_prefix in occurrences:
+        orig_bytes = orig_prefix.encode('utf-8')
+        if data[offset:offset + len(orig_bytes)] != orig_bytes:
+            return False
+        new_prefix = prefixes.get(orig_prefix)
+        if new_prefix is None or new_prefix == orig_prefix:
+            continue
+        chunks.extend([data[start:offset], new_prefix.encode('utf-8')])
+        start = offset + len(orig_bytes)
+
+    if chunks:
+        chunks.append(data[start:])
+        with open(filename, 'wb') as f:
+            f.write(b''.join(chunks))
+    return True
+
+
+def _replace_prefix_bin_at_offsets(filename, file_offsets, byte_prefixes):
+    """Replace the prefixes in a binary file in place, at the offsets where
+    they were found by ``prefix_offsets``.
+
+    Prefixes are not replaced where the file doesn't hold them anymore,
+    e.g. in rpaths that were already changed.
+
+    Returns:
+        False if the size of the file doesn't match the offsets
+
+    Raises:
+        BinaryTextReplaceError: if a new prefix is longer than the prefix
+            it replaces
+
+    The file is left untouched if False is returned or an error is raised.
+    """
+    if os.path.getsize(filename) != file_offsets['size']:
+        return False
+
+    with open(filename, 'rb+') as f:
+        found = []
+        for orig_prefix, offsets in file_offsets['offsets'].items():
+            orig_bytes = orig_prefix.encode('utf-8')
+            new_bytes = byte_prefixes.get(orig_bytes)
+            if new_bytes is None:
+                continue
+            for offset in offsets:
+                f.seek(offset)
+                if f.read(len(orig_bytes)) == orig_bytes:
+                    found.append((offset, orig_bytes, new_bytes))
+
+        # Leave the file untouched if any prefix can't be replaced
+        for _, orig_bytes, new_bytes in found:
+            if len(new_bytes) > len(orig_bytes):
+                tty.debug('Binary failing to relocate is %s' % filename)
+                raise BinaryTextReplaceError(orig_bytes, new_bytes)
+
+        for offset, orig_bytes, new_bytes in found:
+            padding = os.sep.encode('utf-8') * (
+                len(orig_bytes) - len(new_bytes))
+            f.seek(offset)
+            f.write(new_bytes + padding)
+    return True
+
+
+def _relocate_text_file(filename, byte_prefixes, prefixes, file_offsets):
+    if not (file_offsets and _replace_prefix_text_at_offsets(
+            filename, file_offsets, prefixes)):
+        _replace_prefix_text(filename, byte_prefixes)
+
+
+def _relocate_bin_file(filename, byte_prefixes, file_offsets):
+    if not (file_offsets and _replace_prefix_bin_at_offsets(
+            filename, file_offsets, byte_prefixes)):
+        _replace_prefix_bin(filename, byte_prefixes)
+
+
+def _replace_prefix_text(filename, byte_prefixes):
     """Replace all the occurrences of the old install prefix with a
     new install prefix in text files that are utf-8 encoded.
 
+    The file is scanned once for all the prefixes, and only rewritten if
+    any of them is found.
+
     Args:
         filename (str): target text file (utf-8 encoded)
-        compiled_prefixes (OrderedDict): OrderedDictionary where the keys are
-        precompiled regex of the old prefixes and the values are the new
-        prefixes (uft-8 encoded)
+        byte_prefixes (OrderedDict): OrderedDictionary where the keys are
+        the old prefixes and the values are the new prefixes (utf-8
+        encoded)
     """
+    regex = _prefixes_regex(tuple(byte_prefixes), False)
     with open(filename, 'rb+') as f:
-        data = f.read()
+        with _mapped(f) as data:
+            chunks, start = [], 0
+            for m in regex.finditer(data):
+                new_bytes = byte_prefixes[m.group(2)]
+                if new_bytes == m.group(2):
+                    continue
+                chunks.extend([data[start:m.start(2)], new_bytes])
+                start = m.end(2)
+            if not chunks:
+                return
+            chunks.append(data[start:])
+
         f.seek(0)
-        for orig_prefix_rexp, new_bytes in compiled_prefixes.items():
-            data = orig_prefix_rexp.sub(new_bytes, data)
-        f.write(data)
+        f.write(b''.join(chunks))
         f.truncate()
 
 
@@ -477,40 +733,68 @@ def _replace_prefix_bin(filename, byte_prefixes):
     new install prefix in binary files.
 
     The new install prefix is prefixed with ``os.sep`` until the
-    lengths of the prefixes are the same.
+    lengths of the prefixes are the same. The file is scanned once for all
+    the prefixes, and patched in place.
 
     Args:
         filename (str): target binary file
         byte_prefixes (OrderedDict): OrderedDictionary where the keys are
-        precompiled regex of the old prefixes and the values are the new
-        prefixes (uft-8 encoded)
+        the old prefixes and the values are the new prefixes (utf-8
+        encoded)
     """
-
+    regex = _prefixes_regex(tuple(byte_prefixes), True)
     with open(filename, 'rb+') as f:
-        data = f.read()
-        f.seek(0)
-        for orig_bytes, new_bytes in byte_prefixes.items():
-            original_data_len = len(data)
-            # Skip this hassle if not found
-            if orig_bytes not in data:
-                continue
-            # We only care about this problem if we are about to replace
-            length_compatible = len(new_bytes) <= len(orig_bytes)
-            if not length_compatible:
-                tty.debug('Binary failing to relocate is %s' % filename)
-                raise BinaryTextReplaceError(orig_bytes, new_bytes)
-            pad_length = len(orig_bytes) - len(new_bytes)
-            padding = os.sep * pad_length
-            padding = padding.encode('utf-8')
-            data = data.replace(orig_bytes, new_bytes + padding)
-            # Really needs to be the same length
-            if not len(data) == original_data_len:
-                print('Length of pad:', pad_length, 'should be', len(padding))
-                print(new_bytes, 'was to replace', orig_bytes)
-                raise BinaryStringReplacementError(
-                    filename, original_data_len, len(data))
-        f.write(data)
-        f.truncate()
+        with _mapped(f, write=True) as data:
+            found = [(m.start(), m.group(0)) for m in regex.finditer(data)]
+            # Leave the file untouched if any prefix can't be replaced
+            for _, orig_bytes in found:
+                new_bytes = byte_prefixes[orig_bytes]
+                if len(new_bytes) > len(orig_bytes):
+                    tty.debug('Binary failing to relocate is %s' % filename)
+                    raise BinaryTextReplaceError(orig_bytes, new_bytes)
+
+            for offset, orig_bytes in found:
+                new_bytes = byte_prefixes[orig_bytes]
+                if new_bytes == orig_bytes:
+                    continue
+                padding = os.sep.encode('utf-8') * (
+                    len(orig_bytes) - len(new_bytes))
+                data[offset:offset + len(orig_bytes)] = new_bytes + padding
+
+
+def _call(args):
+    """Call ``args[0]`` with the other items of ``args`` as arguments.
+    Run in a process pool."""
+    return args[0](*args[1:])
+
+
+def _relocate_files(relocate_file, args, concurrency):
+    """Call ``relocate_file`` with each tuple of arguments in ``args``,
+    whose first item is the file to relocate.
+
+    Relocating files is CPU bound, so many or large files are relocated by
+    a pool of processes, as many as there are available CPUs, but at most
+    ``concurrency``.
+    """
+    sizes = dict((a[0], os.path.getsize(a[0])) for a in args)
+    jobs = min(concurrency, cpus_available(), len(args),
+               sum(sizes.values()) // _min_bytes_per_job)
+
+    # Daemon processes (e.g. other pool workers) can't have children
+    if jobs < 2 or multiprocessing.current_process().daemon:
+        for file_args in args:
+            relocate_file(*file_args)
+        return
+
+    # Largest files first, so that processes finish at about the same time
+    args = sorted(args, key=lambda a: sizes[a[0]], reverse=True)
+    pool = spack.subprocess_context.process_pool(jobs)
+    try:
+        pool.map(_call, [(relocate_file,) + tuple(a) for a in args],
+                 chunksize=1)
+    finally:
+        pool.terminate()
+        pool.join()
 
 
 def relocate_macho_binaries(path_names, old_layout_root, new_layout_root,
@@ -625,8 +909,8 @@ def relocate_elf_binaries(binaries, orig_root, new_root,
                           new_prefixes, rel, orig_prefix, new_prefix):
     """Relocate the binaries passed as arguments by changing their RPATHs.
 
-    Use patchelf to get the original RPATHs and then replace them with
-    rpaths in the new directory layout.
+    Read the original RPATHs and then replace them with rpaths in the new
+    directory layout, in place if they fit, with patchelf otherwise.
 
     New RPATHs are determined from a dictionary mapping the prefixes in the
     old directory layout to the prefixes in the new directory layout if the
@@ -643,6 +927,7 @@ def relocate_elf_binaries(binaries, orig_root, new_root,
         orig_prefix (str): prefix where the executable was originally located
         new_prefix (str): prefix where we want to relocate the executable
     """
+    rpaths_by_binary = []
     for new_binary in binaries:
         orig_rpaths = _elf_rpaths_for(new_binary)
         # TODO: Can we deduce `rel` from the original RPATHs?
@@ -667,12 +952,14 @@ def relocate_elf_binaries(binaries, orig_root, new_root,
             )
             # check to see if relative rpaths are changed before rewriting
             if sorted(new_rpaths) != sorted(orig_rpaths):
-                _set_elf_rpaths(new_binary, new_rpaths)
+                rpaths_by_binary.append((new_binary, new_rpaths))
         else:
             new_rpaths = _transform_rpaths(
                 orig_rpaths, orig_root, new_prefixes
             )
-            _set_elf_rpaths(new_binary, new_rpaths)
+            rpaths_by_binary.append((new_binary, new_rpaths))
+
+    _set_elf_rpaths_for_all(rpaths_by_binary)
 
 
 def make_link_relative(new_links, orig_links):
@@ -719,13 +1006,16 @@ def make_elf_binaries_relative(new_binaries, orig_binaries, orig_layout_root):
         orig_layout_root (str): path to be used as a base for making
             RPATHs relative
     """
+    rpaths_by_binary = []
     for new_binary, orig_binary in zip(new_binaries, orig_binaries):
         orig_rpaths = _elf_rpaths_for(new_binary)
         if orig_rpaths:
             new_rpaths = _make_relative(
                 orig_binary, orig_layout_root, orig_rpaths
             )
-            _set_elf_rpaths(new_binary, new_rpaths)
+            rpaths_by_binary.append((new_binary, new_rpaths))
+
+    _set_elf_rpaths_for_all(rpaths_by_binary)
 
 
 def raise_if_not_relocatable(binaries, allow_root):
@@ -782,7 +1072,23 @@ def relocate_links(links, orig_layout_root,
             tty.warn(msg.format(link_target, abs_link, new_install_prefix))
 
 
-def relocate_text(files, prefixes, concurrency=32):
+def _byte_prefixes(prefixes):
+    """Prefixes to be replaced, as utf-8 encoded strings, or an empty
+    dictionary if none of them changes."""
+    byte_prefixes = OrderedDict()
+    for orig_prefix, new_prefix in prefixes.items():
+        if not isinstance(orig_prefix, bytes):
+            orig_prefix = orig_prefix.encode('utf-8')
+        if not isinstance(new_prefix, bytes):
+            new_prefix = new_prefix.encode('utf-8')
+        byte_prefixes[orig_prefix] = new_prefix
+
+    if all(o == n for o, n in byte_prefixes.items()):
+        return OrderedDict()
+    return byte_prefixes
+
+
+def relocate_text(files, prefixes, concurrency=32, offsets=None):
     """Relocate text file from the original installation prefix to the
      new prefix.
 
@@ -791,39 +1097,31 @@ def relocate_text(files, prefixes, concurrency=32):
      Args:
          files (list): Text files to be relocated
          prefixes (OrderedDict): String prefixes which need to be changed
-         concurrency (int): Preferred degree of parallelism
+         concurrency (int): Maximum number of processes relocating files
+         offsets (dict): offsets of the prefixes in files, as returned by
+             ``prefix_offsets``, by file. Other files, or files that
+             changed since, are scanned for the prefixes.
     """
 
     # This now needs to be handled by the caller in all cases
     # orig_sbang = '#!/bin/bash {0}/bin/sbang'.format(orig_spack)
     # new_sbang = '#!/bin/bash {0}/bin/sbang'.format(new_spack)
 
-    compiled_prefixes = OrderedDict({})
-
-    for orig_prefix, new_prefix in prefixes.items():
-        if orig_prefix != new_prefix:
-            orig_bytes = orig_prefix.encode('utf-8')
-            orig_prefix_rexp = re.compile(
-                b'(?<![\\w\\-_/])([\\w\\-_]*?)%s([\\w\\-_/]*)' % orig_bytes)
-            new_bytes = b'\\1%s\\2' % new_prefix.encode('utf-8')
-            compiled_prefixes[orig_prefix_rexp] = new_bytes
+    byte_prefixes = _byte_prefixes(prefixes)
+    if not byte_prefixes:
+        return
 
     # Do relocations on text that refers to the install tree
-    # multiprocesing.ThreadPool.map requires single argument
-
+    offsets = offsets or {}
     args = []
     for filename in files:
-        args.append((filename, compiled_prefixes))
+        args.append((filename, byte_prefixes, prefixes,
+                     offsets.get(filename)))
 
-    tp = multiprocessing.pool.ThreadPool(processes=concurrency)
-    try:
-        tp.map(llnl.util.lang.star(_replace_prefix_text), args)
-    finally:
-        tp.terminate()
-        tp.join()
+    _relocate_files(_relocate_text_file, args, concurrency)
 
 
-def relocate_text_bin(binaries, prefixes, concurrency=32):
+def relocate_text_bin(binaries, prefixes, concurrency=32, offsets=None):
     """Replace null terminated path strings hard coded into binaries.
 
     The new install prefix must be shorter than the original one.
@@ -831,39 +1129,26 @@ def relocate_text_bin(binaries, prefixes, concurrency=32):
     Args:
         binaries (list): binaries to be relocated
         prefixes (OrderedDict): String prefixes which need to be changed.
-        concurrency (int): Desired degree of parallelism.
+        concurrency (int): Maximum number of processes relocating binaries
+        offsets (dict): offsets of the prefixes in binaries, as returned by
+            ``prefix_offsets``, by binary. Other binaries, or binaries
+            whose size changed since, are scanned for the prefixes.
 
     Raises:
       BinaryTextReplaceError: when the new path is longer than the old path
     """
-    byte_prefixes = OrderedDict({})
-
-    for orig_prefix, new_prefix in prefixes.items():
-        if orig_prefix != new_prefix:
-            if isinstance(orig_prefix, bytes):
-                orig_bytes = orig_prefix
-            else:
-                orig_bytes = orig_prefix.encode('utf-8')
-            if isinstance(new_prefix, bytes):
-                new_bytes = new_prefix
-            else:
-                new_bytes = new_prefix.encode('utf-8')
-            byte_prefixes[orig_bytes] = new_bytes
+    byte_prefixes = _byte_prefixes(prefixes)
+    if not byte_prefixes:
+        return
 
     # Do relocations on text in binaries that refers to the install tree
-    # multiprocesing.ThreadPool.map requires single argument
+    offsets = offsets or {}
     args = []
 
     for binary in binaries:
-        args.append((binary, byte_prefixes))
+        args.append((binary, byte_prefixes, offsets.get(binary)))
 
-    tp = multiprocessing.pool.ThreadPool(processes=concurrency)
-
-    try:
-        tp.map(llnl.util.lang.star(_replace_prefix_bin), args)
-    finally:
-        tp.terminate()
-        tp.join()
+    _relocate_files(_relocate_bin_file, args, concurrency)
 
 
 def is_relocatable(spec):
@@ -926,38 +1211,64 @@ def file_is_relocatable(filename, paths_to_relocate=None):
     if not os.path.isabs(filename):
         raise ValueError('{0} is not an absolute path'.format(filename))
 
-    strings = executable.Executable('strings')
-
     # Remove the RPATHS from the strings in the executable
-    set_of_strings = set(strings(filename, output=str).split())
+    excluded = set()
 
     m_type, m_subtype = mime_type(filename)
     if m_type == 'application':
         tty.debug('{0},{1}'.format(m_type, m_subtype))
 
     if platform.system().lower() == 'linux':
-        if m_subtype == 'x-executable' or m_subtype == 'x-sharedlib':
-            rpaths = ':'.join(_elf_rpaths_for(filename))
-            set_of_strings.discard(rpaths)
+        if m_subtype in ('x-executable', 'x-sharedlib', 'x-pie-executable'):
+            excluded.add(':'.join(_elf_rpaths_for(filename)))
     if platform.system().lower() == 'darwin':
         if m_subtype == 'x-mach-binary':
             rpaths, deps, idpath = macholib_get_paths(filename)
-            set_of_strings.discard(set(rpaths))
-            set_of_strings.discard(set(deps))
             if idpath is not None:
-                set_of_strings.discard(idpath)
-
-    for path_to_relocate in paths_to_relocate:
-        if any(path_to_relocate in x for x in set_of_strings):
-            # One binary has the root folder not in the RPATH,
-            # meaning that this spec is not relocatable
-            msg = 'Found "{0}" in {1} strings'
-            tty.debug(msg.format(path_to_relocate, filename))
-            return False
+                excluded.add(idpath)
+
+    path_to_relocate = _path_in_strings(
+        filename, paths_to_relocate, excluded)
+    if path_to_relocate is not None:
+        # One binary has the root folder not in the RPATH,
+        # meaning that this spec is not relocatable
+        msg = 'Found "{0}" in {1} strings'
+        tty.debug(msg.format(path_to_relocate, filename))
+        return False
 
     return True
 
 
+#: Regexes matching the printable characters before and from a position,
+#: up to whitespace, i.e. the characters of the words that ``strings``
+#: outputs
+_word_start = re.compile(b'[!-~]*\\Z')
+_word_end = re.compile(b'[!-~]*')
+
+
+def _path_in_strings(filename, paths, excluded):
+    """First of ``paths`` found in the words of the printable strings of a
+    file, like ``strings`` finds them, other than the ``excluded`` words.
+
+    The file is scanned once for all the paths, instead of running
+    ``strings`` and looking for each path in its output.
+
+    Returns:
+        The path found, or None
+    """
+    regex = _prefixes_regex(tuple(p.encode('utf-8') for p in paths), True)
+    excluded = set(e.encode('utf-8') for e in excluded)
+    with open(filename, 'rb') as f:
+        with _mapped(f) as data:
+            for m in regex.finditer(data):
+                begin = _word_start.search(
+                    data, max(0, m.start() - 4096), m.start()).start()
+                end = _word_end.match(data, m.end()).end()
+                if data[begin:end] not in excluded:
+                    return m.group(0).decode('utf-8')
+    return None
+
+
 def is_binary(filename):
     """Returns true if a file is binary, False otherwise
 
@@ -982,16 +1293,29 @@ def is_binary(filename):
 def mime_type(filename):
     """Returns the mime type and subtype of a file.
 
+    Files are classified by their contents, without running ``file``,
+    unless ``config:file_command_fallback`` is set, in which case ``file``
+    classifies the files Spack doesn't recognize.
+
     Args:
         filename: file to be analyzed
 
     Returns:
         Tuple containing the MIME type and subtype
     """
+    m_type = spack.util.file_type.mime_type(filename)
+    if (m_type == spack.util.file_type.data and
+            spack.config.get('config:file_command_fallback', False)):
+        m_type = _file_mime_type(filename)
+    tty.debug('[MIME_TYPE] {0} -> {1}'.format(filename, '/'.join(m_type)))
+    return m_type
+
+
+def _file_mime_type(filename):
+    """Returns the mime type and subtype of a file according to ``file``."""
     file_cmd = executable.Executable('file')
     output = file_cmd(
         '-b', '-h', '--mime-type', filename, output=str, error=str)
-    tty.debug('[MIME_TYPE] {0} -> {1}'.format(filename, output.strip()))
     # In corner cases the output does not contain a subtype prefixed with a /
     # In those cases add the / so the tuple can be formed.
     if '/' not in output:
@@ -8,8 +8,10 @@
 import contextlib
 import errno
 import functools
+import hashlib
 import inspect
 import itertools
+import multiprocessing
 import os
 import re
 import shutil
@@ -35,9 +37,11 @@
 import spack.caches
 import spack.config
 import spack.error
+import spack.metadata_index
 import spack.patch
 import spack.provider_index
 import spack.spec
+import spack.util.executable
 import spack.util.imp as simp
 import spack.util.naming as nm
 import spack.util.path
@@ -81,6 +85,16 @@ def get_full_namespace(namespace):
 _package_prepend = 'from spack.pkgkit import *'
 
 
+def bytecode_cache_location():
+    """Directory where the bytecode of package modules is cached.
+
+    Bytecode is cached in Spack's misc cache rather than in ``__pycache__``
+    directories next to packages, so that packages in repositories the
+    user can't write to aren't compiled again by every process.
+    """
+    return os.path.join(spack.caches.misc_cache.root, 'bytecode')
+
+
 def autospec(function):
     """Decorator that automatically converts the first argument of a
     function to a Spec.
@@ -128,16 +142,125 @@ def __getattr__(self, name):
         return getattr(self, name)
 
 
+def _find_git_checkout(path):
+    """Find the git checkout that contains a path, if any.
+
+    Returns:
+        (tuple): ``(work_tree, git_dir)``, or ``None`` if the path is not
+            in a git checkout
+    """
+    path = os.path.abspath(path)
+    while True:
+        dot_git = os.path.join(path, '.git')
+        if os.path.isdir(dot_git):
+            return path, dot_git
+
+        # Worktrees and submodules have a .git file pointing to the git dir
+        if os.path.isfile(dot_git):
+            with open(dot_git) as f:
+                content = f.read().strip()
+            if content.startswith('gitdir:'):
+                git_dir = content[len('gitdir:'):].strip()
+                return path, os.path.join(path, git_dir)
+            return None
+
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _git_head(git_dir):
+    """Read the commit checked out in a git dir without running git.
+
+    Returns:
+        (str): the sha of the commit, or ``None`` if it can't be found
+    """
+    try:
+        with open(os.path.join(git_dir, 'HEAD')) as f:
+            head = f.read().strip()
+        if not head.startswith('ref:'):
+            return head
+
+        # Refs are shared among worktrees, in the common dir
+        ref = head[len('ref:'):].strip()
+        common_dir = git_dir
+        commondir_file = os.path.join(git_dir, 'commondir')
+        if os.path.isfile(commondir_file):
+            with open(commondir_file) as f:
+                common_dir = os.path.join(git_dir, f.read().strip())
+
+        ref_file = os.path.join(common_dir, ref)
+        if os.path.isfile(ref_file):
+            with open(ref_file) as f:
+                return f.read().strip()
+
+        with open(os.path.join(common_dir, 'packed-refs')) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def _git_tree(work_tree, path):
+    """Hash of the tree that git has committed for a path in a checkout."""
+    git = spack.util.executable.which('git')
+    if not git:
+        return None
+    output = git(
+        '-C', work_tree, 'rev-parse',
+        'HEAD:{0}'.format(os.path.relpath(path, work_tree)),
+        output=str, error=os.devnull, fail_on_error=False
+    )
+    return output.strip() if git.returncode == 0 else None
+
+
+def _list_dir(path):
+    """Names of the entries of a directory, without stat calls."""
+    if sys.version_info >= (3, 5):
+        return sorted(entry.name for entry in os.scandir(path))  # novm
+    return sorted(os.listdir(path))
+
+
+def _git_clean(work_tree, path):
+    """Whether the files that git tracks in a path have no uncommitted
+    changes. Git compares them to the stats recorded in its index, with
+    several threads."""
+    git = spack.util.executable.which('git')
+    if not git:
+        return False
+    output = git(
+        '-C', work_tree, 'status', '--porcelain', '--untracked-files=no',
+        '--',
+        os.path.relpath(path, work_tree),
+        output=str, error=os.devnull, fail_on_error=False,
+        # Don't refresh the index of checkouts the user can't write to
+        extra_env={'GIT_OPTIONAL_LOCKS': '0'}
+    )
+    return git.returncode == 0 and not output.strip()
+
+
 class FastPackageChecker(Mapping):
-    """Cache that maps package names to the stats obtained on the
+    """Cache that maps package names to the modification times of the
     'package.py' files associated with them.
 
     For each repository a cache is maintained at class level, and shared among
     all instances referring to it. Update of the global cache is done lazily
     during instance initialization.
+
+    For repositories in git checkouts, the cache is also persisted in the
+    misc cache, and reused by later processes for as long as the packages
+    directory and the commit of the packages are unchanged. See
+    ``_create_new_cache()``.
     """
     #: Global cache, reused by every instance
-    _paths_cache = {}  # type: Dict[str, Dict[str, os.stat_result]]
+    _paths_cache = {}  # type: Dict[str, Dict[str, float]]
+
+    #: Version of the format of the snapshots stored in the misc cache
+    _snapshot_version = 3
 
     def __init__(self, packages_path):
         # The path of the repository managed by this instance
@@ -151,21 +274,121 @@ def __init__(self, packages_path):
         self._packages_to_stats = self._paths_cache[packages_path]
 
     def invalidate(self):
-        """Regenerate cache for this checker."""
-        self._paths_cache[self.packages_path] = self._create_new_cache()
+        """Regenerate cache for this checker, looking at every package."""
+        self._paths_cache[self.packages_path] = self._create_new_cache(
+            use_snapshot=False)
         self._packages_to_stats = self._paths_cache[self.packages_path]
 
-    def _create_new_cache(self):  # type: () -> Dict[str, os.stat_result]
+    def changed(self):
+        """Whether packages were added, removed or modified since the
+        cache for this checker was created."""
+        return self._create_new_cache() != self._packages_to_stats
+
+    def _create_new_cache(self, use_snapshot=True):
+        # type: (bool) -> Dict[str, float]
         """Create a new cache for packages in a repo.
 
-        The implementation here should try to minimize filesystem
-        calls.  At the moment, it is O(number of packages) and makes
-        about one stat call per package.  This is reasonably fast, and
-        avoids actually importing packages in Spack, which is slow.
+        The implementation here should try to minimize filesystem calls,
+        so change detection is done in tiers:
+
+        1. Snapshots of repos in git checkouts are stored in the misc cache.
+           The mtime and the entries of the packages directory, which change
+           whenever packages are added or removed, are compared to the ones
+           in the snapshot. This takes one stat call and one ``scandir``.
+        2. The commit checked out is compared to the one in the snapshot.
+           If it moved, the hash of the tree of packages is compared
+           instead, so that commits that don't touch packages keep the
+           snapshot valid.
+        3. If the repository changed, or there is no snapshot, we scan the
+           packages directory and make one stat call per package. This
+           avoids actually importing packages in Spack, which is slow.
+
+        Packages edited in place don't change any directory, so snapshots
+        are only reused when ``git status`` reported no uncommitted change
+        to the packages when they were taken. Otherwise, packages are
+        scanned by every process, and ``git status`` only runs again once
+        they changed. Edits made after a snapshot was taken are detected
+        when they are committed, or by ``spack repo reindex``, which always
+        rescans.
         """
+        checkout = _find_git_checkout(self.packages_path)
+        head = _git_head(checkout[1]) if checkout else None
+        if head is None:
+            return self._stat_packages()
+
+        dir_mtime = os.stat(self.packages_path).st_mtime
+        entries = _list_dir(self.packages_path)
+        snapshot = self._read_snapshot() if use_snapshot else None
+        unchanged_dir = bool(snapshot) and (
+            snapshot['mtime'] == dir_mtime and snapshot['entries'] == entries)
+        if unchanged_dir and snapshot['clean']:
+            if snapshot['head'] == head:
+                return snapshot['packages']
+
+            tree = _git_tree(checkout[0], self.packages_path)
+            if tree is not None and snapshot['tree'] == tree:
+                snapshot['head'] = head
+                self._write_snapshot(snapshot)
+                return snapshot['packages']
+
+        cache = self._stat_packages()
+        if (unchanged_dir and not snapshot['clean'] and
+                snapshot['head'] == head and snapshot['packages'] == cache):
+            # Uncommitted changes that were already seen
+            return cache
+
+        # Run git after the scan, so that packages edited during the scan
+        # are not taken for committed ones
+        clean = _git_clean(checkout[0], self.packages_path)
+        self._write_snapshot({
+            'version': self._snapshot_version,
+            'packages_path': self.packages_path,
+            'mtime': dir_mtime,
+            'entries': entries,
+            'head': head,
+            'clean': clean,
+            'tree': _git_tree(checkout[0], self.packages_path)
+            if clean else None,
+            'packages': cache,
+        })
+        return cache
+
+    @property
+    def _snapshot_key(self):
+        path_hash = hashlib.sha1(self.packages_path.encode('utf-8'))
+        return 'package-stats/{0}.json'.format(path_hash.hexdigest())
+
+    def _read_snapshot(self):
+        """Read the snapshot of this repo in the misc cache, if any."""
+        misc_cache = spack.caches.misc_cache
+        try:
+            if not misc_cache.init_entry(self._snapshot_key):
+                return None
+            with misc_cache.read_transaction(self._snapshot_key) as f:
+                snapshot = sjson.load(f)
+        except (IOError, OSError, ValueError, spack.error.SpackError) as e:
+            tty.debug('Cannot read the package stats cache: {0}'.format(e))
+            return None
+
+        if (snapshot.get('version') != self._snapshot_version or
+                snapshot.get('packages_path') != self.packages_path):
+            return None
+        return snapshot
+
+    def _write_snapshot(self, snapshot):
+        """Persist a snapshot of this repo in the misc cache."""
+        misc_cache = spack.caches.misc_cache
+        try:
+            with misc_cache.write_transaction(self._snapshot_key) as (_, f):
+                sjson.dump(snapshot, f)
+        except (IOError, OSError, spack.error.SpackError) as e:
+            tty.debug('Cannot write the package stats cache: {0}'.format(e))
+
+    def _stat_packages(self):  # type: () -> Dict[str, float]
+        """Scan the packages directory and stat every package file."""
         # Create a dictionary that will store the mapping between a
-        # package name and its stat info
-        cache = {}  # type: Dict[str, os.stat_result]
+        # package name and the mtime of its package file
+        cache = {}  # type: Dict[str, float]
         for pkg_name in os.listdir(self.packages_path):
             # Skip non-directories in the package root.
             pkg_dir = os.path.join(self.packages_path, pkg_name)
@@ -199,15 +422,14 @@ def _create_new_cache(self):  # type: () -> Dict[str, os.stat_result]
             if stat.S_ISDIR(sinfo.st_mode):
                 continue
 
-            # If it is a file, then save the stats under the
+            # If it is a file, then save the mtime under the
             # appropriate key
-            cache[pkg_name] = sinfo
+            cache[pkg_name] = sinfo.st_mtime
 
         return cache
 
     def last_mtime(self):
-        return max(
-            sinfo.st_mtime for sinfo in self._packages_to_stats.values())
+        return max(self._packages_to_stats.values())
 
     def __getitem__(self, item):
         return self._packages_to_stats[item]
@@ -258,15 +480,28 @@ def update_package(self, pkg_name):
         package = path.get(pkg_name)
 
         # Remove the package from the list of packages, if present
-        for pkg_list in self._tag_dict.values():
-            if pkg_name in pkg_list:
-                pkg_list.remove(pkg_name)
+        self.remove_package(package.name)
 
         # Add it again under the appropriate tags
         for tag in getattr(package, 'tags', []):
             tag = tag.lower()
             self._tag_dict[tag].append(package.name)
 
+    def remove_package(self, pkg_name):
+        """Removes a package from all the tags in the index."""
+        for pkg_list in self._tag_dict.values():
+            if pkg_name in pkg_list:
+                pkg_list.remove(pkg_name)
+
+    def merge(self, other):
+        """Merge another tag index into this one.
+
+        Args:
+            other (TagIndex): tag index to be merged
+        """
+        for tag, pkg_list in other.items():
+            self._tag_dict[tag].extend(pkg_list)
+
 
 @six.add_metaclass(abc.ABCMeta)
 class Indexer(object):
@@ -307,6 +542,17 @@ def update(self, pkg_fullname):
     def write(self, stream):
         """Write the index to a file object."""
 
+    @abc.abstractmethod
+    def merge(self, pkg_fullnames, fragment):
+        """Replace the entries of some packages with those of a fragment.
+
+        Arguments:
+            pkg_fullnames (list): names of the packages that were indexed
+                in the fragment. Their current entries are removed.
+            fragment (object): an index created by this indexer that was
+                updated with just ``pkg_fullnames``
+        """
+
 
 class TagIndexer(Indexer):
     """Lifecycle methods for a TagIndex on a Repo."""
@@ -322,6 +568,11 @@ def update(self, pkg_fullname):
     def write(self, stream):
         self.index.to_json(stream)
 
+    def merge(self, pkg_fullnames, fragment):
+        for pkg_fullname in pkg_fullnames:
+            self.index.remove_package(pkg_fullname.split('.')[-1])
+        self.index.merge(fragment)
+
 
 class ProviderIndexer(Indexer):
     """Lifecycle methods for virtual package providers."""
@@ -341,6 +592,11 @@ def update(self, pkg_fullname):
     def write(self, stream):
         self.index.to_json(stream)
 
+    def merge(self, pkg_fullnames, fragment):
+        for pkg_fullname in pkg_fullnames:
+            self.index.remove_provider(pkg_fullname)
+        self.index.merge(fragment)
+
 
 class PatchIndexer(Indexer):
     """Lifecycle methods for patch cache."""
@@ -363,6 +619,31 @@ def write(self, stream):
     def update(self, pkg_fullname):
         self.index.update_package(pkg_fullname)
 
+    def merge(self, pkg_fullnames, fragment):
+        for pkg_fullname in pkg_fullnames:
+            self.index.remove_package(pkg_fullname)
+        self.index.update(fragment)
+
+
+class MetadataIndexer(Indexer):
+    """Lifecycle methods for the package metadata index."""
+    def _create(self):
+        return spack.metadata_index.MetadataIndex()
+
+    def read(self, stream):
+        self.index = spack.metadata_index.MetadataIndex.from_json(stream)
+
+    def update(self, pkg_fullname):
+        self.index.update_package(pkg_fullname)
+
+    def write(self, stream):
+        self.index.to_json(stream)
+
+    def merge(self, pkg_fullnames, fragment):
+        for pkg_fullname in pkg_fullnames:
+            self.index.remove_package(pkg_fullname.split('.')[-1])
+        self.index.merge(fragment)
+
 
 class RepoIndex(object):
     """Container class that manages a set of Indexers for a Repo.
@@ -410,7 +691,22 @@ def __getitem__(self, name):
 
         return self.indexes[name]
 
-    def _build_all_indexes(self):
+    def update(self, jobs=None):
+        """Bring all the indexes up to date with the package files.
+
+        Arguments:
+            jobs (int): number of processes used to import the packages
+                that need to be re-indexed. Defaults to
+                ``config:build_jobs``.
+
+        Returns:
+            (list): names of the packages that were re-indexed
+        """
+        # Look at every package file, even if the repo looks unchanged
+        self.checker.invalidate()
+        return self._build_all_indexes(jobs)
+
+    def _build_all_indexes(self, jobs=None):
         """Build all the indexes at once.
 
         We regenerate *all* indexes whenever *any* index needs an update,
@@ -419,24 +715,91 @@ def _build_all_indexes(self):
         rather only pay that cost once rather than on several
         invocations.
 
+        When many packages changed, they are imported in a pool of
+        processes. Each process builds index fragments for a chunk of
+        packages, and the fragments are merged in package name order, so
+        the result does not depend on the number of processes.
+
         """
-        for name, indexer in self.indexers.items():
-            self.indexes[name] = self._build_index(name, indexer)
+        needs_update = {}
+        for name in self.indexers:
+            index_mtime = spack.caches.misc_cache.mtime(
+                self._cache_filename(name))
+            needs_update[name] = sorted(
+                x for x, mtime in self.checker.items() if mtime > index_mtime
+            )
 
-    def _build_index(self, name, indexer):
-        """Determine which packages need an update, and update indexes."""
+        dirty = sorted(set(itertools.chain(*needs_update.values())))
+        fragments = self._index_in_parallel(dirty, jobs)
+        if fragments is not None:
+            # The fragments hold all the dirty packages, merge them all
+            needs_update = dict(
+                (name, dirty if pkgs else [])
+                for name, pkgs in needs_update.items()
+            )
 
-        # Filename of the provider index cache (we assume they're all json)
-        cache_filename = '{0}/{1}-index.json'.format(name, self.namespace)
+        for name, indexer in self.indexers.items():
+            self.indexes[name] = self._build_index(
+                name, indexer, needs_update[name], fragments)
 
-        # Compute which packages needs to be updated in the cache
-        misc_cache = spack.caches.misc_cache
-        index_mtime = misc_cache.mtime(cache_filename)
+        return dirty
+
+    def _index_in_parallel(self, pkg_names, jobs=None):
+        """Import packages in a process pool and return index fragments.
 
-        needs_update = [
-            x for x, sinfo in self.checker.items()
-            if sinfo.st_mtime > index_mtime
+        Returns:
+            (list): ``(pkg_names, fragments)`` tuples, in the order of
+                ``pkg_names``, where ``fragments`` maps indexer names to the
+                serialized index of just those packages. ``None`` if there
+                are too few packages to be worth spawning processes.
+        """
+        if jobs is None:
+            jobs = spack.config.get('config:build_jobs', 1)
+        jobs = min(jobs, len(pkg_names) // _min_packages_per_job)
+
+        # Daemon processes (e.g. other pool workers) can't have children
+        if jobs < 2 or multiprocessing.current_process().daemon:
+            return None
+
+        # Use a few chunks per process, so that slow packages balance out
+        chunk_size = -(-len(pkg_names) // (4 * jobs))
+        chunks = [
+            pkg_names[i:i + chunk_size]
+            for i in range(0, len(pkg_names), chunk_size)
         ]
+        indexer_types = sorted(
+            (name, type(indexer)) for name, indexer in self.indexers.items()
+        )
+        args = [(self.namespace, indexer_types, chunk) for chunk in chunks]
+
+        tty.debug('Indexing {0} packages in {1} with {2} processes'.format(
+            len(pkg_names), self.namespace, jobs))
+        from spack.subprocess_context import process_pool  # import cycle
+        pool = process_pool(jobs)
+        try:
+            fragments = pool.map(_index_packages, args)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return list(zip(chunks, fragments))
+
+    def _cache_filename(self, name):
+        """Filename of the cache for an index (we assume they're all json)"""
+        return '{0}/{1}-index.json'.format(name, self.namespace)
+
+    def _build_index(self, name, indexer, needs_update, fragments=None):
+        """Update an index with the packages that need an update.
+
+        Arguments:
+            name (str): name of the index
+            indexer (Indexer): indexer for the index
+            needs_update (list): names of packages whose entries are stale
+            fragments (list): if not None, index fragments computed by
+                ``_index_in_parallel()`` for the packages in ``needs_update``
+        """
+        cache_filename = self._cache_filename(name)
+        misc_cache = spack.caches.misc_cache
 
         index_existed = misc_cache.init_entry(cache_filename)
         if index_existed and not needs_update:
@@ -449,15 +812,50 @@ def _build_index(self, name, indexer):
             with misc_cache.write_transaction(cache_filename) as (old, new):
                 indexer.read(old) if old else indexer.create()
 
-                for pkg_name in needs_update:
-                    namespaced_name = '%s.%s' % (self.namespace, pkg_name)
-                    indexer.update(namespaced_name)
+                if fragments is None:
+                    for pkg_name in needs_update:
+                        namespaced_name = '%s.%s' % (self.namespace, pkg_name)
+                        indexer.update(namespaced_name)
+                else:
+                    for pkg_names, serialized in fragments:
+                        fragment = type(indexer)()
+                        fragment.read(six.StringIO(serialized[name]))
+                        indexer.merge(
+                            ['%s.%s' % (self.namespace, x) for x in pkg_names],
+                            fragment.index
+                        )
 
                 indexer.write(new)
 
         return indexer.index
 
 
+#: Fewest packages each process must index for a parallel reindex to be used
+_min_packages_per_job = 16
+
+
+def _index_packages(args):
+    """Index a chunk of packages in a worker process of a parallel reindex.
+
+    Returns a dictionary that maps the name of each indexer to the JSON
+    serialization of an index containing just the packages in the chunk.
+    """
+    namespace, indexer_types, pkg_names = args
+
+    fragments = {}
+    for name, indexer_type in indexer_types:
+        indexer = indexer_type()
+        indexer.create()
+        for pkg_name in pkg_names:
+            indexer.update('%s.%s' % (namespace, pkg_name))
+
+        stream = six.StringIO()
+        indexer.write(stream)
+        fragments[name] = stream.getvalue()
+
+    return fragments
+
+
 class RepoPath(object):
     """A RepoPath is a list of repos that function as one.
 
@@ -476,6 +874,7 @@ def __init__(self, *repos):
         self._all_package_names = None
         self._provider_index = None
         self._patch_index = None
+        self._metadata_index = None
 
         # Add each repo to this path.
         for repo in repos:
@@ -588,6 +987,20 @@ def patch_index(self):
 
         return self._patch_index
 
+    @property
+    def metadata_index(self):
+        """Merged MetadataIndex from all Repos in the RepoPath."""
+        if self._metadata_index is None:
+            self._metadata_index = spack.metadata_index.MetadataIndex()
+            for repo in reversed(self.repos):
+                self._metadata_index.merge(repo.metadata_index)
+
+        return self._metadata_index
+
+    def get_metadata(self, pkg_name):
+        """Get the ``PackageMetadata`` of a package, without importing it."""
+        return self.repo_for_pkg(pkg_name).get_metadata(pkg_name)
+
     @autospec
     def providers_for(self, vpkg_spec):
         providers = self.provider_index.providers_for(vpkg_spec)
@@ -983,6 +1396,7 @@ def index(self):
             self._repo_index.add_indexer('providers', ProviderIndexer())
             self._repo_index.add_indexer('tags', TagIndexer())
             self._repo_index.add_indexer('patches', PatchIndexer())
+            self._repo_index.add_indexer('metadata', MetadataIndexer())
         return self._repo_index
 
     @property
@@ -1000,6 +1414,23 @@ def patch_index(self):
         """Index of patches and packages they're defined on."""
         return self.index['patches']
 
+    @property
+    def metadata_index(self):
+        """Index of the static metadata of each package in this repo."""
+        return self.index['metadata']
+
+    def get_metadata(self, pkg_name):
+        """Get the ``PackageMetadata`` of a package, without importing it."""
+        namespace, _, pkg_name = pkg_name.rpartition('.')
+        if namespace and (namespace != self.namespace):
+            raise InvalidNamespaceError('Invalid namespace for %s repo: %s'
+                                        % (self.namespace, namespace))
+
+        metadata = self.metadata_index.get(pkg_name)
+        if metadata is None or not self.exists(pkg_name):
+            raise UnknownPackageError(pkg_name, self)
+        return metadata
+
     @autospec
     def providers_for(self, vpkg_spec):
         providers = self.provider_index.providers_for(vpkg_spec)
@@ -1114,8 +1545,9 @@ def _get_pkg_module(self, pkg_name):
             fullname = "%s.%s" % (self.full_namespace, pkg_name)
 
             try:
-                module = simp.load_source(fullname, file_path,
-                                          prepend=_package_prepend)
+                module = simp.load_source(
+                    fullname, file_path, prepend=_package_prepend,
+                    cache_dir=bytecode_cache_location())
             except SyntaxError as e:
                 # SyntaxError strips the path from the filename so we need to
                 # manually construct the error message in order to give the
@@ -37,5 +37,6 @@
                 'hash': {'type': 'string'},
             },
         },
+        'buildcache_layout_version': {'type': 'number'},
     },
 }
@@ -0,0 +1,35 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Schema for concretizer.yaml configuration file.
+
+.. literalinclude:: _spack_root/lib/spack/spack/schema/concretizer.py
+   :lines: 13-
+"""
+
+properties = {
+    'concretizer': {
+        'type': 'object',
+        'additionalProperties': False,
+        'properties': {
+            'reuse': {'type': 'boolean'},
+            'solver_threads': {'type': 'integer', 'minimum': 1},
+            'configuration': {
+                'type': 'string',
+                'enum': ['auto', 'frumpy', 'jumpy', 'tweety', 'handy',
+                         'crafty', 'trendy', 'many']
+            },
+        }
+    }
+}
+
+
+#: Full schema with metadata
+schema = {
+    '$schema': 'http://json-schema.org/schema#',
+    'title': 'Spack concretizer configuration file schema',
+    'type': 'object',
+    'additionalProperties': False,
+    'properties': properties,
+}
@@ -91,6 +91,10 @@
                 'enum': ['original', 'clingo']
             },
             'db_lock_timeout': {'type': 'integer', 'minimum': 1},
+            'db_read_mode': {
+                'type': 'string',
+                'enum': ['locked', 'snapshot']
+            },
             'package_lock_timeout': {
                 'anyOf': [
                     {'type': 'integer', 'minimum': 1},
@@ -103,6 +107,13 @@
                 'type': 'string',
                 'enum': ['urllib', 'curl']
             },
+            'file_command_fallback': {'type': 'boolean'},
+            'buildcache_layout_version': {
+                'type': 'integer',
+                'enum': [0, 1]
+            },
+            's3_upload_part_size': {'type': 'integer', 'minimum': 5},
+            's3_upload_concurrency': {'type': 'integer', 'minimum': 1},
         },
     },
 }
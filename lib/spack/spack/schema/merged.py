@@ -13,6 +13,7 @@
 import spack.schema.bootstrap
 import spack.schema.cdash
 import spack.schema.compilers
+import spack.schema.concretizer
 import spack.schema.config
 import spack.schema.container
 import spack.schema.gitlab_ci
@@ -27,6 +28,7 @@
     spack.schema.bootstrap.properties,
     spack.schema.cdash.properties,
     spack.schema.compilers.properties,
+    spack.schema.concretizer.properties,
     spack.schema.config.properties,
     spack.schema.container.properties,
     spack.schema.gitlab_ci.properties,
@@ -31,6 +31,7 @@
 
 import spack
 import spack.architecture
+import spack.binary_distribution
 import spack.bootstrap
 import spack.cmd
 import spack.compilers
@@ -43,6 +44,7 @@
 import spack.package_prefs
 import spack.repo
 import spack.spec
+import spack.store
 import spack.util.timer
 import spack.variant
 import spack.version
@@ -55,8 +57,9 @@
 
 #: Enumeration like object to mark version provenance
 version_provenance = collections.namedtuple(  # type: ignore
-    'VersionProvenance', ['external', 'packages_yaml', 'package_py', 'spec']
-)(spec=0, external=1, packages_yaml=2, package_py=3)
+    'VersionProvenance',
+    ['external', 'packages_yaml', 'package_py', 'spec', 'installed']
+)(spec=0, external=1, packages_yaml=2, package_py=3, installed=4)
 
 #: String representation of version origins, to emit legible
 # facts for the ASP solver
@@ -64,9 +67,13 @@
     0: 'spec',
     1: 'external',
     2: 'packages_yaml',
-    3: 'package_py'
+    3: 'package_py',
+    4: 'installed'
 }
 
+#: Dependency types that tie a reused spec to its dependencies
+reuse_deptypes = ('link', 'run')
+
 #: Named tuple to contain information on declared versions
 DeclaredVersion = collections.namedtuple(
     'DeclaredVersion', ['version', 'idx', 'origin']
@@ -212,6 +219,10 @@ def __init__(self, specs, asp=None):
         # names of optimization criteria
         self.criteria = []
 
+        # (seconds since the start of the solve, cost) for each model
+        # found, to show how the optimization progressed over time
+        self.optimization_steps = []
+
         # Abstract user requests
         self.abstract_specs = specs
 
@@ -276,6 +287,16 @@ def _normalize_packages_yaml(packages_yaml):
     return normalized_yaml
 
 
+def solver_threads():
+    """Number of threads clingo uses to solve, from concretizer.yaml"""
+    return spack.config.get('concretizer:solver_threads', 2)
+
+
+def solver_configuration():
+    """Clingo configuration used for the search, from concretizer.yaml"""
+    return spack.config.get('concretizer:configuration', 'tweety')
+
+
 class PyclingoDriver(object):
     def __init__(self, cores=True, asp=None):
         """Driver for the Python clingo interface.
@@ -324,7 +345,7 @@ def fact(self, head):
 
     def solve(
             self, solver_setup, specs, dump=None, nmodels=0,
-            timers=False, stats=False, tests=False
+            timers=False, stats=False, tests=False, reuse=False
     ):
         timer = spack.util.timer.Timer()
 
@@ -333,15 +354,15 @@ def solve(
         self.control.configuration.solve.models = nmodels
         self.control.configuration.asp.trans_ext = 'all'
         self.control.configuration.asp.eq = '5'
-        self.control.configuration.configuration = 'tweety'
-        self.control.configuration.solve.parallel_mode = '2'
+        self.control.configuration.configuration = solver_configuration()
+        self.control.configuration.solve.parallel_mode = str(solver_threads())
         self.control.configuration.solver.opt_strategy = "usc,one"
 
         # set up the problem -- this generates facts and rules
         self.assumptions = []
         with self.control.backend() as backend:
             self.backend = backend
-            solver_setup.setup(self, specs, tests=tests)
+            solver_setup.setup(self, specs, tests=tests, reuse=reuse)
         timer.phase("setup")
 
         # read in the main ASP program and display logic -- these are
@@ -362,6 +383,11 @@ def solve(
         cores = []   # unsatisfiable cores if they do not
 
         def on_model(model):
+            elapsed = timer.total
+            result.optimization_steps.append((elapsed, list(model.cost)))
+            tty.debug('Found model #{0} with cost {1} after {2:.2f}s'.format(
+                len(models) + 1, model.cost, elapsed
+            ))
             models.append((model.cost, model.symbols(shown=True, terms=True)))
 
         solve_kwargs = {"assumptions": self.assumptions,
@@ -387,7 +413,7 @@ def stringify(x):
 
         if result.satisfiable:
             # build spec from the best model
-            builder = SpecBuilder(specs)
+            builder = SpecBuilder(specs, solver_setup.reusable_specs)
             min_cost, best_model = min(models)
             tuples = [
                 (sym.name, [stringify(a) for a in sym.arguments])
@@ -453,6 +479,9 @@ def __init__(self):
         # id for dummy variables
         self._condition_id_counter = itertools.count()
 
+        # Concrete specs that can be reused, keyed by DAG hash
+        self.reusable_specs = {}
+
         # Caches to optimize the setup phase of the solver
         self.target_specs_cache = None
 
@@ -701,6 +730,24 @@ def condition(self, required_spec, imposed_spec=None, name=None):
 
         return condition_id
 
+    def impose(self, condition_id, imposed_spec, node=True, body=False):
+        """Generate facts for the constraints imposed by a condition.
+
+        Arguments:
+            condition_id (int or str): id of the condition imposing constraints
+            imposed_spec (spack.spec.Spec): spec with the imposed constraints
+            node (bool): if False, skip "node"-like constraints
+            body (bool): if True, impose final values instead of setters
+        """
+        imposed_constraints = self.spec_clauses(imposed_spec, body=body)
+        for pred in imposed_constraints:
+            # imposed "node"-like conditions are no-ops
+            if not node and pred.name in ("node", "virtual_node"):
+                continue
+            self.gen.fact(
+                fn.imposed_constraint(condition_id, pred.name, *pred.args)
+            )
+
     def package_provider_rules(self, pkg):
         for provider_name in sorted(set(s.name for s in pkg.provided.keys())):
             self.gen.fact(fn.possible_provider(pkg.name, provider_name))
@@ -1003,6 +1050,19 @@ class Body(object):
             clauses.append(fn.concrete(spec.name))
             # TODO: add concrete depends_on() facts for concrete dependencies
 
+        # a reusable spec is fully described by its own attributes, the
+        # link-run dependencies it was built with and their hashes
+        if spec.concrete and spec.dag_hash() in self.reusable_specs:
+            clauses.append(fn.hash(spec.name, spec.dag_hash()))
+            if transitive:
+                deps = spec.dependencies_dict(deptype=reuse_deptypes)
+                for dep_name, dep in sorted(deps.items()):
+                    for dtype in sorted(set(dep.deptypes) & set(reuse_deptypes)):
+                        clauses.append(fn.depends_on(spec.name, dep_name, dtype))
+                for dep in spec.traverse(root=False, deptype=reuse_deptypes):
+                    clauses.append(fn.hash(dep.name, dep.dag_hash()))
+            return clauses
+
         # add all clauses from dependencies
         if transitive:
             for dep in spec.traverse(root=False):
@@ -1064,6 +1124,64 @@ def key_fn(item):
                     ))
                     self.possible_versions[dep.name].add(dep.version)
 
+    def _reusable_candidates(self):
+        """Concrete specs from the local store and from configured
+        buildcaches that may be reused in the solve."""
+        with spack.store.db.read_transaction():
+            for spec in spack.store.db.query(installed=True):
+                yield spec
+
+        try:
+            for spec in spack.binary_distribution.update_cache_and_get_specs():
+                yield spec
+        except (spack.error.SpackError, IndexError) as e:
+            # buildcache indices are best effort: if none can be read
+            # we can still reuse what is installed locally
+            tty.debug('cannot read buildcache indices for reuse: {0}'.format(e))
+
+    def gather_reusable_specs(self, possible):
+        """Collect concrete specs that may replace nodes in the solve.
+
+        A concrete spec is a candidate only if all the nodes it links to
+        could appear in the solution, and if none of them is an external
+        or a development build.
+
+        Arguments:
+            possible (set): names of all the possible packages in the DAG
+        """
+        self.reusable_specs = {}
+        for candidate in self._reusable_candidates():
+            nodes = list(candidate.traverse(deptype=reuse_deptypes))
+            if any(
+                    s.name not in possible or s.external or
+                    'dev_path' in s.variants for s in nodes
+            ):
+                continue
+
+            for s in nodes:
+                self.reusable_specs.setdefault(s.dag_hash(), s)
+
+        # Versions of reusable specs might not be declared anymore
+        # in package.py, so we need to declare them here
+        for s in self.reusable_specs.values():
+            if s.version in self.possible_versions[s.name]:
+                continue
+            self.possible_versions[s.name].add(s.version)
+            self.declared_versions[s.name].append(DeclaredVersion(
+                version=s.version, idx=0, origin=version_provenance.installed
+            ))
+
+    def define_reusable_specs(self):
+        """Add facts about the concrete specs that can be reused."""
+        self.gen.fact(fn.optimize_for_reuse())
+        for h, spec in sorted(self.reusable_specs.items()):
+            self.gen.h2('Reusable spec: {0}/{1}'.format(spec.name, h))
+            self.gen.fact(fn.installed_hash(spec.name, h))
+
+            # this describes what constraints it imposes on the solve
+            self.impose(h, spec, body=True)
+            self.gen.newline()
+
     def _supported_targets(self, compiler_name, compiler_version, targets):
         """Get a list of which targets are supported by the compiler.
 
@@ -1348,7 +1466,7 @@ def define_variant_values(self):
         for pkg, variant, value in sorted(self.variant_values_from_specs):
             self.gen.fact(fn.variant_possible_value(pkg, variant, value))
 
-    def setup(self, driver, specs, tests=False):
+    def setup(self, driver, specs, tests=False, reuse=False):
         """Generate an ASP program with relevant constraints for specs.
 
         This calls methods on the solve driver to set up the problem with
@@ -1357,6 +1475,9 @@ def setup(self, driver, specs, tests=False):
 
         Arguments:
             specs (list): list of Specs to solve
+            tests (bool or tuple): whether to include test dependencies
+            reuse (bool): if True, installed and buildcache specs may be
+                reused instead of building new ones
         """
         self._condition_id_counter = itertools.count()
 
@@ -1384,6 +1505,11 @@ def setup(self, driver, specs, tests=False):
         # traverse all specs and packages to build dict of possible versions
         self.build_version_dict(possible, specs)
 
+        # concrete specs that could be reused instead of being built
+        self.reusable_specs = {}
+        if reuse:
+            self.gather_reusable_specs(pkgs)
+
         self.gen.h1('General Constraints')
         self.available_compilers()
         self.compiler_defaults()
@@ -1427,6 +1553,10 @@ def setup(self, driver, specs, tests=False):
                     self.gen.fact(fn.variant_default_value_from_cli(
                         *clause.args
                     ))
+        if reuse:
+            self.gen.h1('Reusable specs')
+            self.define_reusable_specs()
+
         self.gen.h1("Variant Values defined in specs")
         self.define_variant_values()
 
@@ -1445,12 +1575,22 @@ def setup(self, driver, specs, tests=False):
 
 class SpecBuilder(object):
     """Class with actions to rebuild a spec from ASP results."""
-    def __init__(self, specs):
+    def __init__(self, specs, reusable_specs=None):
         self._result = None
         self._command_line_specs = specs
+        self._reusable_specs = reusable_specs or {}
         self._flag_sources = collections.defaultdict(lambda: set())
         self._flag_compiler_defaults = set()
 
+    def hash(self, pkg, h):
+        """A concrete spec has been reused for this package."""
+        if pkg not in self._specs:
+            msg = 'unable to look up reusable spec "{0}/{1}"'.format(pkg, h)
+            assert h in self._reusable_specs, msg
+            self._specs[pkg] = self._reusable_specs[h]
+        else:
+            assert self._specs[pkg].dag_hash() == h
+
     def node(self, pkg):
         if pkg not in self._specs:
             self._specs[pkg] = spack.spec.Spec(pkg)
@@ -1592,6 +1732,7 @@ def build_specs(self, function_tuples):
         # them here so that directives that build objects (like node and
         # node_compiler) are called in the right order.
         function_tuples.sort(key=lambda f: {
+            "hash": -3,
             "node": -2,
             "node_compiler": -1,
         }.get(f[0], 0))
@@ -1614,11 +1755,20 @@ def build_specs(self, function_tuples):
             if spack.repo.path.is_virtual(pkg):
                 continue
 
+            # reused specs are already concrete, do not modify them
+            spec = self._specs.get(pkg)
+            if spec and spec.concrete:
+                continue
+
             action(*args)
 
+        # reused specs are taken as they are, everything below applies
+        # only to the specs we are going to build
+        built_specs = [s for s in self._specs.values() if not s.concrete]
+
         # namespace assignment is done after the fact, as it is not
         # currently part of the solve
-        for spec in self._specs.values():
+        for spec in built_specs:
             repo = spack.repo.path.repo_for_pkg(spec)
             spec.namespace = repo.namespace
 
@@ -1628,22 +1778,22 @@ def build_specs(self, function_tuples):
         # inject patches -- note that we' can't use set() to unique the
         # roots here, because the specs aren't complete, and the hash
         # function will loop forever.
-        roots = [spec.root for spec in self._specs.values()]
+        roots = [spec.root for spec in built_specs]
         roots = dict((id(r), r) for r in roots)
         for root in roots.values():
             spack.spec.Spec.inject_patches_variant(root)
 
         # Add external paths to specs with just external modules
-        for s in self._specs.values():
+        for s in built_specs:
             spack.spec.Spec.ensure_external_path_if_external(s)
 
-        for s in self._specs.values():
+        for s in built_specs:
             _develop_specs_from_env(s, ev.active_environment())
 
-        for s in self._specs.values():
+        for s in built_specs:
             s._mark_concrete()
 
-        for s in self._specs.values():
+        for s in built_specs:
             spack.spec.Spec.ensure_no_deprecated(s)
 
         return self._specs
@@ -1668,13 +1818,16 @@ def _develop_specs_from_env(spec, env):
 #
 # These are handwritten parts for the Spack ASP model.
 #
-def solve(specs, dump=(), models=0, timers=False, stats=False, tests=False):
+def solve(specs, dump=(), models=0, timers=False, stats=False, tests=False,
+          reuse=None):
     """Solve for a stable model of specs.
 
     Arguments:
         specs (list): list of Specs to solve.
         dump (tuple): what to dump
         models (int): number of models to search (default: 0)
+        reuse (bool or None): whether to reuse installed and buildcache
+            specs. If None, use the ``concretizer:reuse`` configuration.
     """
     driver = PyclingoDriver()
     if "asp" in dump:
@@ -1687,5 +1840,10 @@ def solve(specs, dump=(), models=0, timers=False, stats=False, tests=False):
                 continue
             spack.spec.Spec.ensure_valid_variants(s)
 
+    if reuse is None:
+        reuse = spack.config.get('concretizer:reuse', False)
+
     setup = SpackSolverSetup()
-    return driver.solve(setup, specs, dump, models, timers, stats, tests)
+    return driver.solve(
+        setup, specs, dump, models, timers, stats, tests, reuse
+    )
@@ -16,7 +16,6 @@
 import io
 import multiprocessing
 import pickle
-import pydoc
 import sys
 from types import ModuleType
 
@@ -85,14 +84,49 @@ def restore(self):
             return self.pkg
 
 
+class PoolContext(object):
+    """Captures the in-memory process state that workers of a process pool
+    need, but don't inherit when they are not forked: configuration scopes,
+    repositories, the store and the active environment.
+    """
+    def __init__(self):
+        import spack.environment as ev  # break import cycle
+        self.env = ev._active_environment
+        self.spack_working_dir = spack.main.spack_working_dir
+        self.test_state = TestState(serialize=True)
+
+    def restore(self):
+        import spack.environment as ev  # break import cycle
+        self.test_state.restore()
+        spack.main.spack_working_dir = self.spack_working_dir
+        ev._active_environment = self.env
+
+
+def _start_method():
+    if sys.version_info < (3, 4):
+        return 'fork'
+    return multiprocessing.get_start_method()
+
+
+def process_pool(processes):
+    """Create a process pool whose workers have the state of this process,
+    even when they are spawned instead of forked."""
+    if _start_method() == 'fork':
+        return multiprocessing.Pool(processes)
+    return multiprocessing.Pool(
+        processes, initializer=PoolContext.restore,
+        initargs=(PoolContext(),))
+
+
 class TestState(object):
     """Spack tests may modify state that is normally read from disk in memory;
     this object is responsible for properly serializing that state to be
     applied to a subprocess. This isn't needed outside of a testing environment
     but this logic is designed to behave the same inside or outside of tests.
     """
-    def __init__(self):
-        if _serialize:
+    def __init__(self, serialize=None):
+        self.serialize = _serialize if serialize is None else serialize
+        if self.serialize:
             self.repo_dirs = list(r.root for r in spack.repo.path.repos)
             self.config = spack.config.config
             self.platform = spack.architecture.platform
@@ -100,7 +134,7 @@ def __init__(self):
             self.store_token = spack.store.store.serialize()
 
     def restore(self):
-        if _serialize:
+        if self.serialize:
             spack.repo.path = spack.repo._path(self.repo_dirs)
             spack.config.config = self.config
             spack.architecture.platform = self.platform
@@ -123,6 +157,8 @@ def __init__(self, module_patches, class_patches):
             (x, y, serialize(z)) for (x, y, z) in class_patches)
 
     def restore(self):
+        import pydoc
+
         for module_name, attr_name, value in self.module_patches:
             value = pickle.load(value)
             module = __import__(module_name)
@@ -7,12 +7,16 @@
 
 import pytest
 
+import archspec.cpu
+
 import spack.architecture
 import spack.concretize
 import spack.operating_systems
 import spack.platforms
+import spack.platforms._host
 import spack.spec
 import spack.target
+import spack.util.file_cache
 
 
 @pytest.fixture
@@ -230,3 +234,61 @@ def test_concretize_target_ranges(
         spec.concretize()
 
     assert str(spec).count('arch=test-debian6-%s' % result) == 2
+
+
+@pytest.fixture
+def host_cache(tmpdir, monkeypatch):
+    """Cache host detection in a temporary misc cache"""
+    cache = spack.util.file_cache.FileCache(str(tmpdir))
+    monkeypatch.setattr(spack.platforms._host, '_file_cache', lambda: cache)
+    spack.platforms._host._cache.cache.clear()
+    yield cache.cache_path(spack.platforms._host._cache_key())
+    spack.platforms._host._cache.cache.clear()
+
+
+def test_host_detection_is_cached(host_cache, monkeypatch):
+    calls = []
+
+    def detect():
+        calls.append(1)
+        return archspec.cpu.TARGETS['haswell']
+
+    monkeypatch.setattr(archspec.cpu, 'host', detect)
+    assert spack.platforms._host.target().name == 'haswell'
+    assert os.path.exists(host_cache)
+
+    # Another process reads the result from the file
+    spack.platforms._host._cache.cache.clear()
+    assert spack.platforms._host.target().name == 'haswell'
+    assert len(calls) == 1
+
+
+def test_host_detection_cache_invalidation(host_cache, monkeypatch):
+    monkeypatch.setattr(
+        archspec.cpu, 'host', lambda: archspec.cpu.TARGETS['haswell'])
+    assert spack.platforms._host.target().name == 'haswell'
+
+    # A new kernel invalidates the cache
+    spack.platforms._host._cache.cache.clear()
+    monkeypatch.setattr(platform, 'release', lambda: 'new-kernel')
+    monkeypatch.setattr(
+        archspec.cpu, 'host', lambda: archspec.cpu.TARGETS['skylake'])
+    assert spack.platforms._host.target().name == 'skylake'
+
+
+def test_platform_name_does_not_detect_the_host(monkeypatch):
+    # Configuration scopes are named before the platform is created, since
+    # creating it reads the host detection cache in the misc cache
+    def _detect():
+        raise AssertionError('the host was detected')
+    monkeypatch.setattr(spack.platforms._host, 'target', _detect)
+    monkeypatch.setattr(
+        spack.architecture, 'platform', spack.architecture._platform)
+
+    cache = spack.architecture._platform.cache
+    saved = dict(cache)
+    cache.clear()
+    try:
+        assert spack.architecture.platform_name() in ('cray', 'darwin', 'linux')
+    finally:
+        cache.update(saved)
@@ -3,10 +3,13 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import glob
+import io
 import os
 import platform
 import shutil
 import sys
+import tarfile
+from contextlib import closing
 
 import py
 import pytest
@@ -22,6 +25,7 @@
 import spack.spec as spec
 import spack.store
 import spack.util.gpg
+import spack.util.spack_json as sjson
 import spack.util.web as web_util
 from spack.directory_layout import DirectoryLayout
 from spack.paths import test_path
@@ -666,3 +670,278 @@ def test_update_index_fix_deps(monkeypatch, tmpdir, mutable_config):
 
     # Make sure the full hash of b in a's spec json matches the new value
     assert(a_prime[b.name].full_hash() == new_b_full_hash)
+
+
+@pytest.mark.usefixtures(
+    'install_mockery_mutable_config', 'mock_packages', 'mock_fetch',
+)
+def test_sharded_index(monkeypatch, tmpdir, mutable_config):
+    """Ensure clients only fetch the index shards of the specs they look
+    for."""
+    mirror_dir = tmpdir.join('mirror_dir')
+    mirror_url = 'file://{0}'.format(mirror_dir.strpath)
+    spack.config.set('mirrors', {'test': mirror_url})
+
+    s = Spec('libdwarf').concretized()
+    install_cmd('--no-cache', s.name)
+    buildcache_cmd('create', '-uad', mirror_dir.strpath, s.name)
+
+    cache_dir = mirror_dir.join(bindist.build_cache_relative_path())
+    bindist.generate_package_index('file://' + cache_dir.strpath, shards=True)
+    manifest = sjson.load(cache_dir.join('index.shards.json').read())
+    assert sorted(manifest['shards']) == sorted(
+        set(x.dag_hash()[:2] for x in (s, s['libelf'])))
+
+    urls = []
+    read_from_url = web_util.read_from_url
+
+    def _read_from_url(url, *args, **kwargs):
+        urls.append(url)
+        return read_from_url(url, *args, **kwargs)
+
+    monkeypatch.setattr(web_util, 'read_from_url', _read_from_url)
+    monkeypatch.setattr(bindist, 'binary_index', bindist.BinaryCacheIndex(
+        str(tmpdir.join('indices'))))
+
+    # Only the manifest is read on update, then the shard of the spec
+    bindist.binary_index.update()
+    results = bindist.get_mirrors_for_spec(s['libelf'], index_only=True)
+    assert [r['spec'].name for r in results] == ['libelf']
+    assert not any(url.endswith('index.json') for url in urls)
+    shards = [url for url in urls if '/index/' in url]
+    assert len(shards) == 1
+    assert shards[0].endswith('/index/{0}.json'.format(
+        manifest['shards'][s['libelf'].dag_hash()[:2]]))
+
+    # The whole index is read to list all specs, instead of the shards that
+    # are not cached yet, and the mirror isn't checked for shards again
+    del urls[:]
+    cache_list = buildcache_cmd('list', '--allarch')
+    assert 'libdwarf' in cache_list
+    assert 'libelf' in cache_list
+    assert not any('/index/' in url for url in urls)
+    assert len([url for url in urls if url.endswith('/index.json')]) == 1
+
+    del urls[:]
+    bindist.binary_index.update()
+    assert not any(url.endswith('index.shards.json') for url in urls)
+
+    # Updates keep the shards up to date
+    for libelf_file in cache_dir.listdir('*libelf*'):
+        libelf_file.remove()
+    buildcache_cmd('update-index', '--incremental', '-d', mirror_dir.strpath)
+    cache_list = buildcache_cmd('list', '--allarch')
+    assert 'libdwarf' in cache_list
+    assert 'libelf' not in cache_list
+
+
+@pytest.mark.usefixtures(
+    'install_mockery_mutable_config', 'mock_packages', 'mock_fetch',
+)
+def test_sharded_index_with_missing_shards(
+        monkeypatch, tmpdir, mutable_config, capfd):
+    """Ensure clients read the whole index when shards of their cached
+    manifest were removed."""
+    mirror_dir = tmpdir.join('mirror_dir')
+    mirror_url = 'file://{0}'.format(mirror_dir.strpath)
+    spack.config.set('mirrors', {'test': mirror_url})
+
+    s = Spec('libdwarf').concretized()
+    install_cmd('--no-cache', s.name)
+    buildcache_cmd('create', '-uad', mirror_dir.strpath, s.name)
+    cache_dir = mirror_dir.join(bindist.build_cache_relative_path())
+    bindist.generate_package_index('file://' + cache_dir.strpath, shards=True)
+
+    monkeypatch.setattr(bindist, 'binary_index', bindist.BinaryCacheIndex(
+        str(tmpdir.join('indices'))))
+    bindist.binary_index.update()
+
+    # Later updates of the index removed the shards of the cached manifest
+    for shard in cache_dir.join('index').listdir():
+        shard.remove()
+
+    results = bindist.get_mirrors_for_spec(s['libelf'], index_only=True)
+    assert [r['spec'].name for r in results] == ['libelf']
+    assert 'reading its whole index instead' in capfd.readouterr()[1]
+
+    # The whole index is used from then on
+    assert not bindist.binary_index._manifest(mirror_url)
+    results = bindist.get_mirrors_for_spec(s, index_only=True)
+    assert [r['spec'].name for r in results] == ['libdwarf']
+
+
+def test_archive_is_extracted_in_one_pass(tmpdir):
+    """Ensure archives are extracted with their links, and that their
+    checksum is verified while extracting them."""
+    src = tmpdir.ensure('src', dir=True)
+    src.ensure('bin', 'exe').write('exe')
+    os.symlink('exe', src.join('bin', 'link').strpath)
+    os.link(src.join('bin', 'exe').strpath, src.join('hardlink').strpath)
+
+    archive = tmpdir.join('archive.spack')
+    checksum = bindist.write_archive(src.strpath, archive.strpath)
+    assert checksum == bindist.checksum_tarball(archive.strpath)
+    assert not bindist._is_nested_archive(archive.strpath)
+
+    prefix = tmpdir.join('prefix')
+    with open(archive.strpath, 'rb') as f:
+        bindist.extract_archive(f, prefix.strpath, checksum)
+    assert prefix.join('bin', 'exe').read() == 'exe'
+    assert os.readlink(prefix.join('bin', 'link').strpath) == 'exe'
+    assert prefix.join('hardlink').stat().ino == \
+        prefix.join('bin', 'exe').stat().ino
+
+    # The prefix is removed if the checksum doesn't match
+    other = tmpdir.join('other')
+    with open(archive.strpath, 'rb') as f:
+        with pytest.raises(bindist.NoChecksumException):
+            bindist.extract_archive(f, other.strpath, 'a' * 64)
+    assert not other.exists()
+
+
+def _tarinfo(name, type=tarfile.REGTYPE, linkname=''):
+    info = tarfile.TarInfo(name)
+    info.type = type
+    info.linkname = linkname
+    info.mode = 0o755 if type == tarfile.DIRTYPE else 0o644
+    return info
+
+
+@pytest.mark.parametrize('members', [
+    # A file written through a symbolic link of an earlier member
+    [_tarinfo('./lib', tarfile.SYMTYPE, '{outside}'), _tarinfo('./lib/evil')],
+    [_tarinfo('./lib', tarfile.SYMTYPE, '../outside'),
+     _tarinfo('./lib/evil')],
+    [_tarinfo('./evil', tarfile.SYMTYPE, '{outside}/evil'),
+     _tarinfo('./evil')],
+    # Links to files outside of the prefix
+    [_tarinfo('./evil', tarfile.LNKTYPE, '{outside}/file')],
+    [_tarinfo('./evil', tarfile.LNKTYPE, '../outside/file')],
+    [_tarinfo('./lib', tarfile.DIRTYPE),
+     _tarinfo('./lib/evil', tarfile.SYMTYPE, '../../outside')],
+])
+def test_archive_cannot_write_outside_of_prefix(tmpdir, members):
+    """Ensure archives can't write outside of the prefix, and that nothing
+    is extracted when their checksum doesn't match."""
+    outside = tmpdir.ensure('outside', dir=True)
+    outside.join('file').write('file')
+    archive = tmpdir.join('archive.spack')
+    with closing(tarfile.open(archive.strpath, 'w:gz')) as tar:
+        tar.addfile(_tarinfo('.', tarfile.DIRTYPE))
+        for member in members:
+            member.linkname = member.linkname.format(outside=outside.strpath)
+            data = b'evil' if member.isfile() else b''
+            member.size = len(data)
+            tar.addfile(member, io.BytesIO(data))
+
+    prefix = tmpdir.join('prefix')
+    for checksum in ('a' * 64, bindist.checksum_tarball(archive.strpath)):
+        with open(archive.strpath, 'rb') as f:
+            with pytest.raises(bindist.UnsupportedArchiveException):
+                bindist.extract_archive(f, prefix.strpath, checksum)
+        assert sorted(tmpdir.listdir()) == [archive, outside]
+        assert outside.listdir() == [outside.join('file')]
+        assert outside.join('file').read() == 'file'
+
+
+def test_archive_is_verified_before_extraction(tmpdir):
+    """Ensure a tampered archive extracts nothing in the prefix."""
+    src = tmpdir.ensure('src', dir=True)
+    src.ensure('bin', 'exe').write('exe')
+    archive = tmpdir.join('archive.spack')
+    bindist.write_archive(src.strpath, archive.strpath)
+
+    prefix = tmpdir.join('store', 'prefix')
+    with open(archive.strpath, 'rb') as f:
+        with pytest.raises(bindist.NoChecksumException):
+            bindist.extract_archive(f, prefix.strpath, 'a' * 64)
+    assert tmpdir.join('store').listdir() == []
+
+
+@pytest.mark.usefixtures(
+    'install_mockery_mutable_config', 'mock_packages', 'mock_fetch',
+    'mock_gnupghome'
+)
+@pytest.mark.parametrize('layout_version', [0, 1])
+def test_signed_archive_install(monkeypatch, tmpdir, mutable_config,
+                                layout_version):
+    """Ensure signed archives of both layouts are installed, and that
+    archives of layout 1 are only created on demand."""
+    mirror_dir = tmpdir.join('mirror_dir')
+    mirror_url = 'file://{0}'.format(mirror_dir.strpath)
+    spack.config.set('mirrors', {'test': mirror_url})
+    monkeypatch.setattr(bindist, 'binary_index', bindist.BinaryCacheIndex(
+        str(tmpdir.join('indices'))))
+    spack.util.gpg.create(name='test-key', email='fake@test.key',
+                          expires='0', comment=None)
+
+    if layout_version:
+        spack.config.set('config:buildcache_layout_version', layout_version)
+
+    s = Spec('libelf').concretized()
+    install_cmd('--no-cache', s.name)
+    buildcache_cmd('create', '-ad', mirror_dir.strpath, s.name)
+
+    cache_dir = mirror_dir.join(bindist.build_cache_relative_path())
+    signed_specfile = cache_dir.join(bindist.tarball_name(s, '.spec.json.sig'))
+    assert signed_specfile.exists() is bool(layout_version)
+    assert bindist._is_nested_archive(
+        cache_dir.join(bindist.tarball_path_name(s, '.spack')).strpath
+    ) is not bool(layout_version)
+
+    bindist.generate_package_index(
+        'file://' + cache_dir.strpath)
+    uninstall_cmd('-y', s.name)
+    buildcache_cmd('install', '-a', s.name)
+    assert os.path.exists(bindist.buildinfo_file_name(s.prefix))
+
+
+@pytest.mark.usefixtures('config', 'mock_packages', 'mock_gnupghome')
+def test_signed_spec_file_is_read_from_verified_text(tmpdir):
+    """Ensure that only the text verified by gpg is read from a signed spec
+    file, and not unsigned text around it."""
+    spack.util.gpg.create(name='test-key', email='fake@test.key',
+                          expires='0', comment=None)
+    s = Spec('libelf').concretized()
+    specfile = tmpdir.join(bindist.tarball_name(s, '.spec.json'))
+    specfile.write(sjson.dump({'buildcache_layout_version': 1,
+                               'origin': 'signed'}))
+    bindist.sign_specfile(None, False, specfile.strpath)
+    specfile.remove()
+
+    signed_specfile = tmpdir.join(bindist.tarball_name(s, '.spec.json.sig'))
+    signed_specfile.write(
+        '{"origin": "unsigned"}\n\n' + signed_specfile.read() +
+        '\n{"origin": "unsigned"}\n')
+    spec_dict = bindist._read_archive_spec_file(s, tmpdir.strpath, False)
+    assert spec_dict['origin'] == 'signed'
+
+
+def test_write_relocation_offsets(tmpdir):
+    """Ensure the offsets of the prefixes relocated in text files and
+    binaries are recorded in the buildinfo file."""
+    workdir = tmpdir.ensure('prefix', dir=True)
+    workdir.ensure('bin', 'script').write(
+        '#!/bin/bash /old/spack/bin/sbang\n/old/root/zlib-abc/bin/zlib\n')
+    workdir.ensure('lib', 'libz.so').write_binary(
+        b'\x7fELF\0/old/root/zlib-abc/lib\0')
+    workdir.ensure('share', 'empty.txt').write('nothing to relocate\n')
+    workdir.ensure('.spack', 'binary_distribution').write(sjson.dump({
+        'buildpath': '/old/root',
+        'relative_prefix': 'zlib-abc',
+        'sbang_install_path': '/old/root/bin/sbang',
+        'spackprefix': '/old/spack',
+        'prefix_to_hash': {'/old/root/zlib-abc': 'abc'},
+        'relocate_textfiles': ['bin/script', 'share/empty.txt'],
+        'relocate_binaries': ['lib/libz.so'],
+    }))
+
+    bindist.write_relocation_offsets(workdir.strpath)
+    offsets = bindist.read_buildinfo_file(workdir.strpath)['relocate_offsets']
+    assert offsets == {
+        'bin/script': {'size': 61, 'offsets': {
+            '#!/bin/bash /old/spack/bin/sbang': [0],
+            '/old/root/zlib-abc': [33]}},
+        'lib/libz.so': {'size': 28, 'offsets': {
+            '/old/root/zlib-abc': [5]}},
+    }
@@ -14,6 +14,9 @@
 import spack.environment as ev
 import spack.main
 import spack.spec
+import spack.util.spack_json as sjson
+import spack.util.spack_yaml as syaml
+import spack.util.url as url_util
 from spack.spec import Spec
 
 buildcache = spack.main.SpackCommand('buildcache')
@@ -268,3 +271,192 @@ def test_buildcache_create_install(mutable_mock_env_path,
         os.path.join(str(tmpdir), 'build_cache', tarball_path))
     assert os.path.exists(
         os.path.join(str(tmpdir), 'build_cache', tarball))
+
+
+def test_update_index_parses_in_parallel(
+        tmpdir, mutable_mock_env_path, install_mockery, mock_packages,
+        mock_fetch, mock_stage, monkeypatch):
+    """Test that spec files fetched concurrently and parsed in a process
+    pool give the same index as when they are read one at a time."""
+    mirror_dir = tmpdir.join('mirror')
+    cache_dir = mirror_dir.join('build_cache')
+
+    install('libdwarf')
+    buildcache('create', '-a', '-u', '-d', mirror_dir.strpath, 'libdwarf')
+
+    # Convert spec files to the deprecated YAML format
+    for json_file in cache_dir.listdir('*.spec.json'):
+        yaml_file = json_file.strpath.replace('.spec.json', '.spec.yaml')
+        with open(yaml_file, 'w') as f:
+            f.write(syaml.dump(sjson.load(json_file.read())))
+        json_file.remove()
+
+    def index_for(concurrency, jobs):
+        spack.binary_distribution.generate_package_index(
+            'file://' + cache_dir.strpath, concurrency=concurrency, jobs=jobs)
+        return sjson.load(cache_dir.join('index.json').read())
+
+    monkeypatch.setattr(
+        spack.binary_distribution, '_min_spec_files_per_job', 1)
+    index = index_for(1, 1)
+    assert len(index['database']['installs']) == 2
+    assert index_for(4, 2) == index
+
+
+def test_update_index_incremental(
+        tmpdir, mutable_mock_env_path, install_mockery, mock_packages,
+        mock_fetch, mock_stage, monkeypatch):
+    """Test that incremental index updates only read new spec files."""
+    mirror_dir = tmpdir.join('mirror')
+    cache_dir = mirror_dir.join('build_cache')
+    libdwarf = Spec('libdwarf').concretized()
+    install('libdwarf')
+
+    fetched = []
+    read_spec_file = spack.binary_distribution._read_spec_file
+
+    def _read_spec_file(spec_url):
+        fetched.append(spec_url)
+        return read_spec_file(spec_url)
+
+    monkeypatch.setattr(
+        spack.binary_distribution, '_read_spec_file', _read_spec_file)
+
+    def indexed():
+        index = sjson.load(cache_dir.join('index.json').read())
+        return sorted(r['spec']['name']
+                      for r in index['database']['installs'].values()
+                      if r['in_buildcache'])
+
+    # Without an index, the whole index is generated
+    buildcache('create', '-a', '-u', '--rebuild-index', '--only', 'package',
+               '-d', mirror_dir.strpath, '/' + libdwarf['libelf'].dag_hash())
+    assert indexed() == ['libelf']
+
+    # Pushed specs are given to the update, which reads only their spec file
+    del fetched[:]
+    buildcache('create', '-a', '-u', '--rebuild-index', '--only', 'package',
+               '-d', mirror_dir.strpath, '/' + libdwarf.dag_hash())
+    assert indexed() == ['libdwarf', 'libelf']
+    assert len(fetched) == 1
+
+    # Removed spec files are removed from the index
+    for spec_file in cache_dir.listdir('*libelf*.spec.json'):
+        spec_file.remove()
+    del fetched[:]
+    buildcache('update-index', '--incremental', '-d', mirror_dir.strpath)
+    assert indexed() == ['libdwarf']
+    assert not fetched
+
+
+def test_update_index_incremental_after_concurrent_push(
+        tmpdir, mutable_mock_env_path, install_mockery, mock_packages,
+        mock_fetch, mock_stage):
+    """Test that incremental index updates index the specs pushed by
+    others since the index was written."""
+    mirror_dir = tmpdir.join('mirror')
+    cache_dir = mirror_dir.join('build_cache')
+    libdwarf = Spec('libdwarf').concretized()
+    install('libdwarf')
+
+    buildcache('create', '-a', '-u', '--rebuild-index', '--only', 'package',
+               '-d', mirror_dir.strpath, '/' + libdwarf['libelf'].dag_hash())
+
+    # A concurrent pipeline pushed libdwarf, but its index was overwritten
+    buildcache('create', '-a', '-u', '--only', 'package',
+               '-d', mirror_dir.strpath, '/' + libdwarf.dag_hash())
+
+    spack.binary_distribution.generate_package_index(
+        url_util.join('file://' + mirror_dir.strpath, 'build_cache'),
+        incremental=True, added=[])
+    index = sjson.load(cache_dir.join('index.json').read())
+    assert sorted(r['spec']['name']
+                  for r in index['database']['installs'].values()
+                  if r['in_buildcache']) == ['libdwarf', 'libelf']
+
+
+def test_buildcache_create_in_parallel(
+        tmpdir, mutable_mock_env_path, install_mockery, mock_packages,
+        mock_fetch, mock_stage, monkeypatch):
+    """Test that specs packaged by several processes are all pushed, and
+    that the index is updated once."""
+    mirror_dir = tmpdir.join('mirror')
+    libdwarf = Spec('libdwarf').concretized()
+    install('libdwarf')
+
+    updates = []
+    monkeypatch.setattr(spack.binary_distribution, 'generate_package_index',
+                        lambda *args, **kwargs: updates.append(args))
+    buildcache('create', '-a', '-u', '--rebuild-index', '-j', '2',
+               '-d', mirror_dir.strpath, 'libdwarf')
+
+    cache_dir = mirror_dir.join('build_cache')
+    for spec in libdwarf.traverse():
+        assert cache_dir.join(
+            spack.binary_distribution.tarball_path_name(spec, '.spack')
+        ).exists()
+        assert cache_dir.join(
+            spack.binary_distribution.tarball_name(spec, '.spec.json')
+        ).exists()
+    assert len(updates) == 1
+
+
+def test_buildcache_create_reports_all_errors(
+        tmpdir, mutable_mock_env_path, install_mockery, mock_packages,
+        mock_fetch, mock_stage, monkeypatch):
+    """Test that a spec that can't be packaged doesn't stop the others."""
+    mirror_dir = tmpdir.join('mirror')
+    libdwarf = Spec('libdwarf').concretized()
+    install('libdwarf')
+
+    build_tarball_files = spack.binary_distribution._build_tarball_files
+
+    def _build_tarball_files(spec, *args):
+        if spec.name == 'libdwarf':
+            raise ValueError('Access Denied')
+        return build_tarball_files(spec, *args)
+
+    monkeypatch.setattr(spack.binary_distribution, '_build_tarball_files',
+                        _build_tarball_files)
+    with pytest.raises(spack.binary_distribution.BuildcacheCreationError,
+                       match='Access Denied'):
+        spack.binary_distribution.build_tarballs(
+            list(libdwarf.traverse()), mirror_dir.strpath, unsigned=True)
+
+    cache_dir = mirror_dir.join('build_cache')
+    assert cache_dir.join(spack.binary_distribution.tarball_path_name(
+        libdwarf['libelf'], '.spack')).exists()
+    assert not cache_dir.join(spack.binary_distribution.tarball_path_name(
+        libdwarf, '.spack')).exists()
+
+
+def test_buildcache_create_indexes_pushed_specs_on_errors(
+        tmpdir, mutable_mock_env_path, install_mockery, mock_packages,
+        mock_fetch, mock_stage, monkeypatch):
+    """Test that the specs that were pushed are indexed, even if others
+    failed."""
+    mirror_dir = tmpdir.join('mirror')
+    install('libdwarf')
+
+    build_tarball_files = spack.binary_distribution._build_tarball_files
+
+    def _build_tarball_files(spec, *args):
+        if spec.name == 'libdwarf':
+            raise ValueError('Access Denied')
+        return build_tarball_files(spec, *args)
+
+    monkeypatch.setattr(spack.binary_distribution, '_build_tarball_files',
+                        _build_tarball_files)
+    buildcache('create', '-a', '-u', '--rebuild-index',
+               '-d', mirror_dir.strpath, 'libdwarf', fail_on_error=False)
+    assert buildcache.returncode != 0
+
+    index = sjson.load(mirror_dir.join('build_cache', 'index.json').read())
+    assert sorted(r['spec']['name']
+                  for r in index['database']['installs'].values()
+                  if r['in_buildcache']) == ['libelf']
+
+
+def test_buildcache_create_invalid_jobs(mutable_mock_env_path):
+    with pytest.raises(ValueError, match='expected a positive integer'):
+        buildcache('create', '-j', '0', '-d', '.', 'libdwarf')
@@ -0,0 +1,15 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import spack.daemon
+import spack.main
+
+daemon = spack.main.SpackCommand('daemon')
+
+
+def test_daemon_not_running(tmpdir, monkeypatch):
+    monkeypatch.setattr(
+        spack.daemon, 'socket_path', lambda: str(tmpdir.join('daemon.sock')))
+    assert 'No daemon is running' in daemon('status')
+    assert 'No daemon is running' in daemon('stop')
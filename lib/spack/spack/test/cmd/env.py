@@ -12,10 +12,12 @@
 import llnl.util.filesystem as fs
 import llnl.util.link_tree
 
+import spack.caches
 import spack.cmd.env
 import spack.environment as ev
 import spack.hash_types as ht
 import spack.modules
+import spack.util.file_cache
 import spack.util.spack_json as sjson
 from spack.cmd.env import _env_create
 from spack.main import SpackCommand, SpackCommandError
@@ -200,7 +202,7 @@ def test_env_roots_marked_explicit(install_mockery, mock_fetch):
 
 
 def test_env_modifications_error_on_activate(
-        install_mockery, mock_fetch, monkeypatch, capfd):
+        install_mockery, mock_fetch, monkeypatch, capfd, tmpdir):
     env('create', 'test')
     install = SpackCommand('install')
 
@@ -213,6 +215,9 @@ def setup_error(pkg, env):
 
     pkg = spack.repo.path.get_pkg_class("cmake-client")
     monkeypatch.setattr(pkg, "setup_run_environment", setup_error)
+    # Package files are unchanged, so bypass the modifications cached above
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir)))
     with e:
         pass
 
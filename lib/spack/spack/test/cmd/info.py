@@ -8,6 +8,7 @@
 import pytest
 
 import spack.cmd.info
+import spack.repo
 from spack.main import SpackCommand
 
 info = SpackCommand('info')
@@ -89,3 +90,16 @@ def test_info_fields(pkg_query, parser, info_lines):
     for text in expected_fields:
         match = [x for x in info_lines if text in x]
         assert match
+
+
+@pytest.mark.usefixtures('mock_print')
+def test_info_does_not_import_packages(mock_packages, parser, monkeypatch):
+    # Make sure the metadata index is built before we forbid imports
+    spack.repo.path.metadata_index
+
+    def _fail(*args, **kwargs):
+        raise AssertionError('package modules should not be imported')
+    monkeypatch.setattr(spack.repo.Repo, '_get_pkg_module', _fail)
+
+    args = parser.parse_args(['mpileaks'])
+    spack.cmd.info.info(parser, args)
@@ -6,8 +6,12 @@
 
 import pytest
 
+import spack.build_environment
+import spack.caches
+import spack.repo
 import spack.spec
 import spack.user_environment as uenv
+import spack.util.file_cache
 from spack.main import SpackCommand, SpackCommandError
 
 load = SpackCommand('load')
@@ -46,6 +50,59 @@ def test_load(install_mockery, mock_fetch, mock_archive, mock_packages):
     assert csh_hash_test in csh_out
 
 
+def test_load_caches_modifications(install_mockery, mock_fetch,
+                                   mock_archive, mock_packages,
+                                   tmpdir, monkeypatch):
+    """Test that environment modifications are computed only once for each
+    spec, unless its prefix or the package file of a spec in its DAG
+    changes."""
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir)))
+    install('mpileaks')
+    mpileaks_spec = spack.spec.Spec('mpileaks').concretized()
+
+    computed = []
+    modifications_from_dependencies = \
+        spack.build_environment.modifications_from_dependencies
+
+    def _modifications(spec, *args, **kwargs):
+        computed.append(spec.name)
+        return modifications_from_dependencies(spec, *args, **kwargs)
+
+    monkeypatch.setattr(spack.build_environment,
+                        'modifications_from_dependencies', _modifications)
+
+    sh_out = load('--sh', 'mpileaks')
+    assert sorted(computed) == sorted(
+        s.name for s in mpileaks_spec.traverse())
+
+    del computed[:]
+    assert load('--sh', 'mpileaks') == sh_out
+    assert load('--csh', 'mpileaks')
+    assert computed == []
+
+    os.utime(mpileaks_spec.prefix, (0, 0))
+    assert load('--sh', 'mpileaks') == sh_out
+    assert computed == ['mpileaks']
+
+    # Other package files of the repository are not checked
+    def _last_mtime(*args):
+        raise AssertionError('all package files are checked')
+
+    monkeypatch.setattr(spack.repo.RepoPath, 'last_mtime', _last_mtime)
+    monkeypatch.setattr(spack.repo.Repo, 'last_mtime', _last_mtime)
+    package_file = spack.repo.path.filename_for_package_name('libelf')
+    st = os.stat(package_file)
+    try:
+        os.utime(package_file, (st.st_atime, st.st_mtime + 10))
+        del computed[:]
+        assert load('--sh', 'mpileaks') == sh_out
+        assert sorted(computed) == sorted(
+            s.name for s in mpileaks_spec.traverse() if 'libelf' in s)
+    finally:
+        os.utime(package_file, (st.st_atime, st.st_mtime))
+
+
 def test_load_recursive(install_mockery, mock_fetch, mock_archive,
                         mock_packages):
     """Test that the '-r' option to the load command prepends dependency prefix
@@ -13,6 +13,7 @@ def test_print_shell_vars_sh(capsys):
     assert "_sp_sys_type=" in out
     assert "_sp_tcl_roots=" in out
     assert "_sp_lmod_roots=" in out
+    assert "_sp_completion_cache=" in out
     assert "_sp_module_prefix" not in out
 
 
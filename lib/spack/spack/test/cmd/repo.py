@@ -3,10 +3,18 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import os.path
+import sys
 
 import pytest
 
+import spack.caches
+import spack.cmd.repo
+import spack.config
+import spack.environment as ev
 import spack.main
+import spack.paths
+import spack.repo
+import spack.util.file_cache
 
 repo = spack.main.SpackCommand('repo')
 
@@ -26,7 +34,7 @@ def test_create_add_list_remove(mutable_config, tmpdir):
     assert os.path.exists(os.path.join(str(tmpdir), 'repo.yaml'))
 
     # Add the new repository and check it appears in the list output
-    repo('add', '--scope=site', str(tmpdir))
+    repo('add', '--scope=site', '--no-reindex', str(tmpdir))
     output = repo('list', '--scope=site', output=str)
     assert 'mockrepo' in output
 
@@ -34,3 +42,43 @@ def test_create_add_list_remove(mutable_config, tmpdir):
     repo('remove', '--scope=site', str(tmpdir))
     output = repo('list', '--scope=site', output=str)
     assert 'mockrepo' not in output
+
+
+def test_add_reindexes_with_the_same_scopes(
+        mutable_config, tmpdir, monkeypatch):
+    commands = []
+    monkeypatch.setattr(spack.cmd.repo.subprocess, 'Popen',
+                        lambda command, **kwargs: commands.append(command))
+
+    scope_dir = tmpdir.mkdir('scope')
+    monkeypatch.setattr(spack.config, 'command_line_scopes', [str(scope_dir)])
+    env = ev.Environment(str(tmpdir.mkdir('env')))
+
+    repo_dir = tmpdir.join('repo')
+    repo('create', str(repo_dir), 'mockrepo')
+    with env:
+        repo('add', '--scope=site', str(repo_dir))
+
+    assert commands == [[
+        sys.executable, spack.paths.spack_script,
+        '-C', str(scope_dir), '-D', env.path,
+        'repo', 'reindex', str(repo_dir)
+    ]]
+
+
+def test_reindex(mock_packages, tmpdir, monkeypatch):
+    cache = spack.util.file_cache.FileCache(str(tmpdir))
+    monkeypatch.setattr(spack.caches, 'misc_cache', cache)
+
+    output = repo('reindex', '--jobs=2', 'builtin.mock')
+    num_pkgs = len(spack.repo.path.all_package_names(include_virtuals=True))
+    assert "Reindexed %d packages in repo 'builtin.mock'" % num_pkgs in output
+
+    # Nothing changed since the last reindex
+    output = repo('reindex', spack.paths.mock_packages_path)
+    assert "Reindexed 0 packages in repo 'builtin.mock'" in output
+
+
+def test_reindex_unknown_repo(mock_packages):
+    repo('reindex', 'not-a-repo', fail_on_error=False)
+    assert repo.returncode != 0
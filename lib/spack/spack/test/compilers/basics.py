@@ -13,10 +13,12 @@
 
 import llnl.util.filesystem as fs
 
+import spack.caches
 import spack.compiler
 import spack.compilers as compilers
 import spack.spec
 import spack.util.environment
+import spack.util.file_cache
 from spack.compiler import Compiler
 from spack.util.executable import ProcessError
 
@@ -967,3 +969,26 @@ def prepare_executable(name):
     # Test that null entries don't fail
     compiler.cc = None
     compiler.verify_executables()
+
+
+def test_compiler_output_is_cached(mock_executable, monkeypatch, tmpdir):
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir)))
+    calls = tmpdir.join('calls')
+    gcc = mock_executable('gcc', 'echo x >> {0}; echo 9.3.0'.format(calls))
+
+    def version_output():
+        # Simulate a new Spack process
+        spack.compiler._get_compiler_version_output.cache.clear()
+        return spack.compiler.get_compiler_version_output(
+            gcc, '-dumpversion')
+
+    assert version_output().strip() == '9.3.0'
+    assert version_output().strip() == '9.3.0'
+    assert len(calls.readlines()) == 1
+
+    # A modified executable is probed again
+    with open(gcc, 'a') as f:
+        f.write('\necho 10.2.0\n')
+    assert version_output().split() == ['9.3.0', '10.2.0']
+    assert len(calls.readlines()) == 2
@@ -0,0 +1,58 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import os
+
+import pytest
+
+import spack.caches
+import spack.completion
+import spack.util.file_cache
+from spack.main import SpackCommand
+
+commands = SpackCommand('commands')
+env = SpackCommand('env')
+
+
+@pytest.fixture()
+def completion_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir)))
+    return spack.completion.cache_dir()
+
+
+def _words(cache_dir, name):
+    with open(os.path.join(cache_dir, name)) as f:
+        return f.read().split()
+
+
+def test_update_completion_cache(
+        completion_cache, mock_packages, database, mutable_mock_env_path):
+    out = commands('--update-completion-cache')
+    assert out.strip() == completion_cache
+
+    assert 'mpileaks' in _words(completion_cache, 'packages')
+    assert 'mpileaks@2.3' in _words(completion_cache, 'installed')
+    assert 'install' in _words(completion_cache, 'commands')
+    assert _words(completion_cache, 'environments') == []
+
+    for name in spack.completion.lists:
+        assert not spack.completion.is_stale(name)
+
+
+def test_completion_cache_invalidation(
+        completion_cache, mock_packages, mutable_mock_env_path):
+    os.utime(str(mutable_mock_env_path), (0, 0))
+    spack.completion.update(['environments'])
+    environments = os.path.join(completion_cache, 'environments')
+    assert not spack.completion.is_stale('environments')
+
+    # Creating an environment modifies the directory of environments
+    env('create', 'test')
+    assert spack.completion.is_stale('environments')
+    spack.completion.update(['environments'])
+    assert _words(completion_cache, 'environments') == ['test']
+
+    os.remove(environments + '.deps')
+    assert spack.completion.is_stale('environments')
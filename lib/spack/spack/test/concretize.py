@@ -17,6 +17,7 @@
 import spack.error
 import spack.platforms
 import spack.repo
+import spack.solver.asp
 from spack.concretize import find_spec
 from spack.spec import Spec
 from spack.util.mock_package import MockPackageMultiRepo
@@ -1115,6 +1116,44 @@ def test_reuse_installed_packages(
 
         assert root.dag_hash() == new_root.dag_hash()
 
+    @pytest.mark.parametrize('context', [
+        {'add_variant': True, 'delete_variant': False},
+        {'add_variant': False, 'delete_variant': True},
+        {'add_variant': True, 'delete_variant': True}
+    ])
+    def test_reuse_installed_packages_when_package_def_changes(
+            self, context, mutable_database, repo_with_changing_recipe
+    ):
+        if spack.config.get('config:concretizer') == 'original':
+            pytest.skip('Original concretizer does not reuse specs')
+
+        # Install a spec
+        root = Spec('root').concretized()
+        root.package.do_install(fake=True, explicit=True)
+
+        # Modify package.py
+        repo_with_changing_recipe.change(context)
+
+        # Without reuse the new recipe gives a different hash
+        new_root = Spec('root').concretized()
+        assert root.dag_hash() != new_root.dag_hash()
+
+        # With reuse we get back what is installed
+        with spack.config.override('concretizer:reuse', True):
+            new_root = Spec('root').concretized()
+        assert root.dag_hash() == new_root.dag_hash()
+
+    def test_reuse_installed_dag(self, mutable_database):
+        if spack.config.get('config:concretizer') == 'original':
+            pytest.skip('Original concretizer does not reuse specs')
+
+        # The whole DAG is installed in the mock database, so nothing
+        # needs to be built
+        installed = mutable_database.query_one('mpileaks ^mpich')
+        with spack.config.override('concretizer:reuse', True):
+            s = Spec('mpileaks ^mpich').concretized()
+        assert s.dag_hash() == installed.dag_hash()
+
     @pytest.mark.regression('20784')
     def test_concretization_of_test_dependencies(self):
         # With clingo we emit dependency_conditions regardless of the type
@@ -1268,3 +1307,18 @@ def test_newer_dependency_adds_a_transitive_virtual(self):
         s = spack.spec.Spec('root-adds-virtual').concretized()
         assert s['leaf-adds-virtual'].satisfies('@2.0')
         assert 'blas' in s
+
+
+@pytest.mark.parametrize('settings,threads,configuration', [
+    ({}, 2, 'tweety'),
+    ({'solver_threads': 8}, 8, 'tweety'),
+    ({'solver_threads': 4, 'configuration': 'many'}, 4, 'many'),
+])
+def test_solver_settings_from_config(
+        settings, threads, configuration, mutable_config
+):
+    for key, value in settings.items():
+        spack.config.set('concretizer:' + key, value)
+
+    assert spack.solver.asp.solver_threads() == threads
+    assert spack.solver.asp.solver_configuration() == configuration
@@ -20,6 +20,7 @@
 import spack.schema.compilers
 import spack.schema.config
 import spack.schema.env
+import spack.schema.merged
 import spack.schema.mirrors
 import spack.schema.packages
 import spack.schema.repos
@@ -659,6 +660,13 @@ def assert_marked(obj):
             assert_marked(obj)
 
 
+def test_config_defaults_are_valid():
+    # Spack doesn't validate its hardcoded defaults at startup
+    for section, data in spack.config.config_defaults.items():
+        spack.config.validate(
+            {section: data}, spack.config.section_schemas[section])
+
+
 def test_internal_config_from_data():
     config = spack.config.Configuration()
 
@@ -1167,3 +1175,109 @@ def test_internal_config_scope_cache_clearing():
     internal_scope.clear()
     # Check that this didn't affect the scope object
     assert internal_scope.sections['config'] == data
+
+
+@pytest.fixture()
+def cached_config_file(tmpdir, monkeypatch):
+    """Write an old enough config file for its contents to be cached."""
+    monkeypatch.setattr(
+        spack.config, 'config_cache_path', str(tmpdir.join('cache')))
+
+    def _write(contents, name='config.yaml'):
+        path = tmpdir.join('scope', name)
+        path.write(contents, ensure=True)
+        mtime = path.stat().mtime - 60
+        os.utime(str(path), (mtime, mtime))
+        return str(path)
+    return _write
+
+
+def no_yaml_parsing(*args, **kwargs):
+    raise AssertionError('config file should be read from the cache')
+
+
+def test_config_cache(cached_config_file, monkeypatch):
+    filename = cached_config_file("""\
+config:
+    build_stage::
+    - relative/path
+    install_hash_length: 7
+    checksum: false
+    template_dirs:
+    - 'zlib@1.2:'
+""")
+    schema = spack.config.section_schemas['config']
+    parsed = spack.config.read_config_file(filename, schema, use_cache=True)
+
+    monkeypatch.setattr(syaml, 'load_config', no_yaml_parsing)
+    cached = spack.config.read_config_file(filename, schema, use_cache=True)
+    assert cached == parsed
+    assert list(cached['config']) == list(parsed['config'])
+
+    # overrides, types and file names are preserved
+    key = next(k for k in cached['config'] if k == 'build_stage')
+    assert spack.config._override(key)
+    assert cached['config']['template_dirs'] == ['zlib@1.2:']
+    assert cached['config']['checksum'] is False
+    assert spack_path.canonicalize_path(
+        cached['config']['build_stage'][0]
+    ) == os.path.join(os.path.dirname(filename), 'relative', 'path')
+
+
+def test_config_cache_is_invalidated(cached_config_file, monkeypatch):
+    filename = cached_config_file('config:\n    build_jobs: 4\n')
+    schema = spack.config.section_schemas['config']
+    spack.config.read_config_file(filename, schema, use_cache=True)
+
+    cached_config_file('config:\n    build_jobs: 8\n')
+    data = spack.config.read_config_file(filename, schema, use_cache=True)
+    assert data['config']['build_jobs'] == 8
+
+    # a different schema does not use the cached data either
+    monkeypatch.setattr(syaml, 'load_config', no_yaml_parsing)
+    with pytest.raises(AssertionError):
+        spack.config.read_config_file(
+            filename, spack.schema.merged.schema, use_cache=True)
+
+
+def test_recent_config_files_are_not_cached(tmpdir, monkeypatch):
+    cache = tmpdir.join('cache')
+    monkeypatch.setattr(spack.config, 'config_cache_path', str(cache))
+    filename = tmpdir.join('config.yaml')
+    filename.write('config:\n    build_jobs: 4\n')
+
+    spack.config.read_config_file(
+        str(filename), spack.config.section_schemas['config'],
+        use_cache=True)
+    assert not cache.exists()
+
+
+def test_update_cached_config_keeps_comments(cached_config_file):
+    filename = cached_config_file("""\
+config:
+    build_jobs: 4  # parallel builds
+""")
+    scope = spack.config.ConfigScope('site', os.path.dirname(filename))
+    cfg = spack.config.Configuration(scope)
+    assert cfg.get('config:build_jobs') == 4
+    cfg.clear_caches()
+    assert cfg.get('config:build_jobs') == 4
+
+    cfg.set('config:build_jobs', 8, scope='site')
+    with open(filename) as f:
+        contents = f.read()
+    assert '# parallel builds' in contents
+    assert 'build_jobs: 8' in contents
+
+
+def test_blame_reads_line_numbers(cached_config_file, capsys):
+    filename = cached_config_file('config:\n    build_jobs: 4\n')
+    scope = spack.config.ConfigScope('site', os.path.dirname(filename))
+    cfg = spack.config.Configuration(scope)
+    assert cfg.get('config:build_jobs') == 4
+    cfg.clear_caches()
+    assert cfg.get('config:build_jobs') == 4
+
+    cfg.print_section('config', blame=True)
+    out, _ = capsys.readouterr()
+    assert '{0}:2'.format(filename) in out
@@ -9,10 +9,12 @@
 import inspect
 import itertools
 import json
+import multiprocessing
 import os
 import os.path
 import re
 import shutil
+import sys
 import tempfile
 import xml.etree.ElementTree
 
@@ -36,11 +38,13 @@
 import spack.package_prefs
 import spack.paths
 import spack.platforms
+import spack.platforms._host
 import spack.repo
 import spack.stage
 import spack.store
 import spack.subprocess_context
 import spack.util.executable
+import spack.util.file_cache
 import spack.util.gpg
 import spack.util.spack_yaml as syaml
 from spack.fetch_strategy import FetchError, FetchStrategyComposite, URLFetchStrategy
@@ -201,6 +205,38 @@ def clean_user_environment():
         os.environ[ev.spack_env_var] = spack_env_value
 
 
+@pytest.fixture(scope='session', autouse=True)
+def mock_config_cache(tmpdir_factory):
+    """Keep the config cache used by tests out of the user's home."""
+    saved = spack.config.config_cache_path
+    spack.config.config_cache_path = str(tmpdir_factory.mktemp('config-cache'))
+    yield
+    spack.config.config_cache_path = saved
+
+
+@pytest.fixture(scope='session', autouse=True)
+def mock_host_cache(tmpdir_factory):
+    """Keep the cache of host detection used by tests out of the user's
+    misc cache."""
+    saved = spack.platforms._host._file_cache
+    cache = spack.util.file_cache.FileCache(
+        str(tmpdir_factory.mktemp('host-cache')))
+    spack.platforms._host._file_cache = lambda: cache
+    yield
+    spack.platforms._host._file_cache = saved
+
+
+@pytest.fixture()
+def spawn_start_method():
+    """Start new processes by spawning them, e.g. like on macOS."""
+    if sys.version_info < (3, 4):
+        pytest.skip('start methods are configurable only in Python 3.4+')
+    start_method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method('spawn', force=True)
+    yield
+    multiprocessing.set_start_method(start_method, force=True)
+
+
 #
 # Make sure global state of active env does not leak between tests.
 #
@@ -0,0 +1,153 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import os
+import socket
+import sys
+
+import pytest
+
+import spack.daemon
+import spack.paths
+import spack.util.daemon_client as client
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 3), reason='needs socket.sendmsg')
+
+
+@pytest.mark.parametrize('argv,expected', [
+    (['find'], True),
+    (['--color=never', 'find', '--no-groups'], True),
+    (['-e', 'myenv', 'load', '--sh', 'zlib'], True),
+    (['--color', 'always', '-E', 'location', '-r'], True),
+    (['env', 'activate', '--sh', 'myenv'], True),
+    (['config', 'get', 'config'], True),
+    # Commands that modify something
+    (['install', 'zlib'], False),
+    (['env', 'create', 'myenv'], False),
+    (['config', 'add', 'config:build_jobs:2'], False),
+    (['config'], False),
+    # Options changing the configuration
+    (['-C', 'dir', 'find'], False),
+    (['-c', 'config:debug:true', 'find'], False),
+    (['--version'], False),
+    ([], False),
+])
+def test_forwarded(argv, expected):
+    assert client.forwarded(argv) == expected
+
+
+def test_socket_path():
+    path = client.socket_path(spack.paths.prefix)
+    assert os.path.dirname(path) == os.path.join(
+        spack.paths.user_config_path, 'daemon')
+    assert client.socket_path(os.path.dirname(spack.paths.prefix)) != path
+
+
+def test_messages_carry_fds(tmpdir):
+    left, right = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    with open(str(tmpdir.join('file')), 'w') as f:
+        client.send_message(left, {'argv': ['find'] * 1000}, fds=[f.fileno()])
+        message, fds = client.receive_message(right, max_fds=3)
+    assert message == {'argv': ['find'] * 1000}
+
+    # The descriptor received refers to the same file
+    assert len(fds) == 1
+    os.write(fds[0], b'hello')
+    os.close(fds[0])
+    assert tmpdir.join('file').read() == 'hello'
+
+    left.close()
+    with pytest.raises(EOFError):
+        client.receive_message(right)
+    right.close()
+
+
+@pytest.fixture()
+def daemon(tmpdir, database):
+    daemon = spack.daemon.Daemon(str(tmpdir.join('daemon.sock')))
+    daemon.warm()
+    return daemon
+
+
+def _forward(daemon, argv, tmpdir, env=None):
+    """Send a command to the daemon as the client would, and return the
+    reply of the daemon, the exit code, and the output of the command."""
+    output = tmpdir.join('output')
+    left, right = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    with open(os.devnull) as stdin, open(str(output), 'w') as stdout:
+        client.send_message(left, {
+            'argv': argv,
+            'cwd': str(tmpdir),
+            'env': dict(os.environ) if env is None else env,
+        }, fds=[stdin.fileno(), stdout.fileno(), stdout.fileno()])
+    daemon.handle(right)
+    right.close()
+
+    reply, _ = client.receive_message(left)
+    if not reply.get('accepted'):
+        return reply, None, None
+
+    returncode = client.receive_message(left)[0]['returncode']
+    while daemon.children:
+        os.waitpid(daemon.children.pop(), 0)
+    left.close()
+    return reply, returncode, output.read()
+
+
+def test_daemon_runs_commands(daemon, tmpdir):
+    reply, returncode, output = _forward(
+        daemon, ['location', '-r'], tmpdir)
+    assert reply == {'accepted': True}
+    assert returncode == 0
+    assert output.strip() == spack.paths.prefix
+
+    # Commands see the mock database loaded by the daemon
+    reply, returncode, output = _forward(
+        daemon, ['find', '--no-groups', 'mpileaks'], tmpdir)
+    assert returncode == 0
+    assert 'mpileaks@2.3' in output
+
+    reply, returncode, output = _forward(
+        daemon, ['location', '-i', 'nonexistent-package'], tmpdir)
+    assert returncode == 1
+    assert daemon.served == 3
+
+
+def test_daemon_refuses_commands(daemon, tmpdir):
+    reply, _, _ = _forward(daemon, ['install', 'zlib'], tmpdir)
+    assert 'fallback' in reply
+
+    env = dict(os.environ, HOME=str(tmpdir))
+    reply, _, _ = _forward(daemon, ['find'], tmpdir, env=env)
+    assert 'environment' in reply['fallback']
+    assert daemon.served == 0
+
+
+def test_daemon_refuses_other_values_of_config_variables(
+        daemon, mutable_config, tmpdir, monkeypatch
+):
+    monkeypatch.setenv('SPACK_TEST_ROOT', str(tmpdir))
+    scope = spack.config.config.scopes['site']
+    with open(os.path.join(scope.path, 'config.yaml'), 'w') as f:
+        f.write('config:\n  source_cache: ${SPACK_TEST_ROOT}/cache\n')
+    daemon.warm()
+
+    reply, _, _ = _forward(daemon, ['location', '-r'], tmpdir)
+    assert reply == {'accepted': True}
+
+    env = dict(os.environ, SPACK_TEST_ROOT=str(tmpdir.join('other')))
+    reply, _, _ = _forward(daemon, ['location', '-r'], tmpdir, env=env)
+    assert 'environment' in reply['fallback']
+    assert daemon.served == 1
+
+
+def test_daemon_detects_configuration_changes(daemon, mutable_config, tmpdir):
+    # Configuration files changed since the daemon loaded them
+    daemon.warm()
+    assert not daemon.changed(scan=True)
+    scope = spack.config.config.scopes['site']
+    with open(os.path.join(scope.path, 'config.yaml'), 'w') as f:
+        f.write('config:\n  build_jobs: 3\n')
+    assert daemon.changed(scan=False)
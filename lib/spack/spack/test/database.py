@@ -26,7 +26,9 @@
 import llnl.util.lock as lk
 from llnl.util.tty.colify import colify
 
+import spack.config
 import spack.database
+import spack.error
 import spack.package
 import spack.repo
 import spack.spec
@@ -894,3 +896,67 @@ def _raise(db, spec):
     with pytest.raises(Exception):
         with spack.store.db.prefix_write_lock(s):
             assert False
+
+
+@pytest.mark.skipif(not _use_uuid, reason='requires the index verifier')
+def test_snapshot_read_takes_no_lock(mutable_database, monkeypatch):
+    """Snapshot reads see writes of other processes without locking."""
+    writer = spack.database.Database(mutable_database.root)
+    reader = spack.database.Database(mutable_database.root)
+    reader.read_mode = 'snapshot'
+    expected = len(reader.query())
+
+    with writer.write_transaction():
+        writer.remove(writer.query_one('mpileaks ^mpich'))
+
+    def _raise(lock, *args, **kwargs):
+        raise lk.LockError('Mock lock error')
+
+    monkeypatch.setattr(lk.Lock, 'acquire_read', _raise)
+    assert len(reader.query()) == expected - 1
+
+    # An unchanged index is not read again
+    monkeypatch.setattr(reader, '_read_from_file', _raise)
+    with reader.read_transaction():
+        with reader.read_transaction():
+            assert len(reader.query()) == expected - 1
+
+
+@pytest.mark.skipif(not _use_uuid, reason='requires the index verifier')
+def test_snapshot_read_retries_on_concurrent_write(
+        mutable_database, monkeypatch):
+    reader = spack.database.Database(mutable_database.root)
+    reader.read_mode = 'snapshot'
+
+    read_from_file = reader._read_from_file
+    calls = []
+
+    def _read_during_write(filename):
+        calls.append(filename)
+        read_from_file(filename)
+        if len(calls) == 1:
+            with open(reader._verifier_path, 'w') as f:
+                f.write(str(uuid.uuid4()))
+
+    monkeypatch.setattr(spack.database, '_snapshot_read_delay', 0)
+    monkeypatch.setattr(reader, '_read_from_file', _read_during_write)
+    with reader.read_transaction():
+        pass
+    assert len(calls) == 2
+    with open(reader._verifier_path) as f:
+        assert reader.last_seen_verifier == f.read()
+
+
+def test_db_read_mode_from_environment(
+        mutable_database, mutable_config, monkeypatch):
+    spack.config.set('config:db_read_mode', 'snapshot')
+    assert spack.database.Database(
+        mutable_database.root).read_mode == 'snapshot'
+
+    monkeypatch.setenv('SPACK_DB_READ_MODE', 'locked')
+    assert spack.database.Database(
+        mutable_database.root).read_mode == 'locked'
+
+    monkeypatch.setenv('SPACK_DB_READ_MODE', 'unlocked')
+    with pytest.raises(spack.error.SpackError):
+        spack.database.Database(mutable_database.root)
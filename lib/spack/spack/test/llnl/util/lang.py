@@ -150,6 +150,19 @@ def test_load_modules_from_file(module_path):
     assert foo.path == os.path.join('/usr', 'bin')
 
 
+def test_lazy_import(tmpdir, monkeypatch):
+    tmpdir.join('lazy_foo.py').write('value = 1\n')
+    monkeypatch.syspath_prepend(str(tmpdir))
+    monkeypatch.delitem(sys.modules, 'lazy_foo', raising=False)
+
+    # The module is imported only when one of its attributes is needed
+    foo = llnl.util.lang.lazy_import('lazy_foo')
+    assert 'lazy_foo' not in sys.modules
+    assert foo.value == 1
+    assert 'lazy_foo' in sys.modules
+    sys.modules.pop('lazy_foo')
+
+
 def test_uniq():
     assert [1, 2, 3] == llnl.util.lang.uniq([1, 2, 3])
     assert [1, 2, 3] == llnl.util.lang.uniq([1, 1, 1, 1, 2, 2, 2, 3, 3])
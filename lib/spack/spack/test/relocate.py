@@ -14,12 +14,14 @@
 
 import spack.architecture
 import spack.concretize
+import spack.config
 import spack.paths
 import spack.relocate
 import spack.spec
 import spack.store
 import spack.tengine
 import spack.util.executable
+import spack.util.file_type
 
 
 def rpaths_for(new_binary):
@@ -272,6 +274,43 @@ def test_set_elf_rpaths_warning(mock_patchelf):
     assert output is None
 
 
+@pytest.mark.requires_executables('gcc')
+@pytest.mark.skipif(
+    platform.system().lower() != 'linux',
+    reason='implementation for MacOS still missing'
+)
+def test_relocate_elf_binaries_in_place(hello_world, tmpdir, monkeypatch):
+    orig_root = str(tmpdir.mkdir('opt'))
+    rpaths = [os.path.join(orig_root, 'zlib-abcdef', 'lib'), '/usr/lib64']
+    short, long = hello_world(rpaths=rpaths), tmpdir.join('long.x')
+    shutil.copy(str(short), str(long))
+
+    patched = []
+
+    def _patchelf_set_rpaths(target, rpaths, patchelf_path=None):
+        patched.append((target, rpaths))
+    monkeypatch.setattr(
+        spack.relocate, '_patchelf_set_rpaths', _patchelf_set_rpaths)
+    monkeypatch.setattr(spack.relocate, '_patchelf', lambda: 'patchelf')
+
+    spack.relocate.relocate_elf_binaries(
+        [str(short)], orig_root, '/opt', {orig_root: '/opt'}, False,
+        os.path.join(orig_root, 'zlib-abcdef'), '/opt/zlib-abcdef')
+    assert spack.relocate._elf_rpaths_for(str(short)) == [
+        '/opt/zlib-abcdef/lib', '/usr/lib64']
+    assert not patched
+
+    # RPATHs that don't fit are left to patchelf
+    new_root = orig_root + '/much/longer'
+    spack.relocate.relocate_elf_binaries(
+        [str(long)], orig_root, new_root, {orig_root: new_root}, False,
+        os.path.join(orig_root, 'zlib-abcdef'),
+        os.path.join(new_root, 'zlib-abcdef'))
+    assert spack.relocate._elf_rpaths_for(str(long)) == rpaths
+    assert patched == [(str(long), [
+        os.path.join(new_root, 'zlib-abcdef', 'lib'), '/usr/lib64'])]
+
+
 @pytest.mark.requires_executables('patchelf', 'strings', 'file', 'gcc')
 @pytest.mark.skipif(
     platform.system().lower() != 'linux',
@@ -407,3 +446,173 @@ def test_relocate_text_bin_raise_if_new_prefix_is_longer(tmpdir):
         spack.relocate.relocate_text_bin(
             [fpath], {short_prefix: long_prefix}
         )
+
+
+def test_relocate_text_at_offsets(tmpdir, monkeypatch):
+    root, prefix = '/home/spack/opt', '/home/spack/opt/linux/zlib-abcdef'
+    contents = ('#!/bin/sh\nexport PATH={1}/bin:{0}/bin:/usr{0}\n'
+                'cat {1}/share/zlib.txt -I{0}\n').format(root, prefix)
+    scanned, patched = tmpdir.join('scanned'), tmpdir.join('patched')
+    scanned.write(contents)
+    patched.write(contents)
+
+    prefixes = collections.OrderedDict([
+        (prefix, '/opt/zlib'), (root, '/new/root')])
+    offsets = spack.relocate.prefix_offsets(patched.strpath, list(prefixes))
+    assert offsets['size'] == len(contents)
+    assert len(offsets['offsets'][prefix]) == 2
+    # Not after another path
+    assert len(offsets['offsets'][root]) == 2
+
+    spack.relocate.relocate_text([scanned.strpath], prefixes)
+
+    def _scan(*args):
+        raise AssertionError('file was scanned')
+    monkeypatch.setattr(spack.relocate, '_replace_prefix_text', _scan)
+    spack.relocate.relocate_text(
+        [patched.strpath], prefixes, offsets={patched.strpath: offsets})
+    assert patched.read() == scanned.read()
+
+    # Files that changed since are scanned
+    patched.write('more ' + contents)
+    with pytest.raises(AssertionError, match='scanned'):
+        spack.relocate.relocate_text(
+            [patched.strpath], prefixes, offsets={patched.strpath: offsets})
+
+
+def test_relocate_text_bin_at_offsets(tmpdir, monkeypatch):
+    root, prefix = b'/home/spack/opt', b'/home/spack/opt/linux/zlib-abcdef'
+    contents = b'\x7fELF\0' + prefix + b'/lib\0\x01' + root + b'/bin\0'
+    scanned, patched = tmpdir.join('scanned'), tmpdir.join('patched')
+    scanned.write_binary(contents)
+    patched.write_binary(contents)
+
+    prefixes = collections.OrderedDict([
+        (prefix, b'/opt/zlib'), (root, b'/new/root')])
+    offsets = spack.relocate.prefix_offsets(
+        patched.strpath, [p.decode('utf-8') for p in prefixes], binary=True)
+    assert offsets['offsets'] == {
+        prefix.decode('utf-8'): [5], root.decode('utf-8'): [44]}
+
+    spack.relocate.relocate_text_bin([scanned.strpath], prefixes)
+
+    def _scan(*args):
+        raise AssertionError('file was scanned')
+    monkeypatch.setattr(spack.relocate, '_replace_prefix_bin', _scan)
+    spack.relocate.relocate_text_bin(
+        [patched.strpath], prefixes, offsets={patched.strpath: offsets})
+    assert patched.read_binary() == scanned.read_binary()
+
+    # Nothing is replaced if a prefix is too long
+    patched.write_binary(contents)
+    prefixes[root] = b'/much/longer/root'
+    with pytest.raises(spack.relocate.BinaryTextReplaceError):
+        spack.relocate.relocate_text_bin(
+            [patched.strpath], prefixes, offsets={patched.strpath: offsets})
+    assert patched.read_binary() == contents
+
+
+def test_relocate_text_in_one_pass(tmpdir):
+    # The new root is under the old one, so replacing the prefixes one
+    # after the other would relocate the new prefix again
+    root, prefix = '/home/spack/opt', '/home/spack/opt/linux/zlib-abcdef'
+    script = tmpdir.join('script')
+    script.write('{0}/bin:{1}/bin\n'.format(prefix, root))
+
+    prefixes = collections.OrderedDict([
+        (prefix, '/home/spack/opt/new/zlib-abcdef'),
+        (root, '/home/spack/opt/new')])
+    spack.relocate.relocate_text([script.strpath], prefixes)
+    assert script.read() == (
+        '/home/spack/opt/new/zlib-abcdef/bin:/home/spack/opt/new/bin\n')
+
+
+def test_relocate_text_bin_in_processes(tmpdir, monkeypatch):
+    monkeypatch.setattr(spack.relocate, '_min_bytes_per_job', 1)
+    monkeypatch.setattr(spack.relocate, 'cpus_available', lambda: 4)
+
+    prefixes = collections.OrderedDict(
+        (b'/home/spack/opt/linux/dep%d-abcdef' % i, b'/opt/dep%d' % i)
+        for i in range(300))
+    binaries = []
+    for i in range(8):
+        binary = tmpdir.join('lib%d.so' % i)
+        binary.write_binary(b'\0'.join(list(prefixes)[i::8]) + b'\0')
+        binaries.append(binary)
+
+    spack.relocate.relocate_text_bin([b.strpath for b in binaries], prefixes)
+    for i, binary in enumerate(binaries):
+        assert binary.read_binary() == b'\0'.join(
+            new_bytes + b'/' * (len(orig_bytes) - len(new_bytes))
+            for orig_bytes, new_bytes in list(prefixes.items())[i::8]) + b'\0'
+
+    # Errors are raised from the processes too
+    with pytest.raises(spack.relocate.BinaryTextReplaceError):
+        spack.relocate.relocate_text_bin(
+            [b.strpath for b in binaries], {b'/opt': b'/much/longer'})
+
+
+def _two_cpus():
+    return 2
+
+
+def test_relocate_text_bin_in_spawned_processes(
+        tmpdir, monkeypatch, spawn_start_method
+):
+    # Patches are pickled for the spawned workers
+    monkeypatch.setattr(spack.relocate, '_min_bytes_per_job', 1)
+    monkeypatch.setattr(spack.relocate, 'cpus_available', _two_cpus)
+
+    orig_bytes, new_bytes = b'/home/spack/opt/linux/zlib-abcdef', b'/opt/zlib'
+    binaries = [tmpdir.join('lib%d.so' % i) for i in range(2)]
+    for binary in binaries:
+        binary.write_binary(b'\0' + orig_bytes + b'/lib\0')
+
+    spack.relocate.relocate_text_bin(
+        [b.strpath for b in binaries], {orig_bytes: new_bytes})
+    padding = b'/' * (len(orig_bytes) - len(new_bytes))
+    for binary in binaries:
+        assert binary.read_binary() == (
+            b'\0' + new_bytes + padding + b'/lib\0')
+
+
+def test_file_is_relocatable_without_strings(tmpdir, monkeypatch):
+    def _executable(*args):
+        raise AssertionError('no command should run')
+    monkeypatch.setattr(spack.util.executable, 'Executable', _executable)
+    root = '/home/spack/opt'
+    binary = tmpdir.join('libfoo.so')
+    binary.write_binary(b'\0\x01ld.so /usr/lib\0' + root.encode('utf-8') +
+                        b'/linux/zlib-abcdef/lib\0\x02')
+    assert not spack.relocate.file_is_relocatable(
+        binary.strpath, paths_to_relocate=[root])
+    assert spack.relocate.file_is_relocatable(
+        binary.strpath, paths_to_relocate=['/opt/other'])
+
+    # Excluded words, like RPATHs, may hold the paths
+    assert spack.relocate._path_in_strings(
+        binary.strpath, [root], set()) == root
+    assert spack.relocate._path_in_strings(
+        binary.strpath, [root], set([root + '/linux/zlib-abcdef/lib'])) is None
+    assert spack.relocate._path_in_strings(
+        binary.strpath, [root], set([root])) == root
+
+
+def test_mime_type_file_command_fallback(tmpdir, monkeypatch, mutable_config):
+    monkeypatch.setattr(spack.relocate, '_file_mime_type',
+                        lambda filename: ('application', 'x-custom'))
+    data, script = tmpdir.join('data'), tmpdir.join('script')
+    data.write_binary(b'\0\x01\x02')
+    script.write('#!/bin/sh\n')
+
+    for path in (data, script):
+        spack.relocate.mime_type.cache.clear()
+        assert spack.relocate.mime_type(path.strpath) == \
+            spack.util.file_type.mime_type(path.strpath)
+
+    spack.config.set('config:file_command_fallback', True)
+    spack.relocate.mime_type.cache.clear()
+    assert spack.relocate.mime_type(data.strpath) == (
+        'application', 'x-custom')
+    assert spack.relocate.mime_type(script.strpath) == (
+        'text', 'x-shellscript')
@@ -6,9 +6,14 @@
 import os
 
 import pytest
+import six
 
+import spack.caches
+import spack.metadata_index
 import spack.paths
 import spack.repo
+import spack.util.executable
+import spack.util.file_cache
 
 
 @pytest.fixture()
@@ -80,3 +85,221 @@ def test_namespace_hasattr(attr_name, exists, mutable_mock_repo):
     # of a custom __getattr__ implementation
     nms = spack.repo.SpackNamespace('spack.pkg.builtin.mock')
     assert hasattr(nms, attr_name) == exists
+
+
+def test_metadata_index_matches_package(mock_packages):
+    pkg = spack.repo.get('mpileaks')
+    metadata = spack.repo.path.get_metadata('mpileaks')
+
+    assert metadata.name == pkg.name
+    assert metadata.homepage == pkg.homepage
+    assert metadata.versions == dict(
+        (v, {'preferred': False, 'deprecated': False}) for v in pkg.versions
+    )
+    assert sorted(metadata.variants) == sorted(pkg.variants)
+    for deptype in ('build', 'link', 'run'):
+        assert (metadata.dependencies_of_type(deptype) ==
+                set(pkg.dependencies_of_type(deptype)))
+    assert metadata.format_doc(indent=2) == pkg.format_doc(indent=2)
+
+
+def test_metadata_index_provides_and_conflicts(mock_packages):
+    mpich = spack.repo.path.get_metadata('mpich')
+    expected = spack.repo.get('mpich').provided
+    assert sorted(str(s) for s in mpich.provided) == sorted(
+        str(s) for s in expected)
+
+    pkg = spack.repo.get('conflict')
+    conflicts = spack.repo.path.get_metadata('conflict').conflicts
+    assert conflicts == [
+        (str(trigger), str(when), msg)
+        for trigger, constraints in pkg.conflicts.items()
+        for when, msg in constraints
+    ]
+
+
+def test_metadata_index_unknown_package(mock_packages):
+    with pytest.raises(spack.repo.UnknownPackageError):
+        spack.repo.path.get_metadata('nonexistentpackage')
+
+    # Virtual packages have no metadata
+    with pytest.raises(spack.repo.UnknownPackageError):
+        spack.repo.path.get_metadata('mpi')
+
+
+def test_metadata_index_round_trip(mock_packages):
+    index = spack.repo.path.metadata_index
+    stream = six.StringIO()
+    index.to_json(stream)
+    stream.seek(0)
+
+    other = spack.metadata_index.MetadataIndex.from_json(stream)
+    assert sorted(other) == sorted(index)
+    assert all(other[name] == index[name] for name in index)
+
+
+@pytest.fixture()
+def empty_misc_cache(tmpdir, monkeypatch):
+    cache = spack.util.file_cache.FileCache(str(tmpdir.join('misc_cache')))
+    monkeypatch.setattr(spack.caches, 'misc_cache', cache)
+    return cache
+
+
+def test_parallel_reindex_matches_serial(
+        mock_packages, empty_misc_cache, monkeypatch
+):
+    def build_indexes(jobs):
+        # Start from scratch, with a new repo and an empty cache
+        empty_misc_cache.destroy()
+        repo = spack.repo.Repo(spack.paths.mock_packages_path)
+        reindexed = repo.index.update(jobs=jobs)
+        return reindexed, repo.index
+
+    parallel_pkgs, parallel = build_indexes(jobs=4)
+
+    def _fail(*args, **kwargs):
+        raise AssertionError('packages should be indexed in the parent')
+
+    # Check that the serial build never uses the pool
+    monkeypatch.setattr(spack.repo.multiprocessing, 'Pool', _fail)
+    serial_pkgs, serial = build_indexes(jobs=1)
+
+    assert len(serial_pkgs) > 4 * spack.repo._min_packages_per_job
+    assert serial_pkgs == parallel_pkgs
+    assert serial['providers'] == parallel['providers']
+    assert serial['tags'] == parallel['tags']
+    assert serial['patches'].index == parallel['patches'].index
+    assert dict(serial['metadata'].items()) == dict(
+        parallel['metadata'].items())
+
+
+def test_parallel_reindex_with_spawned_workers(
+        mock_packages, empty_misc_cache, spawn_start_method
+):
+    # Spawned workers don't inherit the mock repository, so they can
+    # index its packages only if the pool passes them its state
+    repo = spack.repo.Repo(spack.paths.mock_packages_path)
+    reindexed = repo.index.update(jobs=2)
+    assert sorted(reindexed) == sorted(
+        repo.all_package_names(include_virtuals=True))
+
+
+def test_reindex_only_updates_changed_packages(
+        mock_packages, empty_misc_cache
+):
+    repo = spack.repo.Repo(spack.paths.mock_packages_path)
+    assert repo.index.update(jobs=1)
+    assert repo.index.update(jobs=1) == []
+
+
+@pytest.fixture()
+def git_checker(tmpdir, empty_misc_cache, monkeypatch):
+    """Packages directory in a git checkout, a function committing all its
+    changes, and a function returning a fresh checker for it. The checker
+    fails if it stats all the packages, unless ``rescan`` is True.
+    """
+    packages = tmpdir.ensure('repo', 'packages', dir=True)
+    for name in ('pkg-a', 'pkg-b'):
+        packages.ensure(name, 'package.py')
+
+    git = spack.util.executable.which('git', required=True)
+
+    def _commit(msg):
+        with packages.dirpath().as_cwd():
+            git('add', '-A')
+            git('-c', 'commit.gpgsign=false', 'commit', '-q', '-m', msg)
+
+    with packages.dirpath().as_cwd():
+        git('init', '-q')
+        git('config', 'user.name', 'Spack')
+        git('config', 'user.email', 'spack@spack.io')
+    _commit('first')
+
+    stat_packages = spack.repo.FastPackageChecker._stat_packages
+
+    def _checker(rescan):
+        def _stat(self):
+            assert rescan, 'packages should not be scanned'
+            return stat_packages(self)
+        monkeypatch.setattr(
+            spack.repo.FastPackageChecker, '_stat_packages', _stat)
+        spack.repo.FastPackageChecker._paths_cache.pop(str(packages), None)
+        return spack.repo.FastPackageChecker(str(packages))
+
+    return packages, _commit, _checker
+
+
+@pytest.mark.requires_executables('git')
+def test_package_checker_reuses_snapshot(git_checker):
+    packages, commit, checker = git_checker
+
+    assert sorted(checker(rescan=True)) == ['pkg-a', 'pkg-b']
+    assert sorted(checker(rescan=False)) == ['pkg-a', 'pkg-b']
+
+    # New packages are detected before and after they are committed
+    packages.ensure('pkg-c', 'package.py')
+    assert sorted(checker(rescan=True)) == ['pkg-a', 'pkg-b', 'pkg-c']
+    commit('second')
+    assert sorted(checker(rescan=True)) == ['pkg-a', 'pkg-b', 'pkg-c']
+    assert sorted(checker(rescan=False)) == ['pkg-a', 'pkg-b', 'pkg-c']
+
+    # Invalidation always scans packages
+    checker(rescan=False)
+    with pytest.raises(AssertionError):
+        checker(rescan=False).invalidate()
+
+
+@pytest.mark.requires_executables('git')
+def test_package_checker_git_checkout(git_checker, monkeypatch):
+    packages, commit, checker = git_checker
+    checker(rescan=True)
+
+    # A commit that doesn't touch packages keeps the snapshot valid
+    packages.dirpath().ensure('README')
+    commit('second')
+    checker(rescan=False)
+
+    # Packages edited in place don't change any directory, and are only
+    # detected by reindexing, or once they are committed
+    package_file = packages.join('pkg-a', 'package.py')
+    package_file.write('# changed')
+    package_file.setmtime(1)
+    assert checker(rescan=False)['pkg-a'] != 1
+    reindexed = checker(rescan=True)
+    reindexed.invalidate()
+    assert reindexed['pkg-a'] == 1
+
+    # Uncommitted changes are then scanned, without running git again
+    git_clean = spack.repo._git_clean
+    monkeypatch.setattr(spack.repo, '_git_clean', None)
+    assert checker(rescan=True)['pkg-a'] == 1
+    monkeypatch.setattr(spack.repo, '_git_clean', git_clean)
+
+    commit('third')
+    assert checker(rescan=True)['pkg-a'] == 1
+    assert checker(rescan=False)['pkg-a'] == 1
+
+
+def test_package_checker_without_checkout(tmpdir, empty_misc_cache):
+    """Packages that are not in a git checkout are always scanned, since
+    they can be edited in place without changing any directory mtime."""
+    packages = tmpdir.ensure('repo', 'packages', dir=True)
+    packages.ensure('pkg-a', 'package.py')
+    spack.repo.FastPackageChecker._paths_cache.pop(str(packages), None)
+    spack.repo.FastPackageChecker(str(packages))
+
+    packages.join('pkg-a', 'package.py').setmtime(1)
+    spack.repo.FastPackageChecker._paths_cache.pop(str(packages), None)
+    assert spack.repo.FastPackageChecker(str(packages))['pkg-a'] == 1
+
+
+def test_package_checker_changed(tmpdir, empty_misc_cache):
+    packages = tmpdir.ensure('repo', 'packages', dir=True)
+    packages.ensure('pkg-a', 'package.py')
+    spack.repo.FastPackageChecker._paths_cache.pop(str(packages), None)
+    checker = spack.repo.FastPackageChecker(str(packages))
+    assert not checker.changed()
+
+    # Packages edited in place are detected
+    packages.join('pkg-a', 'package.py').setmtime(1)
+    assert checker.changed()
@@ -89,3 +89,32 @@ def test_yaml_aliases():
 
     # ensure no YAML aliases appear in syaml dumps.
     assert '*id' not in string
+
+
+@pytest.mark.skipif(not syaml.pyyaml, reason='needs PyYAML with libyaml')
+@pytest.mark.parametrize('default_flow_style', [False, True])
+def test_fast_dump_and_load(data, default_flow_style):
+    """Check that libyaml reads and writes the same data as ruamel."""
+    data['config_file']['strings'] = [
+        'yes', 'on', 'null', '', '1e5', '0o17', 'a: b', '2001-01-01']
+    data['config_file']['values'] = syaml.syaml_dict(
+        [('none', None), ('int', 10 ** 20), ('float', 1.5), ('bool', True)])
+
+    string = syaml.dump(data, default_flow_style=default_flow_style)
+    assert syaml.load(string) == data
+
+    # ruamel can read what libyaml writes
+    assert syaml.yaml.load(string) == data
+
+    # The order of mappings is preserved
+    assert list(syaml.load(string)['config_file']) == list(
+        data['config_file'])
+
+
+@pytest.mark.skipif(not syaml.pyyaml, reason='needs PyYAML with libyaml')
+def test_fast_load_errors_come_from_ruamel():
+    with pytest.raises(syaml.yaml.error.MarkedYAMLError):
+        syaml.load('a: [b')
+
+    # Tags libyaml doesn't handle safely are read by ruamel
+    assert syaml.load('!!python/tuple [1, 2]') == (1, 2)
@@ -0,0 +1,89 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import platform
+
+import pytest
+
+import spack.util.elf as elf
+import spack.util.executable
+
+pytestmark = pytest.mark.skipif(
+    platform.system().lower() != 'linux', reason='ELF objects only on linux')
+
+
+@pytest.fixture()
+def elf_binary(tmpdir):
+    """Factory compiling an executable, or a shared library if ``shared``,
+    with the given RPATHs, as ``DT_RUNPATH`` if ``new_dtags``."""
+    def _factory(rpaths, new_dtags=False, shared=False,
+                 code='int main(){ return 0; }'):
+        source = tmpdir.join('main.c')
+        source.write(code + '\n')
+        binary = tmpdir.join('main.so' if shared else 'main.x')
+        args = ['-shared', '-fPIC'] if shared else []
+        args += ['-Wl,--{0}-new-dtags'.format(
+            'enable' if new_dtags else 'disable'),
+            '-Wl,-rpath={0}'.format(':'.join(rpaths)),
+            source.strpath, '-o', binary.strpath]
+        spack.util.executable.which('gcc')(*args)
+        return binary.strpath
+    return _factory
+
+
+def _dynamic_tags(path):
+    with open(path, 'rb') as f:
+        return set(tag for _, tag, _ in elf.parse_elf(f).dynamic)
+
+
+@pytest.mark.requires_executables('gcc')
+@pytest.mark.parametrize('new_dtags', [False, True])
+def test_set_rpaths_in_place(elf_binary, new_dtags):
+    rpaths = ['/home/spack/opt/linux/zlib-abcdef/lib', '$ORIGIN/../lib']
+    binary = elf_binary(rpaths, new_dtags)
+    assert elf.get_rpaths(binary) == rpaths
+    assert (elf.DT_RUNPATH in _dynamic_tags(binary)) is new_dtags
+
+    assert elf.set_rpaths_in_place(binary, ['/opt/zlib/lib'])
+    assert elf.get_rpaths(binary) == ['/opt/zlib/lib']
+    # Like patchelf --force-rpath
+    assert elf.DT_RPATH in _dynamic_tags(binary)
+    assert elf.DT_RUNPATH not in _dynamic_tags(binary)
+    spack.util.executable.Executable(binary)()
+
+
+@pytest.mark.requires_executables('gcc')
+def test_set_longer_rpaths(elf_binary):
+    binary = elf_binary(['/opt/lib'])
+    with open(binary, 'rb') as f:
+        contents = f.read()
+
+    assert not elf.set_rpaths_in_place(binary, ['/much/longer/lib'])
+    with open(binary, 'rb') as f:
+        assert f.read() == contents
+
+
+@pytest.mark.requires_executables('gcc')
+def test_rpath_sharing_its_tail_with_a_symbol(elf_binary):
+    # The linker stores the name of the symbol at the end of the RPATH
+    binary = elf_binary(['/opt/lib/xspack_suffix'], shared=True,
+                        code='int spack_suffix(void){ return 0; }')
+    with open(binary, 'rb') as f:
+        parsed = elf.parse_elf(f)
+        names = [parsed.string(value)
+                 for _, value in elf.string_references(f, parsed)]
+        f.seek(0)
+        contents = f.read()
+    assert b'spack_suffix' in names
+
+    assert not elf.set_rpaths_in_place(binary, ['/opt/lib'])
+    with open(binary, 'rb') as f:
+        assert f.read() == contents
+
+
+def test_not_an_elf_file(tmpdir):
+    script = tmpdir.join('script')
+    script.write('#!/bin/sh\n')
+    with pytest.raises(elf.ElfParsingError):
+        elf.get_rpaths(script.strpath)
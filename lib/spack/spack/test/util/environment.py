@@ -4,6 +4,7 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 """Test Spack's environment utility functions."""
+import json
 import os
 
 import pytest
@@ -136,3 +137,26 @@ def test_reverse_environment_modifications(working_env):
 
     start_env.pop('UNSET')
     assert os.environ == start_env
+
+
+def test_environment_modifications_round_trip(working_env):
+    env = envutil.EnvironmentModifications()
+    env.set('SET', 'a var')
+    env.unset('UNSET')
+    env.set_path('SET_PATH', ['/one/set/path', '/two/set/path'])
+    env.prepend_path('PREPEND_PATH', '/new/path/prepended')
+    env.append_path('APPEND_PATH', '/new/path/appended', separator=';')
+    env.remove_path('REMOVE_PATH', '/path/removed')
+    env.append_flags('APPEND_FLAGS', 'more_flags')
+    env.remove_flags('REMOVE_FLAGS', 'less_flags')
+    env.deprioritize_system_paths('PREPEND_PATH')
+    env.prune_duplicate_paths('PREPEND_PATH')
+
+    data = json.loads(json.dumps(env.to_dict()))
+    copy = envutil.EnvironmentModifications.from_dict(data)
+    assert [type(x) for x in copy] == [type(x) for x in env]
+    assert [x.args for x in copy] == [x.args for x in env]
+
+    os.environ['REMOVE_PATH'] = '/a:/path/removed'
+    os.environ['REMOVE_FLAGS'] = 'more_flags less_flags'
+    assert copy.shell_modifications() == env.shell_modifications()
@@ -0,0 +1,55 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import os
+
+import pytest
+
+import spack.util.executable
+from spack.util.file_type import mime_type
+
+
+@pytest.mark.parametrize('contents,expected', [
+    (b'', ('inode', 'x-empty')),
+    (b'hello world\n', ('text', 'plain')),
+    (u'caf\xe9 cr\xe8me\n'.encode('latin-1'), ('text', 'plain')),
+    (u'caf\xe9 cr\xe8me\n'.encode('utf-8'), ('text', 'plain')),
+    (b'#!/bin/sh\necho hello\n', ('text', 'x-shellscript')),
+    (b'#!/bin/sh\nexit 0\n\0\x01\x02', ('application', 'octet-stream')),
+    (b'\0\x01\x02\x03', ('application', 'octet-stream')),
+    (b'!<arch>\n', ('application', 'x-archive')),
+    (b'\xcf\xfa\xed\xfe\x07\0\0\x01', ('application', 'x-mach-binary')),
+    (b'\xca\xfe\xba\xbe\0\0\0\x02', ('application', 'x-mach-binary')),
+    (b'\xca\xfe\xba\xbe\0\0\0\x34', ('application', 'x-java-applet')),
+    (b'\x1f\x8b\x08\0', ('application', 'gzip')),
+])
+def test_mime_type(tmpdir, contents, expected):
+    path = tmpdir.join('file')
+    path.write_binary(contents)
+    assert mime_type(path.strpath) == expected
+
+
+def test_mime_type_of_links_and_directories(tmpdir):
+    target = tmpdir.join('target')
+    target.write('hello world\n')
+    os.symlink(target.strpath, tmpdir.join('link').strpath)
+
+    assert mime_type(tmpdir.join('link').strpath) == ('inode', 'symlink')
+    assert mime_type(tmpdir.strpath) == ('inode', 'directory')
+
+
+@pytest.mark.requires_executables('gcc')
+@pytest.mark.parametrize('args,expected', [
+    (['-c'], 'x-object'),
+    (['-no-pie'], 'x-executable'),
+    (['-shared', '-fPIC'], 'x-sharedlib'),
+])
+def test_mime_type_of_elf_objects(tmpdir, args, expected):
+    source = tmpdir.join('main.c')
+    source.write('int main(){ return 0; }\n')
+    output = tmpdir.join('main.out').strpath
+    gcc = spack.util.executable.which('gcc')
+    gcc(source.strpath, '-o', output, *args)
+
+    assert mime_type(output) == ('application', expected)
@@ -0,0 +1,95 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 4), reason="needs importlib")
+
+if sys.version_info >= (3, 4):
+    import spack.util.imp.importlib_importer as importer
+
+source = """
+def answer():
+    return ANSWER
+"""
+
+
+@pytest.fixture(autouse=True)
+def write_bytecode(monkeypatch):
+    monkeypatch.setattr(sys, 'dont_write_bytecode', False)
+
+
+@pytest.fixture()
+def module_file(tmpdir):
+    path = tmpdir.join('src', 'mod.py')
+    path.write(source, ensure=True)
+    return path
+
+
+def load(path, cache_dir, prepend='ANSWER = 42'):
+    module = importer.load_source(
+        'spack_test_imp_mod', str(path), prepend=prepend,
+        cache_dir=str(cache_dir))
+    sys.modules.pop('spack_test_imp_mod', None)
+    return module
+
+
+def no_compile(*args, **kwargs):
+    raise AssertionError('module should be loaded from the cache')
+
+
+def test_bytecode_is_cached(module_file, tmpdir, monkeypatch):
+    cache_dir = tmpdir.join('cache')
+    assert load(module_file, cache_dir).answer() == 42
+    assert len(cache_dir.listdir()) == 1
+
+    monkeypatch.setattr(importer.PrependFileLoader, 'source_to_code',
+                        no_compile)
+    assert load(module_file, cache_dir).answer() == 42
+
+
+def test_bytecode_cache_is_relocatable(module_file, tmpdir, monkeypatch):
+    cache_dir = tmpdir.join('cache')
+    load(module_file, cache_dir)
+
+    # The same source in another directory reuses the bytecode, and the
+    # code refers to the new location
+    moved = tmpdir.join('moved', 'mod.py')
+    moved.write(module_file.read(), ensure=True)
+    monkeypatch.setattr(importer.PrependFileLoader, 'source_to_code',
+                        no_compile)
+    module = load(moved, cache_dir)
+    assert module.answer.__code__.co_filename == str(moved)
+
+
+def test_bytecode_cache_key(module_file, tmpdir):
+    cache_dir = tmpdir.join('cache')
+    load(module_file, cache_dir)
+
+    # A different prepend, or different source, is compiled again
+    assert load(module_file, cache_dir, prepend='ANSWER = 0').answer() == 0
+    module_file.write(source + '\n# changed\n')
+    load(module_file, cache_dir)
+
+    entries = [p for d in cache_dir.listdir() for p in d.listdir()]
+    assert len(entries) == 3
+
+
+def test_dont_write_bytecode(module_file, tmpdir, monkeypatch):
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    cache_dir = tmpdir.join('cache')
+    assert load(module_file, cache_dir).answer() == 42
+    assert not cache_dir.exists()
+
+
+def test_corrupt_bytecode_is_ignored(module_file, tmpdir):
+    cache_dir = tmpdir.join('cache')
+    load(module_file, cache_dir)
+
+    entry = cache_dir.listdir()[0].listdir()[0]
+    entry.write('garbage')
+    assert load(module_file, cache_dir).answer() == 42
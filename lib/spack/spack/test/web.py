@@ -268,6 +268,17 @@ def mock_create_s3_session(url):
     assert('Deleted keytwo' in err)
 
 
+def test_remove_s3_url_warns_on_errors(monkeypatch, capfd):
+    monkeypatch.setattr(
+        spack.util.s3, 'create_s3_session', lambda url: MockS3Client())
+
+    spack.util.web.remove_urls(['s3://my-bucket/keyone'])
+    err = capfd.readouterr()[1]
+
+    assert 'Failed to delete keyone (Access Denied)' in err
+    assert 'Deleted' not in err
+
+
 def test_s3_url_exists(monkeypatch, capfd):
     def mock_create_s3_session(url):
         return MockS3Client()
@@ -284,3 +295,101 @@ def mock_create_s3_session(url):
 def test_s3_url_parsing():
     assert(spack.util.s3._parse_s3_endpoint_url("example.com") == 'https://example.com')
     assert(spack.util.s3._parse_s3_endpoint_url("http://example.com") == 'http://example.com')
+
+
+class MockBatchS3Client(object):
+    def __init__(self):
+        self.deleted = []
+        self.uploads = []
+
+    def delete_objects(self, Bucket=None, Delete=None):
+        self.deleted.append((Bucket, [o['Key'] for o in Delete['Objects']]))
+        return {}
+
+    def upload_file(self, filename, bucket, key, ExtraArgs=None, Config=None):
+        self.uploads.append((filename, bucket, key, Config))
+
+
+def test_remove_s3_urls_in_batches(monkeypatch, tmpdir):
+    s3 = MockBatchS3Client()
+    monkeypatch.setattr(spack.util.s3, 'create_s3_session', lambda url: s3)
+    local_file = tmpdir.join('file')
+    local_file.write('')
+
+    urls = ['s3://bucket-a/mirror/{0}'.format(i) for i in range(2001)]
+    urls.extend(['s3://bucket-b/mirror/file', 'file://' + local_file.strpath])
+    spack.util.web.remove_urls(urls)
+
+    assert [(b, len(keys)) for b, keys in s3.deleted] == [
+        ('bucket-a', 1000), ('bucket-a', 1000), ('bucket-a', 1),
+        ('bucket-b', 1)]
+    assert s3.deleted[0][1][0] == 'mirror/0'
+    assert s3.deleted[-1][1] == ['mirror/file']
+    assert not local_file.exists()
+
+
+def test_push_to_s3_url_in_parts(monkeypatch, mutable_config, tmpdir):
+    pytest.importorskip('boto3')
+    s3 = MockBatchS3Client()
+    monkeypatch.setattr(spack.util.s3, 'create_s3_session', lambda url: s3)
+    spack.config.set('config:s3_upload_part_size', 16)
+    spack.config.set('config:s3_upload_concurrency', 4)
+    local_file = tmpdir.join('file.spack')
+    local_file.write('')
+
+    spack.util.web.push_to_url(local_file.strpath, 's3://bucket/file.spack')
+
+    (filename, bucket, key, config), = s3.uploads
+    assert (filename, bucket, key) == (local_file.strpath, 'bucket',
+                                       'file.spack')
+    assert config.multipart_chunksize == 16 << 20
+    assert config.multipart_threshold == 16 << 20
+    assert config.max_concurrency == 4
+
+
+@pytest.fixture()
+def mock_s3(monkeypatch):
+    moto = pytest.importorskip('moto')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.delenv('S3_ENDPOINT_URL', raising=False)
+    # Newer versions of botocore add checksums that moto doesn't handle
+    monkeypatch.setenv('AWS_REQUEST_CHECKSUM_CALCULATION', 'when_required')
+    monkeypatch.setattr(spack.util.s3, '_clients', {})
+    with moto.mock_s3():
+        s3 = spack.util.s3.create_s3_session('s3://bucket')
+        s3.create_bucket(Bucket='bucket')
+        yield s3
+
+
+def test_push_to_s3_url_in_parts_with_moto(mock_s3, mutable_config, tmpdir):
+    spack.config.set('config:s3_upload_part_size', 5)
+    local_file = tmpdir.join('file.spack')
+    local_file.write_binary(os.urandom(11 << 20))
+
+    spack.util.web.push_to_url(local_file.strpath, 's3://bucket/file.spack')
+
+    obj = mock_s3.get_object(Bucket='bucket', Key='file.spack')
+    assert obj['ETag'].strip('"').endswith('-3')
+    assert obj['Body'].read() == local_file.read_binary()
+
+
+def test_remove_s3_urls_in_batches_with_moto(
+        mock_s3, mutable_config, monkeypatch):
+    keys = ['mirror/{0}'.format(i) for i in range(1001)]
+    for key in keys:
+        mock_s3.put_object(Bucket='bucket', Key=key, Body=b'')
+
+    requests = []
+    delete_objects = mock_s3.delete_objects
+
+    def _delete_objects(**kwargs):
+        requests.append(len(kwargs['Delete']['Objects']))
+        return delete_objects(**kwargs)
+
+    monkeypatch.setattr(mock_s3, 'delete_objects', _delete_objects)
+    spack.util.web.remove_urls('s3://bucket/' + key for key in keys)
+
+    assert requests == [1000, 1]
+    assert 'Contents' not in mock_s3.list_objects_v2(Bucket='bucket')
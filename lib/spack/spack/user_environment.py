@@ -2,17 +2,29 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import hashlib
+import json
 import os
 import sys
+import tempfile
 
+import llnl.util.tty as tty
+from llnl.util.filesystem import mkdirp
+
+import spack
 import spack.build_environment as build_env
+import spack.caches
 import spack.config
+import spack.repo
 import spack.util.environment as environment
 import spack.util.prefix as prefix
 
 #: Environment variable name Spack uses to track individually loaded packages
 spack_loaded_hashes_var = 'SPACK_LOADED_HASHES'
 
+#: Version of the format of cached environment modifications
+_cache_version = 1
+
 
 def prefix_inspections(platform):
     """Get list of prefix inspections for platform
@@ -65,11 +77,26 @@ def unconditional_environment_modifications(view):
     return env
 
 
-def environment_modifications_for_spec(spec, view=None):
+def environment_modifications_for_spec(spec, view=None, use_cache=False):
     """List of environment (shell) modifications to be processed for spec.
 
     This list is specific to the location of the spec or its projection in
-    the view."""
+    the view.
+
+    If ``use_cache`` is True, the modifications of installed specs are read
+    from and stored in the misc cache, so that packages don't need to be
+    loaded to compute them again. Entries are invalidated when the package
+    files or the prefix inspections change, or the prefix is modified."""
+    if use_cache:
+        key = _cache_key(spec, view)
+        if key:
+            try:
+                return _read_cache(key)
+            except KeyError:
+                env = environment_modifications_for_spec(spec, view)
+                _write_cache(key, env)
+                return env
+
     spec = spec.copy()
     if view and not spec.external:
         spec.prefix = prefix.Prefix(view.get_projection_for_spec(spec))
@@ -95,3 +122,67 @@ def environment_modifications_for_spec(spec, view=None):
     spec.package.setup_run_environment(env)
 
     return env
+
+
+def _cache_file(key):
+    return os.path.join(
+        spack.caches.misc_cache.root, 'environment-modifications',
+        key + '.json')
+
+
+def _cache_key(spec, view):
+    """Key of the cached modifications of a spec, or None if they can't be
+    cached."""
+    if not spec.concrete:
+        return None
+
+    if view and not spec.external:
+        root = view.get_projection_for_spec(spec)
+    else:
+        root = spec.prefix
+
+    try:
+        # Modifications depend on the packages in the whole DAG, so a
+        # change to any of their package files invalidates the entry
+        package_mtimes = sorted(
+            (s.name, os.stat(spack.repo.path.repo_for_pkg(s)
+                             .filename_for_package_name(s.name)).st_mtime)
+            for s in spec.traverse())
+        key = [
+            _cache_version,
+            spack.spack_version,
+            spec.dag_hash(),
+            str(root),
+            os.stat(root).st_mtime,
+            package_mtimes,
+            prefix_inspections(spec.platform),
+        ]
+    except (OSError, ValueError, spack.repo.RepoError):
+        return None
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')
+                        ).hexdigest()
+
+
+def _read_cache(key):
+    """Return cached modifications, or raise KeyError if there are none."""
+    try:
+        with open(_cache_file(key)) as f:
+            data = json.load(f)
+        return environment.EnvironmentModifications.from_dict(data)
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        raise KeyError(key)
+
+
+def _write_cache(key, env):
+    """Store modifications in the cache. Entries are written atomically,
+    since many processes may load the same specs at once."""
+    path = _cache_file(key)
+    try:
+        data = json.dumps(env.to_dict())
+        mkdirp(os.path.dirname(path))
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        os.rename(tmp, path)
+    except (IOError, OSError, TypeError, ValueError) as e:
+        tty.debug('Could not cache environment modifications: {0}'.format(e))
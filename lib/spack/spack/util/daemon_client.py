@@ -0,0 +1,218 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Client side of ``spack daemon``.
+
+``bin/spack`` calls ``run()`` before importing anything else from Spack.
+If a daemon is serving this Spack prefix, and the command line is one
+of the read-only commands it can serve, the command is forwarded to the
+daemon together with the standard streams of this process, and runs
+there against configuration, repositories and database already loaded
+in memory.
+
+This module must only use the standard library, since importing Spack
+is exactly the cost we want to avoid. For the same reason it uses the
+``_socket`` and ``marshal`` builtins, instead of ``socket`` and ``json``
+which take longer to import than the daemon takes to answer.
+"""
+import marshal
+import os
+import struct
+import sys
+import zlib
+
+import _socket
+
+#: Commands that can run in the daemon, mapped to the subcommands that
+#: can run there (``None`` for all). These don't install, uninstall or
+#: modify anything, so they can run against the daemon's state.
+forwarded_commands = {
+    'arch': None,
+    'commands': None,
+    'compilers': None,
+    'config': ('blame', 'get', 'list'),
+    'dependencies': None,
+    'dependents': None,
+    'env': ('activate', 'deactivate', 'list', 'status'),
+    'extensions': None,
+    'find': None,
+    'info': None,
+    'list': None,
+    'load': None,
+    'location': None,
+    'mirror': ('list',),
+    'providers': None,
+    'repo': ('list',),
+    'resource': ('list',),
+    'spec': None,
+    'unload': None,
+}
+
+#: Global options that can be used with forwarded commands, and whether
+#: they take a value. Other options (e.g. ``-C``) change the state that
+#: the daemon keeps in memory, so commands using them run locally.
+forwarded_options = {
+    '--color': True,
+    '-d': False,
+    '--debug': False,
+    '-D': True,
+    '--env-dir': True,
+    '-e': True,
+    '--env': True,
+    '-E': False,
+    '--no-env': False,
+}
+
+#: Environment variables that must be the same in the daemon and in its
+#: clients, because the daemon's state depends on them. Variables expanded
+#: in configuration files must be the same too.
+state_variables = ('HOME', 'TMPDIR')
+
+_header = struct.Struct('!I')
+
+#: Version of the marshal format, readable by any Python we support
+_marshal_version = 2
+
+
+def socket_path(prefix):
+    """Path of the socket of the daemon serving a Spack prefix.
+
+    The socket is per host, since home directories are often shared
+    among the login nodes of a cluster.
+    """
+    digest = zlib.crc32(os.path.realpath(prefix).encode('utf-8'))
+    name = '{0}-{1:08x}.sock'.format(
+        os.uname()[1].split('.')[0], digest & 0xffffffff)
+    return os.path.join(os.path.expanduser('~/.spack'), 'daemon', name)
+
+
+def forwarded(argv):
+    """Whether a command line can be run by the daemon."""
+    i = 0
+    while i < len(argv) and argv[i].startswith('-'):
+        option, equals, _ = argv[i].partition('=')
+        if option not in forwarded_options:
+            return False
+        i += 2 if forwarded_options[option] and not equals else 1
+
+    if i >= len(argv) or argv[i] not in forwarded_commands:
+        return False
+
+    subcommands = forwarded_commands[argv[i]]
+    if subcommands is None:
+        return True
+    arguments = [arg for arg in argv[i + 1:] if not arg.startswith('-')]
+    return bool(arguments) and arguments[0] in subcommands
+
+
+def send_message(connection, message, fds=()):
+    """Send a message, and optionally file descriptors, on a socket.
+
+    Messages are made of builtin types (dicts, lists, strings, numbers).
+    """
+    data = marshal.dumps(message, _marshal_version)
+    data = _header.pack(len(data)) + data
+    if fds:
+        rights = struct.pack('{0}i'.format(len(fds)), *fds)
+        sent = connection.sendmsg(
+            [data], [(_socket.SOL_SOCKET, _socket.SCM_RIGHTS, rights)])
+        data = data[sent:]
+    connection.sendall(data)
+
+
+def _receive_exactly(connection, size, data=b''):
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise EOFError('connection closed')
+        data += chunk
+    return data
+
+
+def receive_message(connection, max_fds=0):
+    """Receive a message sent with ``send_message()``.
+
+    Returns:
+        (tuple): the message and the list of file descriptors received
+    """
+    fds = []
+    if max_fds:
+        fd_size = struct.calcsize('i')
+        data, ancillary, _, _ = connection.recvmsg(
+            _header.size, _socket.CMSG_LEN(max_fds * fd_size))
+        for level, kind, payload in ancillary:
+            if level == _socket.SOL_SOCKET and kind == _socket.SCM_RIGHTS:
+                count = len(payload) // fd_size
+                fds.extend(struct.unpack(
+                    '{0}i'.format(count), payload[:count * fd_size]))
+        if not data:
+            raise EOFError('connection closed')
+    else:
+        data = b''
+
+    header = _receive_exactly(connection, _header.size, data)
+    size, = _header.unpack(header)
+    payload = _receive_exactly(connection, size)
+    return marshal.loads(payload), fds
+
+
+def request(path, message, timeout=None):
+    """Send a control message to a daemon, and return its reply."""
+    connection = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        connection.settimeout(timeout)
+        connection.connect(path)
+        send_message(connection, message)
+        return receive_message(connection)[0]
+    finally:
+        connection.close()
+
+
+def run(prefix, argv):
+    """Run a command in the daemon serving ``prefix``, if there is one.
+
+    Returns:
+        (int or None): exit code of the command, or None if the command
+            needs to run in this process.
+    """
+    if os.environ.get('SPACK_DAEMON') == '0' or sys.version_info < (3, 3):
+        return None
+
+    path = socket_path(prefix)
+    if not forwarded(argv) or not os.path.exists(path):
+        return None
+
+    connection = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        try:
+            connection.connect(path)
+            send_message(connection, {
+                'argv': argv,
+                'cwd': os.getcwd(),
+                'env': dict(os.environ),
+            }, fds=(0, 1, 2))
+            reply, _ = receive_message(connection)
+        except (EOFError, OSError, ValueError):
+            return None
+        if not reply.get('accepted'):
+            return None
+
+        # From here on the command is running in the daemon, and writing
+        # to our streams. On ^C we tell the daemon to interrupt it, and
+        # still wait for its exit code, unless ^C is pressed again.
+        interrupted = False
+        while True:
+            try:
+                reply, _ = receive_message(connection)
+                return reply['returncode']
+            except KeyboardInterrupt:
+                if interrupted:
+                    raise
+                interrupted = True
+                connection.shutdown(_socket.SHUT_WR)
+            except (EOFError, OSError, ValueError, KeyError):
+                sys.stderr.write('==> Error: lost connection to the daemon\n')
+                return 1
+    finally:
+        connection.close()
@@ -0,0 +1,333 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Read and rewrite the RPATHs of ELF objects without ``patchelf``.
+
+Only the headers, the program headers and the dynamic section of a file
+are read, to find the string of its ``DT_RPATH`` or ``DT_RUNPATH`` entry.
+A new RPATH is written in place of the old string, if it is not longer,
+padded with null bytes. Anything else, like adding an RPATH or making room
+for a longer one, means moving sections around, and is left to
+``patchelf``.
+
+Linkers merge strings with the same tail in the string table, so that the
+names of symbols and versions may point inside the RPATH string. These
+are read too, and the RPATH is only rewritten if no other string starts
+inside it.
+"""
+import struct
+
+from spack.error import SpackError
+
+#: Program header type of the dynamic section
+PT_LOAD, PT_DYNAMIC = 1, 2
+
+#: Tags of the dynamic entries Spack cares about
+DT_NULL, DT_NEEDED, DT_HASH, DT_STRTAB, DT_SYMTAB = 0, 1, 4, 5, 6
+DT_STRSZ, DT_SYMENT, DT_SONAME, DT_RPATH, DT_RUNPATH = 10, 11, 14, 15, 29
+DT_GNU_HASH = 0x6ffffef5
+DT_VERDEF, DT_VERDEFNUM = 0x6ffffffc, 0x6ffffffd
+DT_VERNEED, DT_VERNEEDNUM = 0x6ffffffe, 0x6fffffff
+
+#: Tags of the dynamic entries whose value is an offset in the string
+#: table: the above, DT_AUDIT, DT_DEPAUDIT, DT_CONFIG, DT_AUXILIARY and
+#: DT_FILTER
+_string_tags = frozenset([
+    DT_NEEDED, DT_SONAME, DT_RPATH, DT_RUNPATH,
+    0x6ffffefa, 0x6ffffefb, 0x6ffffefc, 0x7ffffffd, 0x7fffffff])
+
+
+class ElfFile(object):
+    """Dynamic section of an ELF object, as found by ``parse_elf``.
+
+    Attributes:
+        byte_order (str): ``struct`` byte order of the file, ``<`` or ``>``
+        is_64_bit (bool): whether the file is a 64-bit object
+        dynamic (list): ``(offset, tag, value)`` of the dynamic entries,
+            where ``offset`` is the offset of the entry in the file
+        strtab_offset (int): offset of the dynamic string table in the
+            file, or None if the file has no dynamic section
+        strtab (bytes): dynamic string table
+        loads (list): ``(address, offset, size)`` of the loaded segments
+    """
+
+    def __init__(self, byte_order, is_64_bit):
+        self.byte_order = byte_order
+        self.is_64_bit = is_64_bit
+        self.dynamic = []
+        self.strtab_offset = None
+        self.strtab = b''
+        self.loads = []
+
+    @property
+    def entry_format(self):
+        """``struct`` format of a dynamic entry"""
+        return self.byte_order + ('qQ' if self.is_64_bit else 'iI')
+
+    def entries(self, tag):
+        """Dynamic entries with the given tag"""
+        return [e for e in self.dynamic if e[1] == tag]
+
+    def value(self, tag):
+        """Value of the first dynamic entry with the given tag, or None"""
+        entries = self.entries(tag)
+        return entries[0][2] if entries else None
+
+    def file_offset(self, address):
+        """Offset in the file of an address in a loaded segment"""
+        for p_vaddr, p_offset, p_filesz in self.loads:
+            if p_vaddr <= address < p_vaddr + p_filesz:
+                return address - p_vaddr + p_offset
+        raise ElfParsingError('address is not in a loaded segment')
+
+    def string(self, value):
+        """Null-terminated string at ``value`` in the string table"""
+        end = self.strtab.find(b'\0', value)
+        if value >= len(self.strtab) or end < 0:
+            raise ElfParsingError('string out of the string table')
+        return self.strtab[value:end]
+
+    @property
+    def rpath_entries(self):
+        return self.entries(DT_RPATH) + self.entries(DT_RUNPATH)
+
+    @property
+    def rpath(self):
+        """RPATH or RUNPATH of the file, as bytes, or None"""
+        entries = self.rpath_entries
+        return self.string(entries[0][2]) if entries else None
+
+
+def _read(f, offset, size):
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) != size:
+        raise ElfParsingError('file is truncated')
+    return data
+
+
+def parse_elf(f):
+    """Read the dynamic section of the ELF object open in binary mode as
+    ``f``.
+
+    Raises:
+        ElfParsingError: if ``f`` is not an ELF object this module can read
+    """
+    ident = f.read(16)
+    if len(ident) < 16 or ident[:4] != b'\x7fELF':
+        raise ElfParsingError('not an ELF file')
+    ei_class, ei_data = bytearray(ident[4:6])
+    if ei_class not in (1, 2) or ei_data not in (1, 2):
+        raise ElfParsingError('unknown ELF class or data encoding')
+    elf = ElfFile('<' if ei_data == 1 else '>', ei_class == 2)
+
+    # e_phoff, and e_phentsize and e_phnum further in the header
+    if elf.is_64_bit:
+        phoff, = struct.unpack(elf.byte_order + 'Q', _read(f, 32, 8))
+        phentsize, phnum = struct.unpack(
+            elf.byte_order + 'HH', _read(f, 54, 4))
+        ph_format = elf.byte_order + 'IIQQQQ'
+    else:
+        phoff, = struct.unpack(elf.byte_order + 'I', _read(f, 28, 4))
+        phentsize, phnum = struct.unpack(
+            elf.byte_order + 'HH', _read(f, 42, 4))
+        ph_format = elf.byte_order + 'IIIII'
+    if phnum == 0xffff:
+        raise ElfParsingError('too many program headers')
+
+    dynamic = None
+    for i in range(phnum):
+        header = _read(f, phoff + i * phentsize, struct.calcsize(ph_format))
+        if elf.is_64_bit:
+            p_type, _, p_offset, p_vaddr, _, p_filesz = struct.unpack(
+                ph_format, header)
+        else:
+            p_type, p_offset, p_vaddr, _, p_filesz = struct.unpack(
+                ph_format, header)
+        if p_type == PT_LOAD:
+            elf.loads.append((p_vaddr, p_offset, p_filesz))
+        elif p_type == PT_DYNAMIC:
+            dynamic = (p_offset, p_filesz)
+
+    if dynamic is None:
+        return elf
+
+    entry_size = struct.calcsize(elf.entry_format)
+    offset, end = dynamic[0], dynamic[0] + dynamic[1]
+    while offset + entry_size <= end:
+        tag, value = struct.unpack(
+            elf.entry_format, _read(f, offset, entry_size))
+        if tag == DT_NULL:
+            break
+        elf.dynamic.append((offset, tag, value))
+        offset += entry_size
+
+    strtab, strsz = elf.entries(DT_STRTAB), elf.entries(DT_STRSZ)
+    if not strtab or not strsz:
+        raise ElfParsingError('dynamic section without a string table')
+    # The string table is given by its address in memory
+    elf.strtab_offset = elf.file_offset(strtab[0][2])
+    elf.strtab = _read(f, elf.strtab_offset, strsz[0][2])
+    return elf
+
+
+def _symbol_count(f, elf):
+    """Number of entries of the dynamic symbol table, found with its hash
+    table, or None if it has none."""
+    order = elf.byte_order
+    if elf.value(DT_HASH) is not None:
+        # nbucket, nchain: there is one chain per symbol
+        offset = elf.file_offset(elf.value(DT_HASH))
+        return struct.unpack(order + 'II', _read(f, offset, 8))[1]
+
+    if elf.value(DT_GNU_HASH) is None:
+        return None
+    # Symbols after symoffset are in the chains of the buckets, where the
+    # last symbol of each chain has its lowest bit set
+    offset = elf.file_offset(elf.value(DT_GNU_HASH))
+    nbuckets, symoffset, bloom_size, _ = struct.unpack(
+        order + 'IIII', _read(f, offset, 16))
+    offset += 16 + bloom_size * (8 if elf.is_64_bit else 4)
+    buckets = struct.unpack(
+        order + 'I' * nbuckets, _read(f, offset, 4 * nbuckets))
+    last = max(buckets) if buckets else 0
+    if last < symoffset:
+        return symoffset
+    offset += 4 * (nbuckets + last - symoffset)
+    while not struct.unpack(order + 'I', _read(f, offset, 4))[0] & 1:
+        last += 1
+        offset += 4
+    return last + 1
+
+
+def _version_names(f, elf):
+    """Offsets in the string table of the names of the needed and defined
+    versions."""
+    order = elf.byte_order
+    names = []
+
+    # Elf_Verneed: vn_version, vn_cnt, vn_file, vn_aux, vn_next, and
+    # Elf_Vernaux: vna_hash, vna_flags, vna_other, vna_name, vna_next
+    offset = elf.value(DT_VERNEED)
+    offset = None if offset is None else elf.file_offset(offset)
+    for _ in range(elf.value(DT_VERNEEDNUM) or 0):
+        _, cnt, name, aux, next = struct.unpack(
+            order + 'HHIII', _read(f, offset, 16))
+        names.append(name)
+        aux_offset = offset + aux
+        for _ in range(cnt):
+            _, _, _, name, aux_next = struct.unpack(
+                order + 'IHHII', _read(f, aux_offset, 16))
+            names.append(name)
+            aux_offset += aux_next
+        offset += next
+
+    # Elf_Verdef: vd_version, vd_flags, vd_ndx, vd_cnt, vd_hash, vd_aux,
+    # vd_next, and Elf_Verdaux: vda_name, vda_next
+    offset = elf.value(DT_VERDEF)
+    offset = None if offset is None else elf.file_offset(offset)
+    for _ in range(elf.value(DT_VERDEFNUM) or 0):
+        _, _, _, cnt, _, aux, next = struct.unpack(
+            order + 'HHHHIII', _read(f, offset, 20))
+        aux_offset = offset + aux
+        for _ in range(cnt):
+            name, aux_next = struct.unpack(
+                order + 'II', _read(f, aux_offset, 8))
+            names.append(name)
+            aux_offset += aux_next
+        offset += next
+
+    return names
+
+
+def string_references(f, elf):
+    """Offsets in the string table of all the strings referenced by the
+    dynamic entries, the dynamic symbols and the versions of an ELF object.
+
+    Returns:
+        list: ``(dynamic_entry_offset, string_offset)``, where
+            ``dynamic_entry_offset`` is None for symbols and versions
+
+    Raises:
+        ElfParsingError: if the symbols can't be counted
+    """
+    references = [(offset, value) for offset, tag, value in elf.dynamic
+                  if tag in _string_tags]
+    references.extend((None, name) for name in _version_names(f, elf))
+
+    if elf.value(DT_SYMTAB) is not None:
+        count = _symbol_count(f, elf)
+        if count is None:
+            raise ElfParsingError('dynamic symbols without a hash table')
+        # st_name is the first field of both Elf32_Sym and Elf64_Sym
+        size = elf.value(DT_SYMENT) or (24 if elf.is_64_bit else 16)
+        symbols = _read(f, elf.file_offset(elf.value(DT_SYMTAB)),
+                        count * size)
+        references.extend(
+            (None, struct.unpack_from(elf.byte_order + 'I', symbols, i)[0])
+            for i in range(0, len(symbols), size))
+    return references
+
+
+def get_rpaths(path):
+    """RPATHs of the ELF object at ``path``, as a list of strings.
+
+    Raises:
+        ElfParsingError: if ``path`` is not an ELF object this module can
+            read
+    """
+    with open(path, 'rb') as f:
+        rpath = parse_elf(f).rpath
+    return rpath.decode('utf-8').split(':') if rpath else []
+
+
+def set_rpaths_in_place(path, rpaths):
+    """Set the RPATHs of the ELF object at ``path`` by rewriting the current
+    ``DT_RPATH`` or ``DT_RUNPATH`` string, like ``patchelf --force-rpath
+    --set-rpath`` would.
+
+    A ``DT_RUNPATH`` entry becomes a ``DT_RPATH`` entry.
+
+    Returns:
+        True if the RPATHs were set, False, leaving the file untouched, if
+        they don't fit in place of the current ones
+
+    Raises:
+        ElfParsingError: if ``path`` is not an ELF object this module can
+            read
+    """
+    new_rpath = ':'.join(rpaths).encode('utf-8')
+    with open(path, 'rb+') as f:
+        elf = parse_elf(f)
+        entries = elf.rpath_entries
+        if not entries:
+            # Nothing to rewrite, e.g. static executables
+            return not new_rpath
+        if len(entries) > 1:
+            return False
+
+        offset, tag, value = entries[0]
+        old_rpath = elf.string(value)
+        if len(new_rpath) > len(old_rpath):
+            return False
+        # The linker may share the end of the string with other strings
+        try:
+            references = string_references(f, elf)
+        except ElfParsingError:
+            return False
+        for other_offset, other_value in references:
+            if (other_offset != offset and
+                    value <= other_value < value + len(old_rpath)):
+                return False
+
+        f.seek(elf.strtab_offset + value)
+        f.write(new_rpath + b'\0' * (len(old_rpath) - len(new_rpath)))
+        if tag != DT_RPATH:
+            f.seek(offset)
+            f.write(struct.pack(elf.entry_format, DT_RPATH, value))
+    return True
+
+
+class ElfParsingError(SpackError):
+    """Raised when a file is not an ELF object Spack can read"""
@@ -350,6 +350,12 @@ def execute(self, env):
         env[self.name] = self.separator.join(directories)
 
 
+#: Types of modifications, by name, to deserialize them
+_modifier_types = dict((cls.__name__, cls) for cls in (
+    SetEnv, AppendFlagsEnv, UnsetEnv, RemoveFlagsEnv, SetPath, AppendPath,
+    PrependPath, RemovePath, DeprioritizeSystemPaths, PruneDuplicatePaths))
+
+
 class EnvironmentModifications(object):
     """Keeps track of requests to modify the current environment.
 
@@ -580,6 +586,29 @@ def reversed(self):
 
         return rev
 
+    def to_dict(self):
+        """Return a JSON-serializable representation of the modifications,
+        that ``from_dict()`` turns back into an equivalent object."""
+        return {'modifications': [
+            dict(item.args, type=type(item).__name__)
+            for item in self.env_modifications
+        ]}
+
+    @staticmethod
+    def from_dict(data):
+        """Construct an object from the output of ``to_dict()``."""
+        env = EnvironmentModifications()
+        for args in data['modifications']:
+            args = dict(args)
+            cls = _modifier_types[args.pop('type')]
+            name = args.pop('name')
+            if issubclass(cls, NameValueModifier):
+                item = cls(name, args.pop('value'), **args)
+            else:
+                item = cls(name, **args)
+            env.env_modifications.append(item)
+        return env
+
     def apply_modifications(self, env=None):
         """Applies the modifications and clears the list."""
         # Use os.environ if not specified
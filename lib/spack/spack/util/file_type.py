@@ -0,0 +1,108 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Classify files by their contents, like ``file --mime-type`` does.
+
+Only the file types Spack needs to tell apart when relocating are
+recognized by their magic bytes: ELF objects, Mach-O binaries, ``ar``
+archives, and a few compressed archives and images. Other files are text if
+their first megabyte doesn't hold bytes that ``file`` considers binary, and
+data otherwise.
+"""
+import os
+import stat
+import struct
+
+#: MIME types of data files, and of files that can't be classified
+data = ('application', 'octet-stream')
+
+#: MIME types of text files
+text = ('text', 'plain')
+
+#: Bytes read to tell text from data, like ``file`` does
+_text_bytes = 1 << 20
+
+#: Bytes found in text files: most control characters are not
+_text_chars = bytearray(
+    set([7, 8, 9, 10, 11, 12, 13, 27]) | set(range(0x20, 0x100)) -
+    set([0x7f]))
+
+#: MIME subtypes of the types of ELF objects
+_elf_types = {1: 'x-object', 2: 'x-executable', 3: 'x-sharedlib',
+              4: 'x-coredump'}
+
+#: Magic bytes of other recognized files, and their MIME types
+_magic = [
+    (b'!<arch>\n', ('application', 'x-archive')),
+    (b'\x1f\x8b', ('application', 'gzip')),
+    (b'BZh', ('application', 'x-bzip2')),
+    (b'\xfd7zXZ\x00', ('application', 'x-xz')),
+    (b'PK\x03\x04', ('application', 'zip')),
+    (b'\x89PNG\r\n\x1a\n', ('image', 'png')),
+    (b'GIF87a', ('image', 'gif')),
+    (b'GIF89a', ('image', 'gif')),
+    (b'\xff\xd8\xff', ('image', 'jpeg')),
+    (b'%PDF-', ('application', 'pdf')),
+]
+
+#: Magic numbers of Mach-O binaries, in both byte orders
+_macho_magic = set([
+    b'\xfe\xed\xfa\xce', b'\xce\xfa\xed\xfe',
+    b'\xfe\xed\xfa\xcf', b'\xcf\xfa\xed\xfe'])
+
+
+def is_text(contents):
+    """Whether ``contents`` look like the start of a text file"""
+    return not bytearray(contents).translate(None, _text_chars)
+
+
+def _magic_type(head):
+    if head[:4] == b'\x7fELF' and len(head) >= 18:
+        byte_order = '<' if head[5:6] == b'\x01' else '>'
+        e_type, = struct.unpack(byte_order + 'H', head[16:18])
+        return 'application', _elf_types.get(e_type, 'x-elf')
+    if head[:4] in _macho_magic:
+        return 'application', 'x-mach-binary'
+    if head[:4] == b'\xca\xfe\xba\xbe' and len(head) >= 8:
+        # Universal binaries have few architectures, while Java classes
+        # have a version there
+        nfat_arch, = struct.unpack('>I', head[4:8])
+        if nfat_arch < 20:
+            return 'application', 'x-mach-binary'
+        return 'application', 'x-java-applet'
+    for magic, mime_type in _magic:
+        if head.startswith(magic):
+            return mime_type
+    return None
+
+
+def mime_type(path):
+    """MIME type and subtype of the file at ``path``, without following
+    symbolic links.
+
+    Returns:
+        tuple: ``(type, subtype)``, e.g. ``('application', 'x-sharedlib')``
+    """
+    st = os.lstat(path)
+    if stat.S_ISLNK(st.st_mode):
+        return 'inode', 'symlink'
+    if stat.S_ISDIR(st.st_mode):
+        return 'inode', 'directory'
+    if not stat.S_ISREG(st.st_mode):
+        return 'inode', 'x-special'
+    if st.st_size == 0:
+        return 'inode', 'x-empty'
+
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+        mime = _magic_type(head)
+        if mime:
+            return mime
+        contents = head + f.read(_text_bytes - len(head))
+
+    if not is_text(contents):
+        return data
+    if contents.startswith(b'#!'):
+        return 'text', 'x-shellscript'
+    return text
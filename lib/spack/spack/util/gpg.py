@@ -288,17 +288,25 @@ def sign(key, file, output, clearsign=False):
 
 
 @_autoinit
-def verify(signature, file, suppress_warnings=False):
+def verify(signature, file=None, suppress_warnings=False, output=None):
     """Verify the signature on a file.
 
     Args:
-        signature (str): signature of the file
-        file (str): file to be verified
+        signature (str): signature of the file, or clearsigned file
+        file (str): file to be verified, None if the signature is a
+            clearsigned file
         suppress_warnings (bool): whether or not to suppress warnings
             from GnuPG
+        output (str): file where the verified text of a clearsigned file
+            is written
     """
     kwargs = {'error': str} if suppress_warnings else {}
-    GPG('--verify', signature, file, **kwargs)
+    args = [signature] if file is None else [signature, file]
+    if output:
+        args = ['--yes', '--output', output, '--verify'] + args
+    else:
+        args = ['--verify'] + args
+    GPG(*args, **kwargs)
 
 
 @_autoinit
@@ -20,7 +20,7 @@ def import_lock():
     imp.release_lock()
 
 
-def load_source(full_name, path, prepend=None):
+def load_source(full_name, path, prepend=None, cache_dir=None):
     """Import a Python module from source.
 
     Load the source file and add it to ``sys.modules``.
@@ -30,6 +30,8 @@ def load_source(full_name, path, prepend=None):
         path (str): path to the file that should be loaded
         prepend (str or None): some optional code to prepend to the
             loaded module; e.g., can be used to inject import statements
+        cache_dir (str or None): ignored, ``imp`` manages bytecode next
+            to the source
 
     Returns:
         the loaded module
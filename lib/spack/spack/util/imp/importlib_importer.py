@@ -7,13 +7,34 @@
 
 ``importlib`` is only fully implemented in Python 3.
 """
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
 from importlib.machinery import SourceFileLoader  # novm
+from importlib.util import MAGIC_NUMBER  # novm
+
+try:
+    from _imp import _fix_co_filename  # novm
+except ImportError:
+    def _fix_co_filename(code, path):
+        pass
 
 
 class PrependFileLoader(SourceFileLoader):
-    def __init__(self, full_name, path, prepend=None):
+    """Source loader that prepends some code to the module source.
+
+    If ``cache_dir`` is given, bytecode is cached there instead of in
+    ``__pycache__`` next to the source. Entries are keyed by a hash of the
+    interpreter's magic number, the prepended code and the source, so
+    they stay valid if the source is moved, and can be used for sources
+    in directories where the user can't write.
+    """
+    def __init__(self, full_name, path, prepend=None, cache_dir=None):
         super(PrependFileLoader, self).__init__(full_name, path)
         self.prepend = prepend
+        self.cache_dir = cache_dir
 
     def path_stats(self, path):
         stats = super(PrependFileLoader, self).path_stats(path)
@@ -28,8 +49,51 @@ def get_data(self, path):
         else:
             return self.prepend.encode() + b"\n" + data
 
+    def get_code(self, fullname):
+        if self.cache_dir is None:
+            return super(PrependFileLoader, self).get_code(fullname)
+
+        source = self.get_data(self.path)
+        cache_path = self.bytecode_path(source)
+        try:
+            with open(cache_path, 'rb') as f:
+                code = marshal.loads(f.read())
+            # Tracebacks should point to where the source is now
+            _fix_co_filename(code, self.path)
+            return code
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            pass
+
+        code = self.source_to_code(source, self.path)
+        if not sys.dont_write_bytecode:
+            self._write_bytecode(cache_path, marshal.dumps(code))
+        return code
+
+    def bytecode_path(self, source):
+        """Path of the cached bytecode for some source code."""
+        key = hashlib.sha256(MAGIC_NUMBER)
+        key.update((self.prepend or '').encode())
+        key.update(b"\0")
+        key.update(source)
+        digest = key.hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest[2:] + '.pyc')
+
+    def _write_bytecode(self, cache_path, data):
+        """Atomically write bytecode, ignoring errors: the cache is only
+        an optimization."""
+        cache_dir = os.path.dirname(cache_path)
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError):
+            pass
+
 
-def load_source(full_name, path, prepend=None):
+def load_source(full_name, path, prepend=None, cache_dir=None):
     """Import a Python module from source.
 
     Load the source file and add it to ``sys.modules``.
@@ -39,10 +103,12 @@ def load_source(full_name, path, prepend=None):
         path (str): path to the file that should be loaded
         prepend (str or None): some optional code to prepend to the
             loaded module; e.g., can be used to inject import statements
+        cache_dir (str or None): directory where bytecode is cached,
+            instead of ``__pycache__`` next to the source
 
     Returns:
         the loaded module
     """
     # use our custom loader
-    loader = PrependFileLoader(full_name, path, prepend)
+    loader = PrependFileLoader(full_name, path, prepend, cache_dir)
     return loader.load_module()
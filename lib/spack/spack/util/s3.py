@@ -4,12 +4,29 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 import os
+import threading
 
 import six.moves.urllib.parse as urllib_parse
 
 import spack
 import spack.util.url as url_util
 
+#: Maximum number of connections kept open by each S3 client, which bounds
+#: the number of concurrent requests to a mirror
+max_pool_connections = 32
+
+#: Default size in MiB of the parts of multipart uploads, and of the files
+#: uploaded in parts
+upload_part_size = 64
+
+#: Default number of parts of a file uploaded at once
+upload_concurrency = 10
+
+#: S3 clients by process, endpoint and SSL verification. Clients, unlike
+#: sessions, are thread safe, and reusing them reuses their connections.
+_clients = {}
+_clients_lock = threading.Lock()
+
 
 def _parse_s3_endpoint_url(endpoint_url):
     if not urllib_parse.urlparse(endpoint_url, scheme='').scheme:
@@ -28,24 +45,50 @@ def create_s3_session(url):
     # NOTE(opadron): import boto and friends as late as possible.  We don't
     # want to require boto as a dependency unless the user actually wants to
     # access S3 mirrors.
-    from boto3 import Session
     from botocore.exceptions import ClientError
 
-    session = Session()
-
     s3_client_args = {"use_ssl": spack.config.get('config:verify_ssl')}
 
     endpoint_url = os.environ.get('S3_ENDPOINT_URL')
     if endpoint_url:
         s3_client_args['endpoint_url'] = _parse_s3_endpoint_url(endpoint_url)
 
+    # Connections can't be shared with forked processes
+    key = (os.getpid(), endpoint_url, s3_client_args['use_ssl'])
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = _create_client(s3_client_args)
+            _clients[key].ClientError = ClientError
+        return _clients[key]
+
+
+def _create_client(s3_client_args):
+    from boto3 import Session
+    from botocore.client import Config
+
+    session = Session()
+    config_args = {'max_pool_connections': max_pool_connections}
+
     # if no access credentials provided above, then access anonymously
     if not session.get_credentials():
         from botocore import UNSIGNED
-        from botocore.client import Config
+        config_args['signature_version'] = UNSIGNED
+
+    s3_client_args["config"] = Config(**config_args)
+    return session.client('s3', **s3_client_args)
+
 
-        s3_client_args["config"] = Config(signature_version=UNSIGNED)
+def transfer_config():
+    """Configuration of transfers with ``upload_file``: files larger than
+    ``config:s3_upload_part_size`` MiB are uploaded in parts of that size,
+    ``config:s3_upload_concurrency`` parts at a time.
+    """
+    from boto3.s3.transfer import TransferConfig
 
-    client = session.client('s3', **s3_client_args)
-    client.ClientError = ClientError
-    return client
+    part_size = spack.config.get(
+        'config:s3_upload_part_size', upload_part_size) << 20
+    concurrency = spack.config.get(
+        'config:s3_upload_concurrency', upload_concurrency)
+    return TransferConfig(multipart_threshold=part_size,
+                          multipart_chunksize=part_size,
+                          max_concurrency=concurrency)
@@ -11,13 +11,19 @@
 - ``Our load methods use ``OrderedDict`` class instead of YAML's
   default unorderd dict.
 
+- ``load()`` and ``dump()``, used for files written by Spack, go through
+  PyYAML's bindings to libyaml when they are available, which are much
+  faster than ruamel. Configuration files are always read with ruamel,
+  since they need comments and line information.
+
 """
-import ctypes
 import re
+import struct
 import sys
 from typing import List  # novm
 
 import ruamel.yaml as yaml
+import six
 from ordereddict_backport import OrderedDict
 from ruamel.yaml import RoundTripDumper, RoundTripLoader
 from six import StringIO, string_types
@@ -26,6 +32,13 @@
 
 import spack.error
 
+try:
+    import yaml as pyyaml
+    CSafeLoader, CSafeDumper = pyyaml.CSafeLoader, pyyaml.CSafeDumper
+except (ImportError, AttributeError):
+    # PyYAML is missing, or was built without libyaml
+    pyyaml = None
+
 if sys.version_info >= (3, 3):
     from collections.abc import Mapping  # novm
 else:
@@ -212,10 +225,72 @@ def ignore_aliases(self, _data):
 
 
 #: Max integer helps avoid passing too large a value to cyaml.
-maxint = 2 ** (ctypes.sizeof(ctypes.c_int) * 8 - 1) - 1
+maxint = 2 ** (struct.calcsize('i') * 8 - 1) - 1
+
+
+if pyyaml:
+    class FastLoader(CSafeLoader):
+        """libyaml-based loader that resolves scalars like ``load()``."""
+
+    class FastDumper(CSafeDumper):
+        """libyaml-based dumper that writes the same data as ``dump()``.
+
+        Mappings keep their order, and strings are quoted whenever the
+        loader would otherwise resolve them to another type.
+        """
+
+        def ignore_aliases(self, _data):
+            """Make the dumper NEVER print YAML aliases."""
+            return True
+
+        def represent_none(self, data):
+            return self.represent_scalar(u'tag:yaml.org,2002:null', u'')
+
+        def represent_ordered_dict(self, data):
+            # A list of items isn't sorted, unlike a dict
+            return self.represent_mapping(
+                u'tag:yaml.org,2002:map', list(data.items()))
+
+        def represent_str_subclass(self, data):
+            # libyaml only takes scalars of the exact string types
+            if isinstance(data, six.text_type):
+                return self.represent_data(six.text_type(data))
+            return self.represent_data(str(data))
+
+    # ruamel and PyYAML share the format of resolvers
+    FastLoader.yaml_implicit_resolvers = dict(
+        (k, list(v)) for k, v in
+        yaml.resolver.Resolver.yaml_implicit_resolvers.items())
+    FastDumper.yaml_implicit_resolvers = FastLoader.yaml_implicit_resolvers
+
+    # Subclasses, like syaml_* types and ruamel's commented objects, are
+    # written like their base type
+    FastDumper.add_representer(type(None), FastDumper.represent_none)
+    FastDumper.add_representer(dict, FastDumper.represent_ordered_dict)
+    FastDumper.add_multi_representer(
+        dict, FastDumper.represent_ordered_dict)
+    FastDumper.add_multi_representer(list, FastDumper.represent_list)
+    for t in string_types:
+        FastDumper.add_multi_representer(t, FastDumper.represent_str_subclass)
+    FastDumper.add_multi_representer(int, FastDumper.represent_int)
 
 
 def dump(obj, default_flow_style=False, stream=None):
+    if pyyaml:
+        # Dump to a string first, so that nothing is written if an object
+        # can't be represented
+        try:
+            text = pyyaml.dump(
+                obj, default_flow_style=default_flow_style, width=maxint,
+                Dumper=FastDumper)
+        except pyyaml.YAMLError:
+            pass
+        else:
+            if stream is None:
+                return text
+            stream.write(text)
+            return
+
     return yaml.dump(obj, default_flow_style=default_flow_style, width=maxint,
                      Dumper=SafeDumper, stream=stream)
 
@@ -308,6 +383,16 @@ def load_config(*args, **kwargs):
 
 
 def load(*args, **kwargs):
+    if pyyaml and len(args) == 1 and not kwargs:
+        stream = args[0]
+        if hasattr(stream, 'read'):
+            stream = stream.read()
+        try:
+            return pyyaml.load(stream, Loader=FastLoader)
+        except (pyyaml.YAMLError, ValueError):
+            # Let ruamel report errors, and read what libyaml can't
+            return yaml.load(stream)
+
     return yaml.load(*args, **kwargs)
 
 
@@ -12,13 +12,12 @@
 import os.path
 import re
 import shutil
-import ssl
 import sys
+import tempfile
 import traceback
 
 import six
 from six.moves.urllib.error import URLError
-from six.moves.urllib.request import Request, urlopen
 
 import llnl.util.lang
 import llnl.util.tty as tty
@@ -32,6 +31,10 @@
 import spack.util.url as url_util
 from spack.util.compression import ALLOWED_ARCHIVE_TYPES
 
+# These are slow to import, and only needed to access the network
+ssl = llnl.util.lang.lazy_import('ssl')
+urllib_request = llnl.util.lang.lazy_import('six.moves.urllib.request')
+
 if sys.version_info < (3, 0):
     # Python 2 had these in the HTMLParser package.
     from HTMLParser import HTMLParseError, HTMLParser  # novm
@@ -106,7 +109,7 @@ def read_from_url(url, accept_content_type=None):
             if not __UNABLE_TO_VERIFY_SSL:
                 context = ssl._create_unverified_context()
 
-    req = Request(url_util.format(url))
+    req = urllib_request.Request(url_util.format(url))
     content_type = None
     is_web_url = url.scheme in ('http', 'https')
     if accept_content_type and is_web_url:
@@ -153,6 +156,21 @@ def warn_no_ssl_cert_checking():
              "your Python to enable certificate verification.")
 
 
+def _copy_atomic(src, dest, copy=shutil.copy):
+    """Copy a file to a mirror, so that readers of the mirror never see it
+    partially written."""
+    fd, tmp = tempfile.mkstemp(
+        dir=os.path.dirname(dest), prefix='.' + os.path.basename(dest),
+        suffix='.tmp')
+    os.close(fd)
+    try:
+        copy(src, tmp)
+        os.rename(tmp, dest)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
 def push_to_url(
         local_file_path, remote_path, keep_original=True, extra_args=None):
     remote_url = url_util.parse(remote_path)
@@ -165,7 +183,7 @@ def push_to_url(
     if remote_file_path is not None:
         mkdirp(os.path.dirname(remote_file_path))
         if keep_original:
-            shutil.copy(local_file_path, remote_file_path)
+            _copy_atomic(local_file_path, remote_file_path)
         else:
             try:
                 os.rename(local_file_path, remote_file_path)
@@ -175,7 +193,8 @@ def push_to_url(
                     # filesystem boundaries.  Copy the file (plus original
                     # metadata), and then delete the original.  This operation
                     # needs to be done in separate steps.
-                    shutil.copy2(local_file_path, remote_file_path)
+                    _copy_atomic(local_file_path, remote_file_path,
+                                 copy=shutil.copy2)
                     os.remove(local_file_path)
                 else:
                     raise
@@ -190,7 +209,8 @@ def push_to_url(
 
         s3 = s3_util.create_s3_session(remote_url)
         s3.upload_file(local_file_path, remote_url.netloc,
-                       remote_path, ExtraArgs=extra_args)
+                       remote_path, ExtraArgs=extra_args,
+                       Config=s3_util.transfer_config())
 
         if not keep_original:
             os.remove(local_file_path)
@@ -226,16 +246,35 @@ def url_exists(url):
         return False
 
 
-def _debug_print_delete_results(result):
+def _print_delete_results(result):
     if 'Deleted' in result:
         for d in result['Deleted']:
             tty.debug('Deleted {0}'.format(d['Key']))
     if 'Errors' in result:
         for e in result['Errors']:
-            tty.debug('Failed to delete {0} ({1})'.format(
+            tty.warn('Failed to delete {0} ({1})'.format(
                 e['Key'], e['Message']))
 
 
+def _delete_s3_objects(s3, bucket, keys):
+    """Delete keys from a bucket with as few requests as possible"""
+    def _delete(objects):
+        r = s3.delete_objects(Bucket=bucket, Delete={'Objects': objects})
+        _print_delete_results(r)
+
+    # Make sure we do not try to hit S3 with a list of more than 1000 items
+    objects = []
+    for key in keys:
+        objects.append({'Key': key})
+        if len(objects) >= 1000:
+            _delete(objects)
+            objects = []
+
+    # Delete any items that remain
+    if objects:
+        _delete(objects)
+
+
 def remove_url(url, recursive=False):
     url = url_util.parse(url)
 
@@ -256,25 +295,8 @@ def remove_url(url, recursive=False):
             prefix = url.path.strip('/')
             paginator = s3.get_paginator('list_objects_v2')
             pages = paginator.paginate(Bucket=bucket, Prefix=prefix)
-
-            delete_request = {'Objects': []}
-            for item in pages.search('Contents'):
-                if not item:
-                    continue
-
-                delete_request['Objects'].append({'Key': item['Key']})
-
-                # Make sure we do not try to hit S3 with a list of more
-                # than 1000 items
-                if len(delete_request['Objects']) >= 1000:
-                    r = s3.delete_objects(Bucket=bucket, Delete=delete_request)
-                    _debug_print_delete_results(r)
-                    delete_request = {'Objects': []}
-
-            # Delete any items that remain
-            if len(delete_request['Objects']):
-                r = s3.delete_objects(Bucket=bucket, Delete=delete_request)
-                _debug_print_delete_results(r)
+            _delete_s3_objects(s3, bucket, (
+                item['Key'] for item in pages.search('Contents') if item))
         else:
             s3.delete_object(Bucket=bucket, Key=url.path.lstrip('/'))
         return
@@ -282,6 +304,22 @@ def remove_url(url, recursive=False):
     # Don't even try for other URL schemes.
 
 
+def remove_urls(urls):
+    """Remove many files, like ``remove_url``. The keys of S3 objects are
+    deleted in batches, with one request per bucket and thousand keys."""
+    s3_keys = {}
+    for url in urls:
+        url = url_util.parse(url)
+        if url.scheme == 's3':
+            s3_keys.setdefault(url.netloc, (url, []))[1].append(
+                url.path.lstrip('/'))
+        else:
+            remove_url(url)
+
+    for bucket, (url, keys) in sorted(s3_keys.items()):
+        _delete_s3_objects(s3_util.create_s3_session(url), bucket, keys)
+
+
 def _iter_s3_contents(contents, prefix):
     for entry in contents:
         key = entry['Key']
@@ -512,7 +550,7 @@ def _urlopen(req, *args, **kwargs):
     if __UNABLE_TO_VERIFY_SSL:
         del kwargs['context']
 
-    opener = urlopen
+    opener = urllib_request.urlopen
     if url_util.parse(url).scheme == 's3':
         import spack.s3_handler
         opener = spack.s3_handler.open
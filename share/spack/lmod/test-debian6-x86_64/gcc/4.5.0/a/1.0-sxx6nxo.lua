@@ -0,0 +1,25 @@
+-- -*- lua -*-
+-- Module file created by spack (https://github.com/spack/spack) on 2026-10-19 03:57:08.697230
+--
+-- a@1.0%gcc@4.5.0+bvv~lorem_ipsum foo=bar foobar=bar arch=test-debian6-core2/sxx6nxo
+--
+
+whatis([[Name : a]])
+whatis([[Version : 1.0]])
+whatis([[Target : core2]])
+whatis([[Short description : Simple package with one optional dependency]])
+
+help([[Simple package with one optional dependency]])
+
+
+if not isloaded("b/1.0-eobbgei") then
+    load("b/1.0-eobbgei")
+end
+
+prepend_path("PATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-1.0-sxx6nxo3hevjk6odkgsg5ko5rpzdh6tb/bin", ":")
+prepend_path("MANPATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-1.0-sxx6nxo3hevjk6odkgsg5ko5rpzdh6tb/man", ":")
+prepend_path("LIBRARY_PATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-1.0-sxx6nxo3hevjk6odkgsg5ko5rpzdh6tb/lib", ":")
+prepend_path("LD_LIBRARY_PATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-1.0-sxx6nxo3hevjk6odkgsg5ko5rpzdh6tb/lib", ":")
+prepend_path("CPATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-1.0-sxx6nxo3hevjk6odkgsg5ko5rpzdh6tb/include", ":")
+prepend_path("CMAKE_PREFIX_PATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-1.0-sxx6nxo3hevjk6odkgsg5ko5rpzdh6tb/", ":")
+
@@ -0,0 +1,25 @@
+-- -*- lua -*-
+-- Module file created by spack (https://github.com/spack/spack) on 2026-10-19 03:57:08.766477
+--
+-- a@2.0%gcc@4.5.0+bvv~lorem_ipsum foo=bar foobar=bar arch=test-debian6-core2/gqom5ky
+--
+
+whatis([[Name : a]])
+whatis([[Version : 2.0]])
+whatis([[Target : core2]])
+whatis([[Short description : Simple package with one optional dependency]])
+
+help([[Simple package with one optional dependency]])
+
+
+if not isloaded("b/1.0-eobbgei") then
+    load("b/1.0-eobbgei")
+end
+
+prepend_path("PATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-2.0-gqom5kyexhtbxumgim474l6k43ytowwt/bin", ":")
+prepend_path("MANPATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-2.0-gqom5kyexhtbxumgim474l6k43ytowwt/man", ":")
+prepend_path("LIBRARY_PATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-2.0-gqom5kyexhtbxumgim474l6k43ytowwt/lib", ":")
+prepend_path("LD_LIBRARY_PATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-2.0-gqom5kyexhtbxumgim474l6k43ytowwt/lib", ":")
+prepend_path("CPATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-2.0-gqom5kyexhtbxumgim474l6k43ytowwt/include", ":")
+prepend_path("CMAKE_PREFIX_PATH", "/tmp/pytest-of-root/pytest-26/mock_store0/test-debian6-core2/gcc-4.5.0/a-2.0-gqom5kyexhtbxumgim474l6k43ytowwt/", ":")
+
@@ -0,0 +1,18 @@
+-- -*- lua -*-
+-- Module file created by spack (https://github.com/spack/spack) on 2026-10-19 03:57:14.594844
+--
+-- git-test-commit@4f827f7ac136ee09e7b8b1eaa7e566e16bd43b4c%gcc@4.5.0 arch=test-debian6-core2/3xiswx5
+--
+
+whatis([[Name : git-test-commit]])
+whatis([[Version : 4f827f7ac136ee09e7b8b1eaa7e566e16bd43b4c]])
+whatis([[Target : core2]])
+whatis([[Short description : Mock package that tests installing specific commit]])
+
+help([[Mock package that tests installing specific commit]])
+
+
+
+prepend_path("PATH", "/tmp/pytest-of-root/pytest-26/test_install_commit0/opt/test-debian6-core2/gcc-4.5.0/git-test-commit-4f827f7ac136ee09e7b8b1eaa7e566e16bd43b4c-3xiswx5gjm5i2f7bilz7sx57i6tibxbw/bin", ":")
+prepend_path("CMAKE_PREFIX_PATH", "/tmp/pytest-of-root/pytest-26/test_install_commit0/opt/test-debian6-core2/gcc-4.5.0/git-test-commit-4f827f7ac136ee09e7b8b1eaa7e566e16bd43b4c-3xiswx5gjm5i2f7bilz7sx57i6tibxbw/", ":")
+
@@ -0,0 +1,72 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Compare the startup of commands with and without cached host detection.
+
+The microarchitecture and the OS of the host are detected once and stored
+in ``~/.spack/hosts/<hostname>.json``. This times commands in new processes
+after removing that file, and with the file in place.
+
+Usage:
+
+    spack python share/spack/qa/benchmarks/host_detection.py [options]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import spack.paths
+import spack.platforms._host
+
+#: Commands that detect the host
+default_commands = ['arch', 'arch -o', 'config get config']
+
+
+def wall_time(args, env, cold):
+    path = spack.platforms._host.cache_path()
+    if cold and os.path.exists(path):
+        os.remove(path)
+
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        subprocess.check_call(
+            [sys.executable, spack.paths.spack_script] + args.split(),
+            stdout=devnull, env=env)
+        return time.time() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help='repetitions of each timing (default: %(default)s)')
+    parser.add_argument(
+        'commands', nargs='*',
+        help='spack commands to time, as strings (default: %s)' % ', '.join(
+            repr(c) for c in default_commands))
+    args = parser.parse_args(argv)
+
+    commands = args.commands or default_commands
+
+    env = dict(os.environ)
+    env.pop('SPACK_ENV', None)
+
+    # Warm up caches (bytecode, config, repo indexes)
+    for command in commands:
+        wall_time(command, env, False)
+
+    row = '{0:<26} {1:>9} {2:>9}'
+    print(row.format('command', 'cold(s)', 'warm(s)'))
+    for command in commands:
+        cold = min(wall_time(command, env, True) for _ in range(args.repeat))
+        warm = min(wall_time(command, env, False) for _ in range(args.repeat))
+        print(row.format(command, '%.3f' % cold, '%.3f' % warm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Compare `spack spec` times with a cold and a warm package bytecode cache.
+
+Each measurement runs `spack spec` in a new process. Before each cold run
+the bytecode cache in the misc cache is removed, so every package module
+that is imported has to be compiled. Warm runs reuse the cache filled by
+the previous run. Other caches (e.g. the repo indexes) are kept, so they
+don't affect the comparison.
+
+Usage:
+
+    spack python share/spack/qa/benchmarks/package_imports.py [options] [spec ...]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import spack.paths
+import spack.repo
+
+#: Specs whose concretization imports many package modules
+default_specs = ['hdf5', 'trilinos', 'py-scipy']
+
+
+def run_spec(specs, config_vars, env):
+    command = [sys.executable, spack.paths.spack_script]
+    for config_var in config_vars:
+        command.extend(['-c', config_var])
+
+    start = time.time()
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(
+            command + ['spec'] + specs, stdout=devnull, env=env)
+    return time.time() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help='repetitions for each measurement (default: %(default)s)')
+    parser.add_argument(
+        '-c', '--config', action='append', default=[],
+        help='config settings passed on to spack, '
+        'e.g. config:concretizer:original')
+    parser.add_argument('specs', nargs='*', default=default_specs)
+    args = parser.parse_args(argv)
+
+    # Python must be allowed to write bytecode for the cache to be filled
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    cache_dir = spack.repo.bytecode_cache_location()
+    print('bytecode cache: {0}'.format(cache_dir))
+
+    # Build repo indexes etc. before measuring anything
+    run_spec(args.specs, args.config, env)
+
+    cold, warm = [], []
+    for _ in range(args.repeat):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        cold.append(run_spec(args.specs, args.config, env))
+        warm.append(run_spec(args.specs, args.config, env))
+
+    row = '{0:<6} {1:>9.2f} {2:>9.2f}'
+    print('{0:<6} {1:>9} {2:>9}'.format('cache', 'best(s)', 'mean(s)'))
+    for name, times in (('cold', cold), ('warm', warm)):
+        print(row.format(name, min(times), sum(times) / len(times)))
+
+
+if __name__ == '__main__':
+    main()
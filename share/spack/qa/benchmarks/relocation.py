@@ -0,0 +1,215 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Compare relocating prefixes by scanning files and at recorded offsets.
+
+Build caches record the offsets of the prefixes in the files to relocate
+when they are created, so that installing them patches files in place
+instead of scanning them with regexes and ``strings``. Files without
+offsets are scanned once for all the prefixes, by as many processes as
+there are CPUs, instead of once per prefix in threads. This relocates the
+prefixes of installed specs, e.g. ``llvm`` or ``cuda``, or of a synthetic
+prefix referring to many dependencies if none is given, in all three ways
+in copies of the prefixes.
+
+Usage:
+
+    spack python share/spack/qa/benchmarks/relocation.py [options] [spec ...]
+"""
+from __future__ import print_function
+
+import argparse
+import multiprocessing.pool
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+from ordereddict_backport import OrderedDict
+
+import spack.binary_distribution as bindist
+import spack.relocate as relocate
+import spack.store
+
+#: Shorter prefix to relocate to, as binaries can't hold longer ones
+new_root = '/r'
+
+#: Format of the rows of results
+row = '{0:<16} {1:>6} {2:>5} {3:>9} {4:>9} {5:>11} {6:>9} {7:>10}'
+
+
+def synthetic_prefix(root, nfiles, size, ndeps):
+    """Prefix in ``root`` with ``nfiles`` text files and as many binaries
+    of ``size`` bytes, holding the prefix or the prefix of one of ``ndeps``
+    dependencies every few kB."""
+    prefix = os.path.join(root, 'opt', 'linux', 'synthetic-abcdef')
+    deps = [os.path.join(root, 'opt', 'linux', 'dep{0}-abcdef'.format(i))
+            for i in range(ndeps)]
+    text_files, binaries = [], []
+    rng = random.Random(0)
+    for i in range(nfiles):
+        for kind, names in (('share', text_files), ('lib', binaries)):
+            name = os.path.join(kind, 'file{0}'.format(i))
+            path = os.path.join(prefix, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+
+            chunks, length = [], 0
+            while length < size:
+                if kind == 'share':
+                    chunk = 'x = 1\n' * rng.randint(100, 1000)
+                else:
+                    chunk = bytearray(rng.getrandbits(8) for _ in range(64))
+                    chunk = bytes(chunk) * rng.randint(10, 100)
+                chunks.append(chunk)
+                ref = rng.choice([prefix, prefix] + deps)
+                chunks.append('{0}/lib\n'.format(ref) if kind == 'share'
+                              else ref.encode('utf-8') + b'/lib\0')
+                length += len(chunks[-2]) + len(chunks[-1])
+
+            data = ''.join(chunks) if kind == 'share' else b''.join(chunks)
+            with open(path, 'w' if kind == 'share' else 'wb') as f:
+                f.write(data)
+            names.append(name)
+    return prefix, root, deps, text_files, binaries
+
+
+def spec_prefix(spec):
+    manifest = bindist.get_buildfile_manifest(spec)
+    deps = [d.prefix for d in spec.traverse(root=False)
+            if not d.external and d.prefix != spec.prefix]
+    return (spec.prefix, spack.store.layout.root, deps,
+            manifest['text_to_relocate'], manifest['binary_to_relocate'])
+
+
+def _replace_per_prefix(filename, byte_prefixes, binary):
+    with open(filename, 'rb+') as f:
+        data = f.read()
+        for orig_bytes, new_bytes in byte_prefixes.items():
+            if binary:
+                padding = b'/' * (len(orig_bytes) - len(new_bytes))
+                data = data.replace(orig_bytes, new_bytes + padding)
+            else:
+                data = re.sub(
+                    b'(?<![\\w\\-_/])([\\w\\-_]*?)%s([\\w\\-_/]*)' %
+                    orig_bytes, b'\\1%s\\2' % new_bytes, data)
+        f.seek(0)
+        f.write(data)
+        f.truncate()
+
+
+def relocate_per_prefix(text_files, binaries, prefixes):
+    """Relocate files like Spack used to, scanning them once per prefix in
+    a thread pool."""
+    byte_prefixes = OrderedDict(
+        (o.encode('utf-8'), n.encode('utf-8')) for o, n in prefixes.items())
+    tp = multiprocessing.pool.ThreadPool(processes=32)
+    try:
+        tp.map(lambda args: _replace_per_prefix(*args),
+               [(name, byte_prefixes, False) for name in text_files] +
+               [(name, byte_prefixes, True) for name in binaries])
+    finally:
+        tp.terminate()
+        tp.join()
+
+
+def relocate_prefix(prefix, text_files, binaries, prefixes, offsets):
+    text_files = [os.path.join(prefix, name) for name in text_files]
+    binaries = [os.path.join(prefix, name) for name in binaries]
+    if offsets == 'per-prefix':
+        relocate_per_prefix(text_files, binaries, prefixes)
+        return
+    elif offsets is None:
+        binaries = [b for b in binaries if not relocate.file_is_relocatable(
+            b, paths_to_relocate=list(prefixes))]
+    else:
+        offsets = dict((os.path.join(prefix, name), file_offsets)
+                       for name, file_offsets in offsets.items())
+        text_files = [name for name in text_files if name in offsets]
+        binaries = [name for name in binaries if name in offsets]
+
+    relocate.relocate_text(text_files, prefixes, offsets=offsets)
+    relocate.relocate_text_bin(binaries, prefixes, offsets=offsets)
+
+
+def benchmark(name, tmpdir, per_prefix,
+              prefix, old_root, deps, text_files, binaries):
+    prefixes = OrderedDict([
+        (prefix, os.path.join(new_root, os.path.basename(prefix)))])
+    for dep in deps:
+        prefixes[dep] = os.path.join(new_root, os.path.basename(dep))
+    prefixes[old_root] = new_root
+
+    start = time.time()
+    offsets = {}
+    for names, binary in ((text_files, False), (binaries, True)):
+        for filename in names:
+            file_offsets = relocate.prefix_offsets(
+                os.path.join(prefix, filename), list(prefixes), binary)
+            if file_offsets:
+                offsets[filename] = file_offsets
+    record = time.time() - start
+
+    times = []
+    for file_offsets in ('per-prefix', None, offsets):
+        if file_offsets == 'per-prefix' and not per_prefix:
+            times.append(None)
+            continue
+        copy = os.path.join(tmpdir, 'copy')
+        shutil.copytree(prefix, copy, symlinks=True)
+        start = time.time()
+        relocate_prefix(copy, text_files, binaries, prefixes, file_offsets)
+        times.append(time.time() - start)
+        shutil.rmtree(copy)
+
+    nbytes = sum(os.path.getsize(os.path.join(prefix, name))
+                 for name in text_files + binaries)
+    print(row.format(
+        name, len(text_files) + len(binaries), len(deps),
+        '%.1f' % (nbytes / 1e6), '%.3f' % record,
+        *('-' if t is None else '%.3f' % t for t in times)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '-n', '--files', type=int, default=200,
+        help='text files and binaries in the synthetic prefix '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '-s', '--size', type=int, default=1 << 20,
+        help='size of the files in the synthetic prefix, in bytes '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '-d', '--deps', type=int, default=300,
+        help='dependencies referred to by the synthetic prefix '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--no-per-prefix', dest='per_prefix', action='store_false',
+        help="don't relocate files once per prefix, which takes hours for "
+             'gigabytes and hundreds of dependencies')
+    parser.add_argument(
+        'specs', nargs='*', help='installed specs to relocate')
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print(row.format(
+            'prefix', 'files', 'deps', 'size(MB)', 'record(s)',
+            'per-prefix(s)', 'scan(s)', 'offsets(s)'))
+        if not args.specs:
+            benchmark('synthetic', tmpdir, args.per_prefix, *synthetic_prefix(
+                os.path.join(tmpdir, 'synthetic'), args.files, args.size,
+                args.deps))
+        for spec in args.specs:
+            spec = spack.store.db.query_one(spec)
+            benchmark(spec.name, tmpdir, args.per_prefix, *spec_prefix(spec))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
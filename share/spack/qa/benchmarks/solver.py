@@ -0,0 +1,83 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Compare clingo configurations on a corpus of hard to concretize specs.
+
+Each spec in the corpus is solved with every combination of thread count
+and clingo configuration, and the best of a few repetitions is reported
+together with the time needed to find the first and the optimal model.
+
+Usage:
+
+    spack python share/spack/qa/benchmarks/solver.py [options] [spec ...]
+"""
+from __future__ import print_function
+
+import argparse
+import itertools
+import time
+
+import spack.cmd
+import spack.config
+import spack.solver.asp as asp
+
+#: Specs that take the longest to solve in the builtin repository
+default_corpus = [
+    'xsdk',
+    'ecp-data-vis-sdk',
+    'trilinos+amesos2+belos+hdf5+ifpack2+muelu+nox+stratimikos+zoltan2',
+]
+
+default_threads = '1,2,4,8'
+default_configurations = 'tweety,trendy,handy,many'
+
+
+def solve_once(spec, threads, configuration):
+    settings = {'solver_threads': threads, 'configuration': configuration}
+    with spack.config.override('concretizer', settings):
+        start = time.time()
+        result = asp.solve([spec])
+        total = time.time() - start
+
+    steps = result.optimization_steps
+    first = steps[0][0] if steps else float('nan')
+    last = steps[-1][0] if steps else float('nan')
+    return total, first, last, result.nmodels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '-t', '--threads', default=default_threads,
+        help='comma-separated thread counts (default: %(default)s)')
+    parser.add_argument(
+        '-c', '--configurations', default=default_configurations,
+        help='comma-separated clingo configurations (default: %(default)s)')
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help='repetitions for each measurement (default: %(default)s)')
+    parser.add_argument('specs', nargs='*', default=default_corpus)
+    args = parser.parse_args(argv)
+
+    threads = [int(x) for x in args.threads.split(',')]
+    configurations = args.configurations.split(',')
+
+    header = '{0:<40} {1:>7} {2:<8} {3:>9} {4:>9} {5:>9} {6:>6}'
+    row = '{0:<40} {1:>7} {2:<8} {3:>9.2f} {4:>9.2f} {5:>9.2f} {6:>6}'
+    print(header.format(
+        'spec', 'threads', 'config', 'total(s)', 'first(s)', 'best(s)',
+        'models'))
+
+    for spec_str in args.specs:
+        spec = spack.cmd.parse_specs(spec_str)[0]
+        for n, configuration in itertools.product(threads, configurations):
+            runs = [solve_once(spec, n, configuration)
+                    for _ in range(args.repeat)]
+            total, first, last, nmodels = min(runs)
+            print(row.format(
+                spec_str[:40], n, configuration, total, first, last, nmodels))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Check that common commands start fast and import few modules.
+
+Each command is run in a new process with ``python -X importtime``, to
+count the modules it imports and to find modules that should only be
+imported on demand (the solver, templating, networking, etc.). Wall
+clock times are measured in separate runs without ``-X importtime``.
+
+The script exits with a non-zero status if a command imports a module
+it shouldn't, or if it exceeds the module or time budget.
+
+Usage:
+
+    spack python share/spack/qa/benchmarks/startup.py [options]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+import spack.paths
+
+#: Commands that need to start fast, e.g. because shell integration runs
+#: them, with their budget for the number of imported modules
+default_commands = [
+    ('--version', 320),
+    ('--print-shell-vars sh', 320),
+    ('location -r', 320),
+    ('config get config', 320),
+]
+
+#: Modules that are slow to import and must only be imported on demand
+forbidden_modules = [
+    'boto3',
+    'clingo',
+    'http.client',
+    'jinja2',
+    'jsonschema',
+    'spack.binary_distribution',
+    'spack.build_environment',
+    'spack.package',
+    'spack.solver.asp',
+    'ssl',
+]
+
+_importtime_re = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def spack_command(args):
+    return [sys.executable, spack.paths.spack_script] + args.split()
+
+
+def imported_modules(args, env):
+    """Return the modules imported by a command, and their total import
+    time in seconds."""
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', spack.paths.spack_script] +
+        args.split(),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    _, err = process.communicate()
+
+    modules, total = [], 0
+    for line in err.decode('utf-8').splitlines():
+        match = _importtime_re.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = match.groups()
+        modules.append(name)
+        if not indent:
+            total += int(cumulative)
+    return modules, total / 1e6
+
+
+def wall_time(args, env, repeat):
+    times = []
+    with open(os.devnull, 'w') as devnull:
+        for _ in range(repeat):
+            start = time.time()
+            subprocess.check_call(
+                spack_command(args), stdout=devnull, env=env)
+            times.append(time.time() - start)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help='repetitions of each timing (default: %(default)s)')
+    parser.add_argument(
+        '-t', '--max-time', type=float, default=None,
+        help='maximum wall clock time in seconds for each command')
+    parser.add_argument(
+        '-m', '--max-modules', type=int, default=None,
+        help='maximum number of imported modules, overriding the '
+        'budget of each command')
+    parser.add_argument(
+        'commands', nargs='*',
+        help='spack commands to check, as strings (default: %s)' % ', '.join(
+            repr(c) for c, _ in default_commands))
+    args = parser.parse_args(argv)
+
+    if sys.version_info < (3, 7):
+        print('-X importtime needs Python 3.7 or later', file=sys.stderr)
+        return 2
+
+    budgets = dict(default_commands)
+    commands = args.commands or [c for c, _ in default_commands]
+
+    # The active environment would add its own imports
+    env = dict(os.environ)
+    env.pop('SPACK_ENV', None)
+
+    # Warm up caches (bytecode, config, repo indexes)
+    for command in commands:
+        wall_time(command, env, 1)
+
+    failures = []
+    row = '{0:<26} {1:>8} {2:>10} {3:>9}'
+    print(row.format('command', 'modules', 'import(s)', 'wall(s)'))
+    for command in commands:
+        modules, import_time = imported_modules(command, env)
+        seconds = wall_time(command, env, args.repeat)
+        print(row.format(command, len(modules), '%.3f' % import_time,
+                         '%.3f' % seconds))
+
+        max_modules = args.max_modules or budgets.get(command)
+        if max_modules and len(modules) > max_modules:
+            failures.append('{0}: imports {1} modules, budget is {2}'.format(
+                command, len(modules), max_modules))
+        if args.max_time and seconds > args.max_time:
+            failures.append('{0}: takes {1:.3f}s, budget is {2}s'.format(
+                command, seconds, args.max_time))
+        for name in sorted(set(forbidden_modules) & set(modules)):
+            failures.append('{0}: imports {1}'.format(command, name))
+
+    for failure in failures:
+        print('FAILED ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
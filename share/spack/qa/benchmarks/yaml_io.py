@@ -0,0 +1,111 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Compare reading and writing machine-generated YAML with and without libyaml.
+
+``spack.util.spack_yaml.load()`` and ``dump()`` use PyYAML's bindings to
+libyaml when they are available, and ruamel's pure Python implementation
+otherwise. This times both on the ``spec.yaml`` of concretized specs, and
+on pipelines shaped like the output of ``spack ci generate`` with
+increasing numbers of jobs.
+
+Usage:
+
+    spack python share/spack/qa/benchmarks/yaml_io.py [options] [spec ...]
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+
+import ruamel.yaml as yaml
+
+import spack.spec
+import spack.util.spack_yaml as syaml
+
+#: Specs with DAGs of different sizes
+default_specs = ['zlib', 'hdf5', 'trilinos']
+
+#: Numbers of jobs in the generated pipelines
+default_jobs = [100, 1000, 5000]
+
+
+def ruamel_dump(data, flow):
+    return yaml.dump(data, default_flow_style=flow, width=syaml.maxint,
+                     Dumper=syaml.SafeDumper)
+
+
+def best_time(repeat, function, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        function(*args)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def pipeline(specs, njobs):
+    """A pipeline with ``njobs`` jobs, like ``spack ci generate`` writes."""
+    jobs = syaml.syaml_dict()
+    for i in range(njobs):
+        spec = specs[i % len(specs)]
+        name = '{0}-{1}'.format(spec.format('{name}@{version} {/hash:7}'), i)
+        jobs[name] = {
+            'stage': 'stage-{0}'.format(i % 8),
+            'variables': {
+                'SPACK_ROOT_SPEC': spec.to_yaml(),
+                'SPACK_JOB_SPEC_PKG_NAME': spec.name,
+                'SPACK_JOB_SPEC_DAG_HASH': spec.dag_hash(),
+            },
+            'script': ['spack env activate --without-view .',
+                       'spack ci rebuild'],
+            'tags': ['spack', 'x86_64'],
+            'needs': [{'job': d.format('{name} {/hash:7}'),
+                       'artifacts': False}
+                      for d in spec.traverse(root=False)],
+            'artifacts': {'paths': ['jobs_scratch_dir'], 'when': 'always'},
+        }
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help='repetitions for each measurement (default: %(default)s)')
+    parser.add_argument(
+        '-j', '--jobs', type=int, action='append',
+        help='number of jobs in a pipeline, may be repeated '
+        '(default: {0})'.format(' '.join(str(j) for j in default_jobs)))
+    parser.add_argument('specs', nargs='*', default=default_specs)
+    args = parser.parse_args(argv)
+
+    if not syaml.pyyaml:
+        print('PyYAML with libyaml is not available, nothing to compare')
+        sys.exit(1)
+
+    specs = [spack.spec.Spec(s).concretized() for s in args.specs]
+    documents = [('{0}.yaml'.format(s.name), s.to_dict(), False)
+                 for s in specs]
+    documents.extend(('pipeline-{0}'.format(n), pipeline(specs, n), True)
+                     for n in args.jobs or default_jobs)
+
+    header = '{0:<16} {1:>9} {2:>9} {3:>9} {4:>9} {5:>9}'
+    row = '{0:<16} {1:>9.0f} {2:>9.3f} {3:>9.3f} {4:>9.3f} {5:>9.3f}'
+    print(header.format('document', 'size(kB)', 'dump(s)', 'fast(s)',
+                        'load(s)', 'fast(s)'))
+    for name, data, flow in documents:
+        text = ruamel_dump(data, flow)
+        print(row.format(
+            name, len(text) / 1000.,
+            best_time(args.repeat, ruamel_dump, data, flow),
+            best_time(args.repeat, syaml.dump, data, flow),
+            best_time(args.repeat, yaml.load, text),
+            best_time(args.repeat, syaml.load, text)))
+
+
+if __name__ == '__main__':
+    main()
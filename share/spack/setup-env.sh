@@ -383,6 +383,11 @@ fi
 #
 if test "$_sp_shell" = bash || test -n "${ZSH_VERSION:-}"; then
     source $_sp_share_dir/spack-completion.bash
+
+    # _sp_completion_cache is set by spack --print-shell-vars
+    if [ -n "${_sp_completion_cache:-}" ]; then
+        export SPACK_COMPLETION_CACHE="$_sp_completion_cache"
+    fi
 fi
 
 # done: unset sentinel variable as we're no longer initializing
@@ -137,23 +137,56 @@ _bash_completion_spack() {
     fi
 }
 
-# Helper functions for subcommands
-# Results of each query are cached via environment variables
+# Directory of the completion cache, exported by setup-env.sh after it
+# sources this file, or found when it is first needed. This file is sourced
+# again when switching to another Spack, so forget it.
+unset SPACK_COMPLETION_CACHE
 
-_subcommands() {
-    if [[ -z "${SPACK_SUBCOMMANDS:-}" ]]
+# Read a list of words from the completion cache into SPACK_COMPREPLY.
+# Spack keeps each list in a file, next to a file with the paths that the
+# list was computed from. Spack only needs to run when one of these paths
+# is newer than the list, so that TAB is usually instantaneous.
+# Syntax: _spack_completion_cache packages
+_spack_completion_cache() {
+    local list="${SPACK_COMPLETION_CACHE:-}/$1"
+    local stale=false
+    local dep
+    if [[ -z "${SPACK_COMPLETION_CACHE:-}" || ! -f "$list.deps" ]]
     then
-        SPACK_SUBCOMMANDS="$(spack commands)"
+        stale=true
+    else
+        while IFS= read -r dep
+        do
+            if [[ "$dep" -nt "$list" ]]
+            then
+                stale=true
+                break
+            fi
+        done < "$list.deps"
     fi
-    SPACK_COMPREPLY="$SPACK_SUBCOMMANDS"
-}
 
-_all_packages() {
-    if [[ -z "${SPACK_ALL_PACKAGES:-}" ]]
+    if $stale
     then
-        SPACK_ALL_PACKAGES="$(spack list)"
+        SPACK_COMPLETION_CACHE="$(spack commands --update-completion-cache)"
+        list="$SPACK_COMPLETION_CACHE/$1"
     fi
-    SPACK_COMPREPLY="$SPACK_ALL_PACKAGES"
+
+    # read returns non-zero at the end of the file
+    [[ -f "$list" ]] || return 1
+    IFS= read -r -d '' SPACK_COMPREPLY < "$list"
+    return 0
+}
+
+# Helper functions for subcommands
+# Results of each query are cached via environment variables, or in the
+# completion cache if they are expensive to get and can change
+
+_subcommands() {
+    _spack_completion_cache commands || SPACK_COMPREPLY="$(spack commands)"
+}
+
+_all_packages() {
+    _spack_completion_cache packages || SPACK_COMPREPLY="$(spack list)"
 }
 
 _all_resource_hashes() {
@@ -165,6 +198,11 @@ _all_resource_hashes() {
 }
 
 _installed_packages() {
+    # Active environments restrict the specs that are listed
+    if [[ -z "${SPACK_ENV:-}" ]] && _spack_completion_cache installed
+    then
+        return
+    fi
     if [[ -z "${SPACK_INSTALLED_PACKAGES:-}" ]]
     then
         SPACK_INSTALLED_PACKAGES="$(spack --color=never find --no-groups)"
@@ -213,11 +251,8 @@ _tests() {
 }
 
 _environments() {
-    if [[ -z "${SPACK_ENVIRONMENTS:-}" ]]
-    then
-        SPACK_ENVIRONMENTS="$(spack env list)"
-    fi
-    SPACK_COMPREPLY="$SPACK_ENVIRONMENTS"
+    _spack_completion_cache environments || \
+        SPACK_COMPREPLY="$(spack env list)"
 }
 
 _keys() {
@@ -333,7 +368,7 @@ _spack() {
     then
         SPACK_COMPREPLY="-h --help -H --all-help --color -c --config -C --config-scope -d --debug --timestamp --pdb -e --env -D --env-dir -E --no-env --use-env-repo -k --insecure -l --enable-locks -L --disable-locks -m --mock -p --profile --sorted-profile --lines -v --verbose --stacktrace -V --version --print-shell-vars"
     else
-        SPACK_COMPREPLY="activate add analyze arch audit blame bootstrap build-env buildcache cd checksum ci clean clone commands compiler compilers concretize config containerize create deactivate debug dependencies dependents deprecate dev-build develop diff docs edit env extensions external fetch find flake8 gc gpg graph help info install license list load location log-parse maintainers mark mirror module monitor patch pkg providers pydoc python reindex remove rm repo resource restage solve spec stage style test test-env tutorial undevelop uninstall unit-test unload url verify versions view"
+        SPACK_COMPREPLY="activate add analyze arch audit blame bootstrap build-env buildcache cd checksum ci clean clone commands compiler compilers concretize config containerize create daemon deactivate debug dependencies dependents deprecate dev-build develop diff docs edit env extensions external fetch find flake8 gc gpg graph help info install license list load location log-parse maintainers mark mirror module monitor patch pkg providers pydoc python reindex remove rm repo resource restage solve spec stage style test test-env tutorial undevelop uninstall unit-test unload url verify versions view"
     fi
 }
 
@@ -498,7 +533,7 @@ _spack_buildcache() {
 _spack_buildcache_create() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help -r --rel -f --force -u --unsigned -a --allow-root -k --key -d --directory -m --mirror-name --mirror-url --rebuild-index --spec-file --only"
+        SPACK_COMPREPLY="-h --help -r --rel -f --force -u --unsigned -a --allow-root -k --key -d --directory -m --mirror-name --mirror-url --rebuild-index --spec-file --compression -j --jobs --only"
     else
         _all_packages
     fi
@@ -560,7 +595,7 @@ _spack_buildcache_sync() {
 }
 
 _spack_buildcache_update_index() {
-    SPACK_COMPREPLY="-h --help -d --mirror-url -k --keys"
+    SPACK_COMPREPLY="-h --help -d --mirror-url -k --keys --incremental --shards -j --jobs"
 }
 
 _spack_cd() {
@@ -632,7 +667,7 @@ _spack_clone() {
 _spack_commands() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help --update-completion -a --aliases --format --header --update"
+        SPACK_COMPREPLY="-h --help --update-completion --update-completion-cache -a --aliases --format --header --update"
     else
         SPACK_COMPREPLY=""
     fi
@@ -701,7 +736,7 @@ _spack_compilers() {
 }
 
 _spack_concretize() {
-    SPACK_COMPREPLY="-h --help -f --force --test"
+    SPACK_COMPREPLY="-h --help -f --force --test --reuse"
 }
 
 _spack_config() {
@@ -806,6 +841,27 @@ _spack_create() {
     fi
 }
 
+_spack_daemon() {
+    if $list_options
+    then
+        SPACK_COMPREPLY="-h --help"
+    else
+        SPACK_COMPREPLY="start stop status"
+    fi
+}
+
+_spack_daemon_start() {
+    SPACK_COMPREPLY="-h --help -f --foreground -t --timeout"
+}
+
+_spack_daemon_stop() {
+    SPACK_COMPREPLY="-h --help"
+}
+
+_spack_daemon_status() {
+    SPACK_COMPREPLY="-h --help"
+}
+
 _spack_deactivate() {
     if $list_options
     then
@@ -1172,7 +1228,7 @@ _spack_info() {
 _spack_install() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help --only -u --until -j --jobs --overwrite --fail-fast --keep-prefix --keep-stage --dont-restage --use-cache --no-cache --cache-only --monitor --monitor-save-local --monitor-no-auth --monitor-tags --monitor-keep-going --monitor-host --monitor-prefix --include-build-deps --no-check-signature --require-full-hash-match --show-log-on-error --source -n --no-checksum --deprecated -v --verbose --fake --only-concrete --no-add -f --file --clean --dirty --test --run-tests --log-format --log-file --help-cdash --cdash-upload-url --cdash-build --cdash-site --cdash-track --cdash-buildstamp -y --yes-to-all"
+        SPACK_COMPREPLY="-h --help --only -u --until -j --jobs --overwrite --fail-fast --keep-prefix --keep-stage --dont-restage --use-cache --no-cache --cache-only --monitor --monitor-save-local --monitor-no-auth --monitor-tags --monitor-keep-going --monitor-host --monitor-prefix --include-build-deps --no-check-signature --require-full-hash-match --show-log-on-error --source -n --no-checksum --deprecated --reuse -v --verbose --fake --only-concrete --no-add -f --file --clean --dirty --test --run-tests --log-format --log-file --help-cdash --cdash-upload-url --cdash-build --cdash-site --cdash-track --cdash-buildstamp -y --yes-to-all"
     else
         _all_packages
     fi
@@ -1553,7 +1609,7 @@ _spack_repo() {
     then
         SPACK_COMPREPLY="-h --help"
     else
-        SPACK_COMPREPLY="create list add remove rm"
+        SPACK_COMPREPLY="create list add reindex remove rm"
     fi
 }
 
@@ -1573,12 +1629,21 @@ _spack_repo_list() {
 _spack_repo_add() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help --scope"
+        SPACK_COMPREPLY="-h --help --scope --no-reindex"
     else
         SPACK_COMPREPLY=""
     fi
 }
 
+_spack_repo_reindex() {
+    if $list_options
+    then
+        SPACK_COMPREPLY="-h --help -j --jobs"
+    else
+        _repos
+    fi
+}
+
 _spack_repo_remove() {
     if $list_options
     then
@@ -1631,7 +1696,7 @@ _spack_restage() {
 _spack_solve() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help --show --models -l --long -L --very-long -I --install-status -y --yaml -j --json -c --cover -N --namespaces -t --types --timers --stats"
+        SPACK_COMPREPLY="-h --help --show --models -l --long -L --very-long -I --install-status -y --yaml -j --json -c --cover -N --namespaces -t --types --timers --stats --reuse"
     else
         _all_packages
     fi
@@ -1640,7 +1705,7 @@ _spack_solve() {
 _spack_spec() {
     if $list_options
     then
-        SPACK_COMPREPLY="-h --help -l --long -L --very-long -I --install-status -y --yaml -j --json -c --cover -N --namespaces --hash-type -t --types"
+        SPACK_COMPREPLY="-h --help -l --long -L --very-long -I --install-status -y --yaml -j --json -c --cover -N --namespaces --hash-type -t --types --reuse"
     else
         _all_packages
     fi